@@ -3,6 +3,7 @@ pragma solidity ^0.8.0;
 
 import "./SavvyFinanceFarmToken.sol";
 import "./SavvyFinanceFarmStaker.sol";
+import "@openzeppelin/contracts/utils/math/SafeCast.sol";
 
 contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
     struct TokenStakerRewardDetails {
@@ -29,26 +30,97 @@ contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
         uint256 timestampAdded;
         uint256 timestampLastUpdated;
     }
-    // token => staker => TokenStakerDetails
+    // token => staker => TokenStakerDetails, layout version 1 entries, see
+    // migrateStorage. The staking rewards history stays here.
     mapping(address => mapping(address => TokenStakerDetails))
-        public tokensStakersData;
-
-    // event Stake(address indexed staker, address indexed token, uint256 amount);
-    // event Unstake(
-    //     address indexed staker,
-    //     address indexed token,
-    //     uint256 amount
-    // );
-    // event IssueStakingReward(
-    //     address indexed staker,
-    //     address indexed token,
-    //     TokenStakerRewardDetails rewardData
-    // );
-    // event withdrawRewardToken(
-    //     address indexed staker,
-    //     address indexed reward_token,
-    //     uint256 amount
-    // );
+        internal legacyTokensStakersData;
+    // TokenStakerDetails without the staking rewards history, packed into 3
+    // slots instead of 6
+    struct PackedTokenStakerDetails {
+        uint128 rewardBalance;
+        uint128 stakingBalance;
+        address stakingRewardToken;
+        uint64 timestampLastRewarded;
+        uint64 timestampAdded;
+        uint64 timestampLastUpdated;
+    }
+    struct PackedTokensStakersDetails {
+        // token => staker => PackedTokenStakerDetails
+        mapping(address => mapping(address => PackedTokenStakerDetails))
+            tokensStakers;
+    }
+    bytes32 constant PACKED_TOKENS_STAKERS_SLOT =
+        keccak256("savvy.finance.farm.packed.tokens.stakers");
+    // compact mode: staking rewards are only emitted, bit packed, in
+    // IssueCompactStakingReward logs instead of being pushed to stakingRewards
+    bool public compactStakingRewards;
+    // token => staker => number of staking rewards issued in compact mode
+    mapping(address => mapping(address => uint256))
+        public compactStakingRewardsCount;
+    // block compact mode was first enabled in, the first block to read the
+    // IssueCompactStakingReward logs from. 0 while it was never enabled
+    uint256 public compactStakingRewardsFromBlock;
+    enum StakingRewardTrigger {
+        Stake,
+        Unstake,
+        Claim,
+        Keeper
+    }
+    // accounts allowed to issue the staking rewards of any staker, see
+    // issueStakingRewards
+    bytes32 public constant KEEPER_ROLE = keccak256("KEEPER_ROLE");
+    // TokenStakerDetails without the staking rewards history
+    struct TokenStakerSummaryDetails {
+        uint256 rewardBalance;
+        uint256 stakingBalance;
+        address stakingRewardToken;
+        uint256 stakingRewardsCount;
+        uint256 timestampLastRewarded;
+        uint256 timestampAdded;
+        uint256 timestampLastUpdated;
+    }
+
+    event Stake(address indexed staker, address indexed token, uint256 amount);
+    // amount is the staking balance decrease, before unstake fees
+    event Unstake(
+        address indexed staker,
+        address indexed token,
+        uint256 amount
+    );
+    event IssueStakingReward(
+        address indexed staker,
+        address indexed token,
+        TokenStakerRewardDetails rewardData
+    );
+    event WithdrawRewardToken(
+        address indexed staker,
+        address indexed reward_token,
+        uint256 amount
+    );
+    // rewardData is
+    // [rewardToken | trigger << 160 | timestampAdded << 168,
+    //  rewardTokenPrice | rewardTokenAmount << 128,
+    //  stakedTokenPrice | stakedTokenAmount << 128,
+    //  stakingApr | stakingDurationInSeconds << 96 | triggerAmount << 192]
+    // see scripts/savvy_finance_farm.py compact_staking_reward_to_dict
+    event IssueCompactStakingReward(
+        address indexed staker,
+        address indexed token,
+        uint256 indexed id,
+        uint256[4] rewardData
+    );
+    // the token staker data without its staking rewards, which are emitted
+    // one by one by IssueStakingReward
+    event UpdateTokenStaker(
+        address indexed token,
+        address indexed staker,
+        uint256 rewardBalance,
+        uint256 stakingBalance,
+        address stakingRewardToken,
+        uint256 timestampLastRewarded,
+        uint256 timestampAdded,
+        uint256 timestampLastUpdated
+    );
 
     function initialize() public override {
         super.initialize();
@@ -67,13 +139,196 @@ contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
     function getTokenStakerData(address _token, address _staker)
         public
         view
-        returns (TokenStakerDetails memory)
+        returns (TokenStakerDetails memory tokenStakerDetails)
     {
-        return tokensStakersData[_token][_staker];
+        PackedTokenStakerDetails storage tokenStakerData = _tokenStakerData(
+            _token,
+            _staker
+        );
+        tokenStakerDetails.rewardBalance = tokenStakerData.rewardBalance;
+        tokenStakerDetails.stakingBalance = tokenStakerData.stakingBalance;
+        tokenStakerDetails.stakingRewardToken = tokenStakerData
+            .stakingRewardToken;
+        tokenStakerDetails.stakingRewards = legacyTokensStakersData[_token][
+            _staker
+        ].stakingRewards;
+        tokenStakerDetails.timestampLastRewarded = tokenStakerData
+            .timestampLastRewarded;
+        tokenStakerDetails.timestampAdded = tokenStakerData.timestampAdded;
+        tokenStakerDetails.timestampLastUpdated = tokenStakerData
+            .timestampLastUpdated;
+    }
+
+    // the getter of the layout version 1 mapping
+    function tokensStakersData(address _token, address _staker)
+        public
+        view
+        returns (
+            uint256 rewardBalance,
+            uint256 stakingBalance,
+            address stakingRewardToken,
+            uint256 timestampLastRewarded,
+            uint256 timestampAdded,
+            uint256 timestampLastUpdated
+        )
+    {
+        PackedTokenStakerDetails storage tokenStakerData = _tokenStakerData(
+            _token,
+            _staker
+        );
+        return (
+            tokenStakerData.rewardBalance,
+            tokenStakerData.stakingBalance,
+            tokenStakerData.stakingRewardToken,
+            tokenStakerData.timestampLastRewarded,
+            tokenStakerData.timestampAdded,
+            tokenStakerData.timestampLastUpdated
+        );
+    }
+
+    function configCompactStakingRewards(bool _compactStakingRewards)
+        public
+        onlyOwner
+        whenStorageMigrated
+    {
+        compactStakingRewards = _compactStakingRewards;
+        if (_compactStakingRewards && compactStakingRewardsFromBlock == 0)
+            compactStakingRewardsFromBlock = block.number;
+    }
+
+    function getTokenStakerSummary(address _token, address _staker)
+        public
+        view
+        returns (TokenStakerSummaryDetails memory)
+    {
+        PackedTokenStakerDetails storage tokenStakerData = _tokenStakerData(
+            _token,
+            _staker
+        );
+        return
+            TokenStakerSummaryDetails(
+                tokenStakerData.rewardBalance,
+                tokenStakerData.stakingBalance,
+                tokenStakerData.stakingRewardToken,
+                legacyTokensStakersData[_token][_staker].stakingRewards.length,
+                tokenStakerData.timestampLastRewarded,
+                tokenStakerData.timestampAdded,
+                tokenStakerData.timestampLastUpdated
+            );
+    }
+
+    function getTokenStakerRewardsPage(
+        address _token,
+        address _staker,
+        uint256 _offset,
+        uint256 _limit
+    ) public view returns (TokenStakerRewardDetails[] memory) {
+        TokenStakerRewardDetails[]
+            storage stakingRewards = legacyTokensStakersData[_token][_staker]
+                .stakingRewards;
+        if (_offset >= stakingRewards.length)
+            return new TokenStakerRewardDetails[](0);
+        uint256 end = _offset + _limit > stakingRewards.length
+            ? stakingRewards.length
+            : _offset + _limit;
+        TokenStakerRewardDetails[] memory page = new TokenStakerRewardDetails[](
+            end - _offset
+        );
+        for (uint256 index = _offset; index < end; index++) {
+            page[index - _offset] = stakingRewards[index];
+        }
+        return page;
+    }
+
+    // whether the token staker has a layout version 1 entry to migrate, see
+    // migrateTokensStakers
+    function isLegacyTokenStaker(address _token, address _staker)
+        public
+        view
+        returns (bool)
+    {
+        TokenStakerDetails
+            storage legacyTokenStakerData = legacyTokensStakersData[_token][
+                _staker
+            ];
+        return
+            legacyTokenStakerData.timestampAdded != 0 ||
+            legacyTokenStakerData.timestampLastUpdated != 0;
+    }
+
+    // copies the layout version 1 entries of the given token stakers, found
+    // off chain with isLegacyTokenStaker. With _done the token stakers scan
+    // of migrateStorage is skipped, so only the existing pairs are paid for.
+    function migrateTokensStakers(
+        address[] calldata _tokens,
+        address[] calldata _stakers,
+        bool _done
+    ) public onlyOwner {
+        require(_tokens.length == _stakers.length, "Lengths do not match.");
+        StorageMigrationDetails storage storageMigration = _storageMigration();
+        require(
+            storageMigration.version != STORAGE_VERSION,
+            "Storage already migrated."
+        );
+        for (uint256 index = 0; index < _tokens.length; index++) {
+            _migrateTokenStaker(_tokens[index], _stakers[index]);
+        }
+        if (_done)
+            storageMigration.tokensStakersMigrated =
+                tokens.length *
+                stakers.length;
+    }
+
+    // copies up to _count layout version 1 entries to the packed ones, the
+    // token stakers first, then the stakers and the tokens, and returns
+    // whether the migration is done. Until then the tokens don't exist, so
+    // they can't be added, staked or unstaked. The token stakers are scanned
+    // over tokens x stakers, about 5k gas (2 cold SLOADs) per pair that never
+    // staked, so farms with few pairs should use migrateTokensStakers first.
+    function migrateStorage(uint256 _count)
+        public
+        onlyOwner
+        returns (bool done)
+    {
+        StorageMigrationDetails storage storageMigration = _storageMigration();
+        if (storageMigration.version == STORAGE_VERSION) return true;
+        uint256 tokensStakersCount = tokens.length * stakers.length;
+        for (
+            ;
+            _count > 0 &&
+                storageMigration.tokensStakersMigrated < tokensStakersCount;
+            _count--
+        ) {
+            uint256 pairIndex = storageMigration.tokensStakersMigrated++;
+            _migrateTokenStaker(
+                tokens[pairIndex / stakers.length],
+                stakers[pairIndex % stakers.length]
+            );
+        }
+        for (
+            ;
+            _count > 0 && storageMigration.stakersMigrated < stakers.length;
+            _count--
+        ) {
+            _migrateStaker(stakers[storageMigration.stakersMigrated++]);
+        }
+        for (
+            ;
+            _count > 0 && storageMigration.tokensMigrated < tokens.length;
+            _count--
+        ) {
+            _migrateToken(tokens[storageMigration.tokensMigrated++]);
+        }
+        done =
+            storageMigration.tokensStakersMigrated == tokensStakersCount &&
+            storageMigration.stakersMigrated == stakers.length &&
+            storageMigration.tokensMigrated == tokens.length;
+        if (done) storageMigration.version = STORAGE_VERSION;
     }
 
     function changeStakingRewardToken(address _token, address _reward_token)
         public
+        whenStorageMigrated
         returns (address stakingRewardToken)
     {
         require(tokenExists(_token), "Token does not exist.");
@@ -81,26 +336,32 @@ contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
 
         if (_token != _reward_token) {
             require(
-                tokensData[_token].hasMultiTokenRewards,
+                _tokenData(_token).hasMultiTokenRewards,
                 "Token does not have multi token rewards."
             );
             require(
-                tokensData[_reward_token].hasMultiTokenRewards,
+                _tokenData(_reward_token).hasMultiTokenRewards,
                 "Reward token does not have multi token rewards."
             );
         }
 
         if (!stakerExists(_msgSender())) _addStaker(_msgSender());
-        tokensStakersData[_token][_msgSender()]
-            .stakingRewardToken = _reward_token;
-        tokensStakersData[_token][_msgSender()].timestampLastUpdated = block
-            .timestamp;
+        PackedTokenStakerDetails storage tokenStakerData = _tokenStakerData(
+            _token,
+            _msgSender()
+        );
+        tokenStakerData.stakingRewardToken = _reward_token;
+        tokenStakerData.timestampLastUpdated = _blockTimestamp();
+        _emitUpdateTokenStaker(_token, _msgSender());
 
-        return tokensStakersData[_token][_msgSender()].stakingRewardToken;
+        return tokenStakerData.stakingRewardToken;
     }
 
-    function stakeToken(address _token, uint256 _amount) public {
-        require(tokensData[_token].isActive, "Token not active.");
+    function stakeToken(address _token, uint256 _amount)
+        public
+        whenStorageMigrated
+    {
+        require(_tokenData(_token).isActive, "Token not active.");
         require(_amount > 0, "Amount must be greater than zero.");
         require(
             IERC20(_token).balanceOf(_msgSender()) >= _amount,
@@ -120,78 +381,94 @@ contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
         if (adminStakeFeeAmount != 0)
             IERC20(_token).transferFrom(
                 _msgSender(),
-                tokensData[_token].admin,
+                _tokenData(_token).admin,
                 adminStakeFeeAmount
             );
         uint256 stakeAmount = _amount -
             (devStakeFeeAmount + adminStakeFeeAmount);
         IERC20(_token).transferFrom(_msgSender(), address(this), stakeAmount);
 
-        if (tokensStakersData[_token][_msgSender()].stakingBalance == 0) {
-            if (stakersData[_msgSender()].uniqueTokensStaked == 0) {
+        PackedTokenStakerDetails storage tokenStakerData = _tokenStakerData(
+            _token,
+            _msgSender()
+        );
+        if (tokenStakerData.stakingBalance == 0) {
+            PackedStakerDetails storage stakerData = _stakerData(_msgSender());
+            if (stakerData.uniqueTokensStaked == 0) {
                 if (!stakerExists(_msgSender())) _addStaker(_msgSender());
-                stakersData[_msgSender()].isActive = true;
+                stakerData.isActive = true;
             }
 
-            stakersData[_msgSender()].uniqueTokensStaked++;
-            stakersData[_msgSender()].timestampAdded == 0
-                ? stakersData[_msgSender()].timestampAdded = block.timestamp
-                : stakersData[_msgSender()].timestampLastUpdated = block
-                .timestamp;
+            stakerData.uniqueTokensStaked++;
+            stakerData.timestampAdded == 0
+                ? stakerData.timestampAdded = _blockTimestamp()
+                : stakerData.timestampLastUpdated = _blockTimestamp();
+            _emitUpdateStaker(_msgSender());
 
-            if (
-                tokensStakersData[_token][_msgSender()].stakingRewardToken ==
-                address(0x0)
-            )
-                tokensStakersData[_token][_msgSender()]
-                    .stakingRewardToken = tokensData[_token].rewardToken;
+            if (tokenStakerData.stakingRewardToken == address(0x0))
+                tokenStakerData.stakingRewardToken = _tokenData(_token)
+                    .rewardToken;
         } else {
             _issueStakingReward(
                 _token,
                 _msgSender(),
-                ["stake", Strings.toString(_fromWei(_amount))]
+                StakingRewardTrigger.Stake,
+                _amount
             );
         }
 
-        tokensStakersData[_token][_msgSender()].stakingBalance += stakeAmount;
-        tokensStakersData[_token][_msgSender()].timestampAdded == 0
-            ? tokensStakersData[_token][_msgSender()].timestampAdded = block
-                .timestamp
-            : tokensStakersData[_token][_msgSender()]
-                .timestampLastUpdated = block.timestamp;
-        tokensData[_token].stakingBalance += stakeAmount;
-        tokensData[_token].timestampLastUpdated = block.timestamp;
-
-        // emit Stake(_msgSender(), _token, stakeAmount);
+        tokenStakerData.stakingBalance += SafeCast.toUint128(stakeAmount);
+        tokenStakerData.timestampAdded == 0
+            ? tokenStakerData.timestampAdded = _blockTimestamp()
+            : tokenStakerData.timestampLastUpdated = _blockTimestamp();
+        PackedTokenDetails storage tokenData = _tokenData(_token);
+        tokenData.stakingBalance += SafeCast.toUint128(stakeAmount);
+        tokenData.timestampLastUpdated = _blockTimestamp();
+        _emitUpdateTokenStaker(_token, _msgSender());
+        _emitUpdateTokenBalances(_token);
+
+        emit Stake(_msgSender(), _token, stakeAmount);
     }
 
-    function unstakeToken(address _token, uint256 _amount) public {
+    function unstakeToken(address _token, uint256 _amount)
+        public
+        whenStorageMigrated
+    {
         require(tokenExists(_token), "Token does not exist.");
         require(_amount > 0, "Amount must be greater than zero.");
+        PackedTokenStakerDetails storage tokenStakerData = _tokenStakerData(
+            _token,
+            _msgSender()
+        );
         require(
-            tokensStakersData[_token][_msgSender()].stakingBalance >= _amount,
+            tokenStakerData.stakingBalance >= _amount,
             "Insufficient staking balance."
         );
 
         _issueStakingReward(
             _token,
             _msgSender(),
-            ["unstake", Strings.toString(_fromWei(_amount))]
+            StakingRewardTrigger.Unstake,
+            _amount
         );
 
-        if (tokensStakersData[_token][_msgSender()].stakingBalance == _amount) {
-            if (stakersData[_msgSender()].uniqueTokensStaked == 1) {
-                stakersData[_msgSender()].isActive = false;
+        if (tokenStakerData.stakingBalance == _amount) {
+            PackedStakerDetails storage stakerData = _stakerData(_msgSender());
+            if (stakerData.uniqueTokensStaked == 1) {
+                stakerData.isActive = false;
             }
-            stakersData[_msgSender()].uniqueTokensStaked--;
-            stakersData[_msgSender()].timestampLastUpdated = block.timestamp;
+            stakerData.uniqueTokensStaked--;
+            stakerData.timestampLastUpdated = _blockTimestamp();
+            _emitUpdateStaker(_msgSender());
         }
 
-        tokensStakersData[_token][_msgSender()].stakingBalance -= _amount;
-        tokensStakersData[_token][_msgSender()].timestampLastUpdated = block
-            .timestamp;
-        tokensData[_token].stakingBalance -= _amount;
-        tokensData[_token].timestampLastUpdated = block.timestamp;
+        tokenStakerData.stakingBalance -= SafeCast.toUint128(_amount);
+        tokenStakerData.timestampLastUpdated = _blockTimestamp();
+        PackedTokenDetails storage tokenData = _tokenData(_token);
+        tokenData.stakingBalance -= SafeCast.toUint128(_amount);
+        tokenData.timestampLastUpdated = _blockTimestamp();
+        _emitUpdateTokenStaker(_token, _msgSender());
+        _emitUpdateTokenBalances(_token);
 
         (
             uint256 devUnstakeFeeAmount,
@@ -204,36 +481,92 @@ contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
             );
         if (adminUnstakeFeeAmount != 0)
             IERC20(_token).transfer(
-                tokensData[_token].admin,
+                _tokenData(_token).admin,
                 adminUnstakeFeeAmount
             );
         uint256 unstakeAmount = _amount -
             (devUnstakeFeeAmount + adminUnstakeFeeAmount);
         IERC20(_token).transfer(_msgSender(), unstakeAmount);
 
-        // emit Unstake(_msgSender(), _token, unstakeAmount);
+        emit Unstake(_msgSender(), _token, _amount);
+    }
+
+    function claimStakingReward(address _token) public whenStorageMigrated {
+        require(_tokenData(_token).isActive, "Token not active.");
+        _issueStakingReward(
+            _token,
+            _msgSender(),
+            StakingRewardTrigger.Claim,
+            0
+        );
     }
 
-    function claimStakingReward(address _token) public {
-        require(tokensData[_token].isActive, "Token not active.");
-        _issueStakingReward(_token, _msgSender(), ["claim staking reward", ""]);
+    // whether issueStakingRewards would issue the staking reward of the pair
+    function isStakingRewardIssuable(address _token, address _staker)
+        public
+        view
+        returns (bool)
+    {
+        (string memory error, ) = _tryCalculateStakingRewardData(
+            _token,
+            _staker,
+            block.timestamp
+        );
+        return bytes(error).length == 0;
+    }
+
+    // issues the staking rewards of a batch of (token, staker) pairs, skipping
+    // the ones that would revert in claimStakingReward. Unlike the rewards
+    // stakers trigger, they are credited up to block.timestamp only, so how
+    // often the keeper runs doesn't change how much it pays
+    function issueStakingRewards(
+        address[] memory _tokens,
+        address[] memory _stakers
+    )
+        public
+        onlyRole(KEEPER_ROLE)
+        whenStorageMigrated
+        returns (uint256 issuedCount)
+    {
+        require(_tokens.length == _stakers.length, "Length mismatch.");
+        for (uint256 pairIndex = 0; pairIndex < _tokens.length; pairIndex++) {
+            (
+                string memory error,
+                TokenStakerRewardDetails memory tokenStakerRewardData
+            ) = _tryCalculateStakingRewardData(
+                    _tokens[pairIndex],
+                    _stakers[pairIndex],
+                    block.timestamp
+                );
+            if (bytes(error).length != 0) continue;
+            _issueStakingReward(
+                tokenStakerRewardData,
+                StakingRewardTrigger.Keeper,
+                0
+            );
+            issuedCount++;
+        }
     }
 
     function withdrawRewardToken(address _reward_token, uint256 _amount)
         public
+        whenStorageMigrated
     {
         require(tokenExists(_reward_token), "Reward token does not exist.");
         require(_amount > 0, "Amount must be greater than zero.");
+        PackedTokenStakerDetails storage tokenStakerData = _tokenStakerData(
+            _reward_token,
+            _msgSender()
+        );
         require(
-            tokensStakersData[_reward_token][_msgSender()].rewardBalance >=
-                _amount,
+            tokenStakerData.rewardBalance >= _amount,
             "Insufficient reward balance."
         );
-        tokensStakersData[_reward_token][_msgSender()].rewardBalance -= _amount;
-        tokensStakersData[_reward_token][_msgSender()]
-            .timestampLastUpdated = block.timestamp;
+        tokenStakerData.rewardBalance -= SafeCast.toUint128(_amount);
+        tokenStakerData.timestampLastUpdated = _blockTimestamp();
         IERC20(_reward_token).transfer(_msgSender(), _amount);
-        // emit withdrawRewardToken(_msgSender(), _reward_token, _amount);
+        _emitUpdateTokenStaker(_reward_token, _msgSender());
+        emit WithdrawRewardToken(_msgSender(), _reward_token, _amount);
     }
 
     function _issueReward(
@@ -241,56 +574,54 @@ contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
         uint256 _rewardTokenAmount,
         address _receiver
     ) internal {
-        tokensData[_rewardToken].rewardBalance -= _rewardTokenAmount;
-        tokensData[_rewardToken].timestampLastUpdated = block.timestamp;
-        tokensStakersData[_rewardToken][_receiver]
-            .rewardBalance += _rewardTokenAmount;
-        tokensStakersData[_rewardToken][_receiver].timestampLastUpdated = block
-            .timestamp;
+        uint128 rewardTokenAmount = SafeCast.toUint128(_rewardTokenAmount);
+        PackedTokenDetails storage rewardTokenData = _tokenData(_rewardToken);
+        rewardTokenData.rewardBalance -= rewardTokenAmount;
+        rewardTokenData.timestampLastUpdated = _blockTimestamp();
+        PackedTokenStakerDetails storage receiverData = _tokenStakerData(
+            _rewardToken,
+            _receiver
+        );
+        receiverData.rewardBalance += rewardTokenAmount;
+        receiverData.timestampLastUpdated = _blockTimestamp();
+        _emitUpdateTokenBalances(_rewardToken);
+        _emitUpdateTokenStaker(_rewardToken, _receiver);
     }
 
     function _issueStakingReward(
         address _token,
         address _staker,
-        string[2] memory _triggeredBy
+        StakingRewardTrigger _trigger,
+        uint256 _triggerAmount
     ) internal {
-        require(tokensData[_token].isActive, "Token not active.");
-        require(stakersData[_staker].isActive, "Staker not active.");
-
         (
-            uint256 stakingRewardAmount,
-            uint256 stakingDurationInSeconds,
-            uint256 stakingApr,
-            uint256 stakingAmount
-        ) = Lib.calculateStakingReward(address(this), _token, _staker);
-        require(stakingRewardAmount > 0, "No reward yet.");
-
-        address rewardToken = tokensData[_token].rewardToken;
-        require(tokensData[rewardToken].isActive, "Reward token not active.");
-
-        (
-            uint256 rewardTokenAmount,
-            uint256 rewardTokenPrice,
-            uint256 tokenPrice
-        ) = Lib.convertFrom(
-                address(this),
+            string memory error,
+            TokenStakerRewardDetails memory tokenStakerRewardData
+        ) = _tryCalculateStakingRewardData(
                 _token,
-                rewardToken,
-                stakingRewardAmount
+                _staker,
+                block.timestamp + Lib.STAKING_REWARD_EXTRA_SECONDS
             );
-        if (tokensData[rewardToken].rewardBalance < rewardTokenAmount) {
-            tokensData[_token].isActive = false;
-            revert("Insufficient reward token balance.");
-        }
+        require(bytes(error).length == 0, error);
+        _issueStakingReward(tokenStakerRewardData, _trigger, _triggerAmount);
+    }
+
+    function _issueStakingReward(
+        TokenStakerRewardDetails memory _tokenStakerRewardData,
+        StakingRewardTrigger _trigger,
+        uint256 _triggerAmount
+    ) internal {
+        address token = _tokenStakerRewardData.stakedToken;
+        address staker = _tokenStakerRewardData.staker;
 
         // {
         //     // if staking reward token is different from token reward token,
         //     // staking reward token admin receives the reward in token reward token
         //     // to pay back equivalent in staking reward token, basically swapping
-        //     address stakingRewardToken = tokensStakersData[_token][_staker]
+        //     address stakingRewardToken = _tokenStakerData(token, staker)
         //         .stakingRewardToken;
         //     if (stakingRewardToken != rewardToken) {
-        //         if (tokensData[stakingRewardToken].isActive) {
+        //         if (_tokenData(stakingRewardToken).isActive) {
         //             uint256 stakingRewardTokenRewardValue = getTokenRewardValue(
         //                 stakingRewardToken
         //             );
@@ -310,7 +641,7 @@ contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
         //                 rewardTokenPrice = Lib.getTokenPrice(
         //                     address(this),
         //                     rewardToken,
-        //                     tokensData[rewardToken].category
+        //                     _tokenData(rewardToken).category
         //                 );
         //                 rewardTokenAmount =
         //                     _toWei(stakingRewardValue) /
@@ -320,30 +651,291 @@ contract SavvyFinanceFarm is SavvyFinanceFarmToken, SavvyFinanceFarmStaker {
         //     }
         // }
 
-        _issueReward(rewardToken, rewardTokenAmount, _staker);
-        tokensStakersData[_token][_staker].timestampLastRewarded = block
-            .timestamp;
-
-        TokenStakerRewardDetails memory tokenStakerRewardData;
-        tokenStakerRewardData.id = tokensStakersData[_token][_staker]
+        _issueReward(
+            _tokenStakerRewardData.rewardToken,
+            _tokenStakerRewardData.rewardTokenAmount,
+            staker
+        );
+        _tokenStakerData(token, staker)
+            .timestampLastRewarded = _blockTimestamp();
+
+        if (compactStakingRewards) {
+            _emitIssueCompactStakingReward(
+                _tokenStakerRewardData,
+                _trigger,
+                _triggerAmount
+            );
+            _emitUpdateTokenStaker(token, staker);
+            return;
+        }
+        _tokenStakerRewardData.id = legacyTokensStakersData[token][staker]
             .stakingRewards
             .length;
+        _tokenStakerRewardData.triggeredBy = _toTriggeredBy(
+            _trigger,
+            _triggerAmount
+        );
+        legacyTokensStakersData[token][staker].stakingRewards.push(
+            _tokenStakerRewardData
+        );
+        _emitIssueStakingReward(token, staker);
+    }
+
+    // the staking reward of a pair up to _stakingTimestampEnded, and the
+    // reason it can't be issued, empty when it can
+    function _tryCalculateStakingRewardData(
+        address _token,
+        address _staker,
+        uint256 _stakingTimestampEnded
+    )
+        internal
+        view
+        returns (
+            string memory error,
+            TokenStakerRewardDetails memory tokenStakerRewardData
+        )
+    {
+        if (!_tokenData(_token).isActive)
+            return ("Token not active.", tokenStakerRewardData);
+        if (!_stakerData(_staker).isActive)
+            return ("Staker not active.", tokenStakerRewardData);
+
+        uint256 stakingRewardAmount;
+        (
+            stakingRewardAmount,
+            tokenStakerRewardData.stakingDurationInSeconds,
+            tokenStakerRewardData.stakingApr,
+            tokenStakerRewardData.stakedTokenAmount
+        ) = Lib.calculateStakingRewardUntil(
+            address(this),
+            _token,
+            _staker,
+            _stakingTimestampEnded
+        );
+        if (stakingRewardAmount == 0)
+            return ("No reward yet.", tokenStakerRewardData);
+
+        address rewardToken = _tokenData(_token).rewardToken;
+        if (!_tokenData(rewardToken).isActive)
+            return ("Reward token not active.", tokenStakerRewardData);
+
+        (
+            tokenStakerRewardData.rewardTokenAmount,
+            tokenStakerRewardData.rewardTokenPrice,
+            tokenStakerRewardData.stakedTokenPrice
+        ) = Lib.convertFrom(
+            address(this),
+            _token,
+            rewardToken,
+            stakingRewardAmount
+        );
+        if (
+            _tokenData(rewardToken).rewardBalance <
+            tokenStakerRewardData.rewardTokenAmount
+        ) return ("Insufficient reward token balance.", tokenStakerRewardData);
+
         tokenStakerRewardData.staker = _staker;
         tokenStakerRewardData.rewardToken = rewardToken;
-        tokenStakerRewardData.rewardTokenPrice = rewardTokenPrice;
-        tokenStakerRewardData.rewardTokenAmount = rewardTokenAmount;
         tokenStakerRewardData.stakedToken = _token;
-        tokenStakerRewardData.stakedTokenPrice = tokenPrice;
-        tokenStakerRewardData.stakedTokenAmount = stakingAmount;
-        tokenStakerRewardData.stakingApr = stakingApr;
-        tokenStakerRewardData
-            .stakingDurationInSeconds = stakingDurationInSeconds;
-        tokenStakerRewardData.triggeredBy = _triggeredBy;
-        tokenStakerRewardData.timestampAdded = block.timestamp;
-        tokensStakersData[_token][_staker].stakingRewards.push(
-            tokenStakerRewardData
+        tokenStakerRewardData.timestampAdded = _blockTimestamp();
+    }
+
+    function _toTriggeredBy(StakingRewardTrigger _trigger, uint256 _amount)
+        internal
+        pure
+        returns (string[2] memory)
+    {
+        if (_trigger == StakingRewardTrigger.Stake)
+            return ["stake", Strings.toString(_fromWei(_amount))];
+        if (_trigger == StakingRewardTrigger.Unstake)
+            return ["unstake", Strings.toString(_fromWei(_amount))];
+        if (_trigger == StakingRewardTrigger.Keeper)
+            return ["issue staking reward", ""];
+        return ["claim staking reward", ""];
+    }
+
+    // whether the reward fits the field widths of IssueCompactStakingReward
+    function _fitsCompactStakingReward(
+        TokenStakerRewardDetails memory _tokenStakerRewardData,
+        uint256 _triggerAmount
+    ) internal pure returns (bool) {
+        return
+            _tokenStakerRewardData.timestampAdded <= type(uint64).max &&
+            _tokenStakerRewardData.rewardTokenPrice <= type(uint128).max &&
+            _tokenStakerRewardData.rewardTokenAmount <= type(uint128).max &&
+            _tokenStakerRewardData.stakedTokenPrice <= type(uint128).max &&
+            _tokenStakerRewardData.stakedTokenAmount <= type(uint128).max &&
+            _tokenStakerRewardData.stakingApr <= type(uint96).max &&
+            _tokenStakerRewardData.stakingDurationInSeconds <=
+            type(uint96).max &&
+            _fromWei(_triggerAmount) <= type(uint64).max;
+    }
+
+    // the ids of the rewards issued in compact mode follow the stored ones
+    function _nextCompactStakingRewardId(address _token, address _staker)
+        internal
+        returns (uint256)
+    {
+        return
+            legacyTokensStakersData[_token][_staker].stakingRewards.length +
+            compactStakingRewardsCount[_token][_staker]++;
+    }
+
+    // packs the reward into 4 words and keeps it in the logs only, the fields
+    // that are already topics or constant (staker, stakedToken,
+    // timestampLastUpdated) are left out. The rewards whose fields don't fit
+    // are emitted whole instead of reverting the stake, unstake or claim
+    function _emitIssueCompactStakingReward(
+        TokenStakerRewardDetails memory _tokenStakerRewardData,
+        StakingRewardTrigger _trigger,
+        uint256 _triggerAmount
+    ) internal {
+        if (
+            !_fitsCompactStakingReward(_tokenStakerRewardData, _triggerAmount)
+        ) {
+            _emitIssueUncompactedStakingReward(
+                _tokenStakerRewardData,
+                _trigger,
+                _triggerAmount
+            );
+            return;
+        }
+        address token = _tokenStakerRewardData.stakedToken;
+        address staker = _tokenStakerRewardData.staker;
+        emit IssueCompactStakingReward(
+            staker,
+            token,
+            _nextCompactStakingRewardId(token, staker),
+            [
+                uint256(uint160(_tokenStakerRewardData.rewardToken)) |
+                    (uint256(_trigger) << 160) |
+                    (_tokenStakerRewardData.timestampAdded << 168),
+                _tokenStakerRewardData.rewardTokenPrice |
+                    (_tokenStakerRewardData.rewardTokenAmount << 128),
+                _tokenStakerRewardData.stakedTokenPrice |
+                    (_tokenStakerRewardData.stakedTokenAmount << 128),
+                _tokenStakerRewardData.stakingApr |
+                    (_tokenStakerRewardData.stakingDurationInSeconds << 96) |
+                    (_fromWei(_triggerAmount) << 192)
+            ]
+        );
+    }
+
+    // a compact mode reward that doesn't fit IssueCompactStakingReward, emitted
+    // whole by IssueStakingReward with the next compact id, still not stored
+    function _emitIssueUncompactedStakingReward(
+        TokenStakerRewardDetails memory _tokenStakerRewardData,
+        StakingRewardTrigger _trigger,
+        uint256 _triggerAmount
+    ) internal {
+        address token = _tokenStakerRewardData.stakedToken;
+        address staker = _tokenStakerRewardData.staker;
+        _tokenStakerRewardData.id = _nextCompactStakingRewardId(token, staker);
+        _tokenStakerRewardData.triggeredBy = _toTriggeredBy(
+            _trigger,
+            _triggerAmount
+        );
+        emit IssueStakingReward(staker, token, _tokenStakerRewardData);
+    }
+
+    // emits from storage to keep _issueStakingReward clear of stack too deep
+    function _emitIssueStakingReward(address _token, address _staker) internal {
+        _emitUpdateTokenStaker(_token, _staker);
+        TokenStakerRewardDetails[]
+            storage stakingRewards = legacyTokensStakersData[_token][_staker]
+                .stakingRewards;
+        emit IssueStakingReward(
+            _staker,
+            _token,
+            stakingRewards[stakingRewards.length - 1]
+        );
+    }
+
+    function _emitUpdateTokenStaker(address _token, address _staker) internal {
+        PackedTokenStakerDetails storage tokenStakerData = _tokenStakerData(
+            _token,
+            _staker
         );
+        emit UpdateTokenStaker(
+            _token,
+            _staker,
+            tokenStakerData.rewardBalance,
+            tokenStakerData.stakingBalance,
+            tokenStakerData.stakingRewardToken,
+            tokenStakerData.timestampLastRewarded,
+            tokenStakerData.timestampAdded,
+            tokenStakerData.timestampLastUpdated
+        );
+    }
 
-        // emit IssueStakingReward(_staker, _token, tokenStakerRewardData);
+    function _packedTokensStakers()
+        internal
+        pure
+        returns (PackedTokensStakersDetails storage packedTokensStakers)
+    {
+        bytes32 slot = PACKED_TOKENS_STAKERS_SLOT;
+        assembly {
+            packedTokensStakers.slot := slot
+        }
+    }
+
+    function _tokenStakerData(address _token, address _staker)
+        internal
+        view
+        returns (PackedTokenStakerDetails storage)
+    {
+        return _packedTokensStakers().tokensStakers[_token][_staker];
+    }
+
+    // copies a layout version 1 entry, see migrateStorage. Pairs never
+    // staked, changed or rewarded are skipped. Balances that don't fit revert,
+    // the timestamps are clamped.
+    function _migrateTokenStaker(address _token, address _staker) internal {
+        if (!isLegacyTokenStaker(_token, _staker)) return;
+        TokenStakerDetails
+            storage legacyTokenStakerData = legacyTokensStakersData[_token][
+                _staker
+            ];
+        _packedTokensStakers().tokensStakers[_token][
+            _staker
+        ] = PackedTokenStakerDetails(
+            SafeCast.toUint128(legacyTokenStakerData.rewardBalance),
+            SafeCast.toUint128(legacyTokenStakerData.stakingBalance),
+            legacyTokenStakerData.stakingRewardToken,
+            uint64(
+                _clamp(
+                    _token,
+                    _staker,
+                    "timestampLastRewarded",
+                    legacyTokenStakerData.timestampLastRewarded,
+                    type(uint64).max
+                )
+            ),
+            uint64(
+                _clamp(
+                    _token,
+                    _staker,
+                    "timestampAdded",
+                    legacyTokenStakerData.timestampAdded,
+                    type(uint64).max
+                )
+            ),
+            uint64(
+                _clamp(
+                    _token,
+                    _staker,
+                    "timestampLastUpdated",
+                    legacyTokenStakerData.timestampLastUpdated,
+                    type(uint64).max
+                )
+            )
+        );
+        // the staking rewards history stays in place
+        legacyTokenStakerData.rewardBalance = 0;
+        legacyTokenStakerData.stakingBalance = 0;
+        legacyTokenStakerData.stakingRewardToken = address(0x0);
+        legacyTokenStakerData.timestampLastRewarded = 0;
+        legacyTokenStakerData.timestampAdded = 0;
+        legacyTokenStakerData.timestampLastUpdated = 0;
     }
 }
@@ -5,6 +5,7 @@ import "@openzeppelin/contracts/access/Ownable.sol";
 import "@openzeppelin/contracts/access/AccessControl.sol";
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
 import "@openzeppelin/contracts/utils/Strings.sol";
+import "@openzeppelin/contracts/utils/math/SafeCast.sol";
 import {SavvyFinanceFarmLibrary as Lib} from "./SavvyFinanceFarmLibrary.sol";
 
 contract SavvyFinanceFarmBase is Ownable, AccessControl {
@@ -37,6 +38,38 @@ contract SavvyFinanceFarmBase is Ownable, AccessControl {
     // token => bool
     mapping(address => bool) public isExcludedFromFees;
 
+    // version of the layout of the token, staker and token staker entries.
+    // Version 2 packs them in their own storage slots, the proxies deployed
+    // before copy them over with SavvyFinanceFarm.migrateStorage, which counts
+    // the entries migrated so far.
+    uint256 constant STORAGE_VERSION = 2;
+    struct StorageMigrationDetails {
+        uint256 version;
+        uint256 tokensStakersMigrated;
+        uint256 stakersMigrated;
+        uint256 tokensMigrated;
+    }
+    bytes32 constant STORAGE_MIGRATION_SLOT =
+        keccak256("savvy.finance.farm.storage.migration");
+
+    // a layout version 1 value that didn't fit its packed field, see _clamp.
+    // staker is 0x0 for token fields and token for staker fields.
+    event ClampMigratedValue(
+        address indexed token,
+        address indexed staker,
+        string field,
+        uint256 value,
+        uint256 clampedValue
+    );
+
+    modifier whenStorageMigrated() {
+        require(
+            _storageMigration().version == STORAGE_VERSION,
+            "Storage migration in progress."
+        );
+        _;
+    }
+
     // constructor() {
     //     configData.developmentWallet = _msgSender();
     //     configData.defaultDex = 0;
@@ -70,11 +103,13 @@ contract SavvyFinanceFarmBase is Ownable, AccessControl {
         configData.defaultDepositWithdrawFee = _toWei(1);
         _setupRole(DEFAULT_ADMIN_ROLE, _msgSender());
         _transferOwnership(_msgSender());
+        _storageMigration().version = STORAGE_VERSION;
     }
 
     function configDevelopmentWallet(address _developmentWallet)
         public
         onlyOwner
+        whenStorageMigrated
     {
         configData.developmentWallet = _developmentWallet;
     }
@@ -82,18 +117,23 @@ contract SavvyFinanceFarmBase is Ownable, AccessControl {
     function configDex(uint256 _number, DexDetails memory dex)
         public
         onlyOwner
+        whenStorageMigrated
     {
         dexs[_number] = dex;
     }
 
-    function configDefaultDex(uint256 _defaultDex) public onlyOwner {
+    function configDefaultDex(uint256 _defaultDex)
+        public
+        onlyOwner
+        whenStorageMigrated
+    {
         configData.defaultDex = _defaultDex;
     }
 
     function configTokenNameLength(
         uint256 _minimumTokenNameLength,
         uint256 _maximumTokenNameLength
-    ) public onlyOwner {
+    ) public onlyOwner whenStorageMigrated {
         configData.minimumTokenNameLength = _minimumTokenNameLength;
         configData.maximumTokenNameLength = _maximumTokenNameLength;
     }
@@ -102,7 +142,7 @@ contract SavvyFinanceFarmBase is Ownable, AccessControl {
         uint256 _minimumStakingApr,
         uint256 _maximumStakingApr,
         uint256 _defaultStakingApr
-    ) public onlyOwner {
+    ) public onlyOwner whenStorageMigrated {
         configData.minimumStakingApr = _minimumStakingApr;
         configData.maximumStakingApr = _maximumStakingApr;
         configData.defaultStakingApr = _defaultStakingApr;
@@ -112,7 +152,7 @@ contract SavvyFinanceFarmBase is Ownable, AccessControl {
         uint256 _minimumStakeUnstakeFee,
         uint256 _maximumStakeUnstakeFee,
         uint256 _defaultStakeUnstakeFee
-    ) public onlyOwner {
+    ) public onlyOwner whenStorageMigrated {
         configData.minimumStakeUnstakeFee = _minimumStakeUnstakeFee;
         configData.maximumStakeUnstakeFee = _maximumStakeUnstakeFee;
         configData.defaultStakeUnstakeFee = _defaultStakeUnstakeFee;
@@ -122,17 +162,25 @@ contract SavvyFinanceFarmBase is Ownable, AccessControl {
         uint256 _minimumDepositWithdrawFee,
         uint256 _maximumDepositWithdrawFee,
         uint256 _defaultDepositWithdrawFee
-    ) public onlyOwner {
+    ) public onlyOwner whenStorageMigrated {
         configData.minimumDepositWithdrawFee = _minimumDepositWithdrawFee;
         configData.maximumDepositWithdrawFee = _maximumDepositWithdrawFee;
         configData.defaultDepositWithdrawFee = _defaultDepositWithdrawFee;
     }
 
-    function excludeFromFees(address _address) public onlyOwner {
+    function excludeFromFees(address _address)
+        public
+        onlyOwner
+        whenStorageMigrated
+    {
         isExcludedFromFees[_address] = true;
     }
 
-    function includeInFees(address _address) public onlyOwner {
+    function includeInFees(address _address)
+        public
+        onlyOwner
+        whenStorageMigrated
+    {
         isExcludedFromFees[_address] = false;
     }
 
@@ -148,6 +196,57 @@ contract SavvyFinanceFarmBase is Ownable, AccessControl {
         return dexs[_number];
     }
 
+    function getStorageVersion() public view returns (uint256) {
+        return _storageMigration().version;
+    }
+
+    // _value capped at _max. The layout version 1 values that don't fit their
+    // packed field are clamped instead of reverting the whole migration, and
+    // reported with ClampMigratedValue.
+    function _clamp(
+        address _token,
+        address _staker,
+        string memory _field,
+        uint256 _value,
+        uint256 _max
+    ) internal returns (uint256) {
+        if (_value <= _max) return _value;
+        emit ClampMigratedValue(_token, _staker, _field, _value, _max);
+        return _max;
+    }
+
+    function _storageMigration()
+        internal
+        pure
+        returns (StorageMigrationDetails storage storageMigration)
+    {
+        bytes32 slot = STORAGE_MIGRATION_SLOT;
+        assembly {
+            storageMigration.slot := slot
+        }
+    }
+
+    // _addresses[_offset:_offset + _limit], clamped to the array length
+    function _getAddressesPage(
+        address[] storage _addresses,
+        uint256 _offset,
+        uint256 _limit
+    ) internal view returns (address[] memory) {
+        if (_offset >= _addresses.length) return new address[](0);
+        uint256 end = _offset + _limit > _addresses.length
+            ? _addresses.length
+            : _offset + _limit;
+        address[] memory page = new address[](end - _offset);
+        for (uint256 index = _offset; index < end; index++) {
+            page[index - _offset] = _addresses[index];
+        }
+        return page;
+    }
+
+    function _blockTimestamp() internal view returns (uint64) {
+        return SafeCast.toUint64(block.timestamp);
+    }
+
     function _toWei(uint256 _number) internal pure returns (uint256) {
         return _number * (10**18);
     }
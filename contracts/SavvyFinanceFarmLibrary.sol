@@ -9,6 +9,9 @@ import "../interfaces/IUniswapV2Router02.sol";
 
 library SavvyFinanceFarmLibrary {
     address constant ZERO_ADDRESS = 0x0000000000000000000000000000000000000000;
+    // the staking rewards a staker triggers (stake, unstake, claim) are
+    // credited up to this long past block.timestamp
+    uint256 constant STAKING_REWARD_EXTRA_SECONDS = 60 * 60 * 24;
 
     function toWei(uint256 _number) public pure returns (uint256) {
         return _number * (10**18);
@@ -119,7 +122,7 @@ library SavvyFinanceFarmLibrary {
             getTokenValue(
                 _farm,
                 _token,
-                farm.getTokenStakerData(_token, _staker).stakingBalance
+                farm.getTokenStakerSummary(_token, _staker).stakingBalance
             );
     }
 
@@ -148,27 +151,53 @@ library SavvyFinanceFarmLibrary {
             uint256,
             uint256
         )
+    {
+        return
+            calculateStakingRewardUntil(
+                _farm,
+                _token,
+                _staker,
+                block.timestamp + STAKING_REWARD_EXTRA_SECONDS
+            );
+    }
+
+    function calculateStakingRewardUntil(
+        address _farm,
+        address _token,
+        address _staker,
+        uint256 _stakingTimestampEnded
+    )
+        public
+        view
+        returns (
+            uint256,
+            uint256,
+            uint256,
+            uint256
+        )
     {
         SavvyFinanceFarm farm = SavvyFinanceFarm(_farm);
         if (!farm.tokenExists(_token)) return (0, 0, 0, 0);
         if (!farm.stakerExists(_staker)) return (0, 0, 0, 0);
 
-        uint256 stakingAmount = farm
-            .getTokenStakerData(_token, _staker)
-            .stakingBalance;
+        // the summary leaves out the staking rewards history, so the cost of
+        // this call doesn't grow with the number of rewards issued
+        SavvyFinanceFarm.TokenStakerSummaryDetails
+            memory tokenStakerSummary = farm.getTokenStakerSummary(
+                _token,
+                _staker
+            );
+        uint256 stakingAmount = tokenStakerSummary.stakingBalance;
         if (stakingAmount <= 0) return (0, 0, 0, 0);
 
         uint256 stakingApr = farm.getTokenData(_token).stakingApr;
         uint256 stakingRewardRate = stakingApr / 100;
-        uint256 stakingTimestampLastRewarded = farm
-            .getTokenStakerData(_token, _staker)
-            .timestampLastRewarded;
-        uint256 stakingTimestampStarted = stakingTimestampLastRewarded != 0
-            ? stakingTimestampLastRewarded
-            : farm.getTokenStakerData(_token, _staker).timestampAdded;
-        uint256 stakingTimestampEnded = block.timestamp + (60 * 60 * 24);
+        uint256 stakingTimestampStarted = tokenStakerSummary
+            .timestampLastRewarded != 0
+            ? tokenStakerSummary.timestampLastRewarded
+            : tokenStakerSummary.timestampAdded;
         uint256 stakingDurationInSeconds = toWei(
-            stakingTimestampEnded - stakingTimestampStarted
+            _stakingTimestampEnded - stakingTimestampStarted
         );
         uint256 stakingDurationInYears = secondsToYears(
             stakingDurationInSeconds
@@ -0,0 +1,25 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+contract SavvyFinanceFarmMulticall {
+    struct Call {
+        address target;
+        bytes callData;
+    }
+
+    function aggregate(Call[] memory _calls)
+        public
+        view
+        returns (uint256 blockNumber, bytes[] memory returnData)
+    {
+        blockNumber = block.number;
+        returnData = new bytes[](_calls.length);
+        for (uint256 callIndex = 0; callIndex < _calls.length; callIndex++) {
+            (bool success, bytes memory data) = _calls[callIndex]
+                .target
+                .staticcall(_calls[callIndex].callData);
+            require(success, "Multicall call failed.");
+            returnData[callIndex] = data;
+        }
+    }
+}
@@ -12,36 +12,158 @@ contract SavvyFinanceFarmStaker is SavvyFinanceFarmBase {
         uint256 timestampAdded;
         uint256 timestampLastUpdated;
     }
-    mapping(address => StakerDetails) public stakersData;
+    // layout version 1 entries, see SavvyFinanceFarm.migrateStorage
+    mapping(address => StakerDetails) internal legacyStakersData;
+    // StakerDetails packed into 1 slot instead of 4
+    struct PackedStakerDetails {
+        bool isActive;
+        uint32 uniqueTokensStaked;
+        uint64 timestampAdded;
+        uint64 timestampLastUpdated;
+    }
+    struct PackedStakersDetails {
+        mapping(address => PackedStakerDetails) stakers;
+    }
+    bytes32 constant PACKED_STAKERS_SLOT =
+        keccak256("savvy.finance.farm.packed.stakers");
+
+    event UpdateStaker(address indexed staker, StakerDetails stakerData);
 
     function stakerExists(address _staker) public view returns (bool) {
-        for (
-            uint256 stakerIndex = 0;
-            stakerIndex < stakers.length;
-            stakerIndex++
-        ) {
-            if (stakers[stakerIndex] == _staker) return true;
-        }
-        return false;
+        // _addStaker always sets timestampAdded
+        return _stakerData(_staker).timestampAdded != 0;
     }
 
     function getStakers() public view returns (address[] memory) {
         return stakers;
     }
 
+    function getStakersCount() public view returns (uint256) {
+        return stakers.length;
+    }
+
+    function getStakersPage(uint256 _offset, uint256 _limit)
+        public
+        view
+        returns (address[] memory)
+    {
+        return _getAddressesPage(stakers, _offset, _limit);
+    }
+
     function getStakerData(address _staker)
         public
         view
         returns (StakerDetails memory)
     {
-        return stakersData[_staker];
+        return _toStakerDetails(_staker);
+    }
+
+    // the getter of the layout version 1 mapping
+    function stakersData(address _staker)
+        public
+        view
+        returns (
+            bool isActive,
+            uint256 uniqueTokensStaked,
+            uint256 timestampAdded,
+            uint256 timestampLastUpdated
+        )
+    {
+        PackedStakerDetails storage stakerData = _stakerData(_staker);
+        return (
+            stakerData.isActive,
+            stakerData.uniqueTokensStaked,
+            stakerData.timestampAdded,
+            stakerData.timestampLastUpdated
+        );
     }
 
     function _addStaker(address _staker) internal {
         require(!stakerExists(_staker), "Staker already exists.");
-        // uint256 index = stakers.length;
         stakers.push(_staker);
-        // stakersData[_staker].index = index;
-        stakersData[_staker].timestampAdded = block.timestamp;
+        _stakerData(_staker).timestampAdded = _blockTimestamp();
+        _emitUpdateStaker(_staker);
+    }
+
+    function _emitUpdateStaker(address _staker) internal {
+        emit UpdateStaker(_staker, _toStakerDetails(_staker));
+    }
+
+    function _packedStakers()
+        internal
+        pure
+        returns (PackedStakersDetails storage packedStakers)
+    {
+        bytes32 slot = PACKED_STAKERS_SLOT;
+        assembly {
+            packedStakers.slot := slot
+        }
+    }
+
+    function _stakerData(address _staker)
+        internal
+        view
+        returns (PackedStakerDetails storage)
+    {
+        return _packedStakers().stakers[_staker];
+    }
+
+    function _toStakerDetails(address _staker)
+        internal
+        view
+        returns (StakerDetails memory)
+    {
+        PackedStakerDetails storage stakerData = _stakerData(_staker);
+        return
+            StakerDetails(
+                stakerData.isActive,
+                stakerData.uniqueTokensStaked,
+                stakerData.timestampAdded,
+                stakerData.timestampLastUpdated
+            );
+    }
+
+    // copies a layout version 1 entry, see SavvyFinanceFarm.migrateStorage.
+    // Stakers without a layout version 1 entry or already with a packed one
+    // (added since) are skipped, so a later batch can't overwrite them. Values
+    // that don't fit are clamped.
+    function _migrateStaker(address _staker) internal {
+        StakerDetails storage legacyStakerData = legacyStakersData[_staker];
+        if (
+            (legacyStakerData.timestampAdded == 0 &&
+                legacyStakerData.timestampLastUpdated == 0) ||
+            stakerExists(_staker)
+        ) return;
+        _packedStakers().stakers[_staker] = PackedStakerDetails(
+            legacyStakerData.isActive,
+            uint32(
+                _clamp(
+                    address(0x0),
+                    _staker,
+                    "uniqueTokensStaked",
+                    legacyStakerData.uniqueTokensStaked,
+                    type(uint32).max
+                )
+            ),
+            uint64(
+                _clamp(
+                    address(0x0),
+                    _staker,
+                    "timestampAdded",
+                    legacyStakerData.timestampAdded,
+                    type(uint64).max
+                )
+            ),
+            uint64(
+                _clamp(
+                    address(0x0),
+                    _staker,
+                    "timestampLastUpdated",
+                    legacyStakerData.timestampLastUpdated,
+                    type(uint64).max
+                )
+            )
+        );
+        delete legacyStakersData[_staker];
     }
 }
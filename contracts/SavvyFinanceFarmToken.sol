@@ -36,11 +36,63 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
         uint256 timestampAdded;
         uint256 timestampLastUpdated;
     }
-    mapping(address => TokenDetails) public tokensData;
+    // layout version 1 entries, see SavvyFinanceFarm.migrateStorage
+    mapping(address => TokenDetails) internal legacyTokensData;
+    // TokenDetails packed into 6 slots instead of 16. Fees are kept in wei
+    // percents like the config limits, so they are capped at 18.4%.
+    struct PackedTokenDetails {
+        uint128 rewardBalance;
+        uint128 stakingBalance;
+        address rewardToken;
+        uint64 timestampLastUpdated;
+        bool isActive;
+        bool isVerified;
+        bool hasMultiTokenRewards;
+        uint8 category;
+        address admin;
+        uint64 timestampAdded;
+        uint8 dex;
+        uint96 stakingApr;
+        uint64 adminStakeFee;
+        uint64 adminUnstakeFee;
+        uint64 devDepositFee;
+        uint64 devWithdrawFee;
+        uint64 devStakeFee;
+        uint64 devUnstakeFee;
+        string name;
+    }
+    struct PackedTokensDetails {
+        mapping(address => PackedTokenDetails) tokens;
+    }
+    bytes32 constant PACKED_TOKENS_SLOT =
+        keccak256("savvy.finance.farm.packed.tokens");
+    struct NewTokenDetails {
+        address token;
+        string name;
+        uint256 category;
+        uint256 dex;
+        uint256 stakingApr;
+        uint256 adminStakeFee;
+        uint256 adminUnstakeFee;
+        address rewardToken;
+    }
+
+    event AddToken(address indexed token, address indexed admin);
+    // the whole token data, emitted by token admin actions
+    event UpdateToken(address indexed token, TokenDetails tokenData);
+    // the token balances only, emitted by deposits, withdrawals, stakes,
+    // unstakes and rewards to keep them cheap
+    event UpdateTokenBalances(
+        address indexed token,
+        uint256 rewardBalance,
+        uint256 stakingBalance,
+        uint256 timestampLastUpdated
+    );
 
     function configTokenCategory(uint256 _number, string memory _name)
         public
         onlyOwner
+        whenStorageMigrated
     {
         tokenCategory[_number] = _name;
     }
@@ -54,50 +106,74 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
     }
 
     function tokenExists(address _token) public view returns (bool) {
-        for (uint256 tokenIndex = 0; tokenIndex < tokens.length; tokenIndex++) {
-            if (tokens[tokenIndex] == _token) return true;
-        }
-        return false;
+        // addToken always sets timestampAdded
+        return _tokenData(_token).timestampAdded != 0;
     }
 
     function getTokens() public view returns (address[] memory) {
         return tokens;
     }
 
+    function getTokensCount() public view returns (uint256) {
+        return tokens.length;
+    }
+
+    function getTokensPage(uint256 _offset, uint256 _limit)
+        public
+        view
+        returns (address[] memory)
+    {
+        return _getAddressesPage(tokens, _offset, _limit);
+    }
+
     function getTokenData(address _token)
         public
         view
         returns (TokenDetails memory)
     {
-        return tokensData[_token];
+        return _toTokenDetails(_token);
+    }
+
+    // the getter of the layout version 1 mapping
+    function tokensData(address _token)
+        public
+        view
+        returns (TokenDetails memory)
+    {
+        return _toTokenDetails(_token);
     }
 
     function getTokenRewardValue(address _token) public view returns (uint256) {
         return
             _fromWei(
-                tokensData[_token].rewardBalance *
+                _tokenData(_token).rewardBalance *
                     Lib.getTokenPrice(
                         address(this),
                         _token,
-                        tokensData[_token].category
+                        _tokenData(_token).category
                     )
             );
     }
 
-    function setTokenAdmin(address _token, address _admin) public onlyOwner {
+    function setTokenAdmin(address _token, address _admin)
+        public
+        onlyOwner
+        whenStorageMigrated
+    {
         require(tokenExists(_token), "Token does not exist.");
-        if (tokensData[_token].admin != owner())
-            revokeRole(_toRole(_token), tokensData[_token].admin);
-        tokensData[_token].admin = _admin;
-        tokensData[_token].timestampLastUpdated = block.timestamp;
-        grantRole(_toRole(_token), tokensData[_token].admin);
+        if (_tokenData(_token).admin != owner())
+            revokeRole(_toRole(_token), _tokenData(_token).admin);
+        _tokenData(_token).admin = _admin;
+        _tokenData(_token).timestampLastUpdated = _blockTimestamp();
+        grantRole(_toRole(_token), _tokenData(_token).admin);
+        _emitUpdateToken(_token);
     }
 
     function setTokenDevDepositWithdrawFees(
         address _token,
         uint256 _devDepositFee,
         uint256 _devWithdrawFee
-    ) public onlyOwner {
+    ) public onlyOwner whenStorageMigrated {
         _setTokenDepositWithdrawFees(
             _token,
             _devDepositFee,
@@ -110,18 +186,38 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
         address _token,
         uint256 _devStakeFee,
         uint256 _devUnstakeFee
-    ) public onlyOwner {
+    ) public onlyOwner whenStorageMigrated {
         _setTokenStakeUnstakeFees(_token, _devStakeFee, _devUnstakeFee, "dev");
     }
 
-    function verifyToken(address _token) public onlyOwner {
+    function verifyToken(address _token) public onlyOwner whenStorageMigrated {
         require(tokenExists(_token), "Token does not exist.");
-        tokensData[_token].isVerified = true;
+        _tokenData(_token).isVerified = true;
+        _emitUpdateToken(_token);
+    }
+
+    function verifyTokens(address[] memory _tokens)
+        public
+        onlyOwner
+        whenStorageMigrated
+    {
+        for (
+            uint256 tokenIndex = 0;
+            tokenIndex < _tokens.length;
+            tokenIndex++
+        ) {
+            verifyToken(_tokens[tokenIndex]);
+        }
     }
 
-    function unverifyToken(address _token) public onlyOwner {
+    function unverifyToken(address _token)
+        public
+        onlyOwner
+        whenStorageMigrated
+    {
         require(tokenExists(_token), "Token does not exist.");
-        tokensData[_token].isVerified = false;
+        _tokenData(_token).isVerified = false;
+        _emitUpdateToken(_token);
     }
 
     function addToken(
@@ -133,40 +229,87 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
         uint256 _adminStakeFee,
         uint256 _adminUnstakeFee,
         address _rewardToken
-    ) public {
+    ) public whenStorageMigrated {
         require(!tokenExists(_token), "Token already exists.");
         _setupRole(_toRole(_token), owner());
         _setupRole(_toRole(_token), _msgSender());
-        // uint256 index = tokens.length;
         tokens.push(_token);
-        // tokensData[_token].index = index;
-        tokensData[_token].category = _category;
-        tokensData[_token].dex = _dex;
-        tokensData[_token].admin = _msgSender();
-        tokensData[_token].fees.devDepositFee = 1; // in wei
-        tokensData[_token].fees.devWithdrawFee = 1; // in wei
-        tokensData[_token].fees.devStakeFee = 1; // in wei
-        tokensData[_token].fees.devUnstakeFee = 1; // in wei
-        tokensData[_token].timestampAdded = block.timestamp;
+        PackedTokenDetails storage tokenData = _tokenData(_token);
+        tokenData.category = SafeCast.toUint8(_category);
+        tokenData.dex = SafeCast.toUint8(_dex);
+        tokenData.admin = _msgSender();
+        tokenData.devDepositFee = 1; // in wei
+        tokenData.devWithdrawFee = 1; // in wei
+        tokenData.devStakeFee = 1; // in wei
+        tokenData.devUnstakeFee = 1; // in wei
+        tokenData.timestampAdded = _blockTimestamp();
+        emit AddToken(_token, _msgSender());
         setTokenName(_token, _name);
         setTokenStakingApr(_token, _stakingApr);
         setTokenRewardToken(_token, _rewardToken);
         setTokenAdminStakeUnstakeFees(_token, _adminStakeFee, _adminUnstakeFee);
     }
 
-    function activateToken(address _token) public onlyRole(_toRole(_token)) {
+    function addTokens(NewTokenDetails[] memory _tokens)
+        public
+        whenStorageMigrated
+    {
+        for (
+            uint256 tokenIndex = 0;
+            tokenIndex < _tokens.length;
+            tokenIndex++
+        ) {
+            NewTokenDetails memory token = _tokens[tokenIndex];
+            addToken(
+                token.token,
+                token.name,
+                token.category,
+                token.dex,
+                token.stakingApr,
+                token.adminStakeFee,
+                token.adminUnstakeFee,
+                token.rewardToken
+            );
+        }
+    }
+
+    function activateToken(address _token)
+        public
+        onlyRole(_toRole(_token))
+        whenStorageMigrated
+    {
         require(tokenExists(_token), "Token does not exist.");
-        tokensData[_token].isActive = true;
+        _tokenData(_token).isActive = true;
+        _emitUpdateToken(_token);
     }
 
-    function deactivateToken(address _token) public onlyRole(_toRole(_token)) {
+    function activateTokens(address[] memory _tokens)
+        public
+        whenStorageMigrated
+    {
+        for (
+            uint256 tokenIndex = 0;
+            tokenIndex < _tokens.length;
+            tokenIndex++
+        ) {
+            activateToken(_tokens[tokenIndex]);
+        }
+    }
+
+    function deactivateToken(address _token)
+        public
+        onlyRole(_toRole(_token))
+        whenStorageMigrated
+    {
         require(tokenExists(_token), "Token does not exist.");
-        tokensData[_token].isActive = false;
+        _tokenData(_token).isActive = false;
+        _emitUpdateToken(_token);
     }
 
     function excludeFromTokenAdminFees(address _token, address _address)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         isExcludedFromTokenAdminFees[_token][_address] = true;
     }
@@ -174,6 +317,7 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
     function includeInTokenAdminFees(address _token, address _address)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         isExcludedFromTokenAdminFees[_token][_address] = false;
     }
@@ -181,6 +325,7 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
     function setTokenName(address _token, string memory _name)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         require(tokenExists(_token), "Token does not exist.");
         require(
@@ -194,22 +339,26 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
                 "."
             )
         );
-        tokensData[_token].name = _name;
-        tokensData[_token].timestampLastUpdated = block.timestamp;
+        _tokenData(_token).name = _name;
+        _tokenData(_token).timestampLastUpdated = _blockTimestamp();
+        _emitUpdateToken(_token);
     }
 
     function setTokenCategory(address _token, uint256 _category)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         require(tokenExists(_token), "Token does not exist.");
-        tokensData[_token].category = _category;
-        tokensData[_token].timestampLastUpdated = block.timestamp;
+        _tokenData(_token).category = SafeCast.toUint8(_category);
+        _tokenData(_token).timestampLastUpdated = _blockTimestamp();
+        _emitUpdateToken(_token);
     }
 
     function setTokenStakingApr(address _token, uint256 _stakingApr)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         require(tokenExists(_token), "Token does not exist.");
         require(
@@ -223,26 +372,49 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
                 "%."
             )
         );
-        tokensData[_token].stakingApr = _stakingApr;
-        tokensData[_token].timestampLastUpdated = block.timestamp;
+        _tokenData(_token).stakingApr = SafeCast.toUint96(_stakingApr);
+        _tokenData(_token).timestampLastUpdated = _blockTimestamp();
+        _emitUpdateToken(_token);
     }
 
     function setTokenRewardToken(address _token, address _reward_token)
         public
         onlyRole(_toRole(_token))
         onlyRole(_toRole(_reward_token))
+        whenStorageMigrated
     {
         require(tokenExists(_token), "Token does not exist.");
         require(tokenExists(_reward_token), "Reward token does not exist.");
-        tokensData[_token].rewardToken = _reward_token;
-        tokensData[_token].timestampLastUpdated = block.timestamp;
+        _tokenData(_token).rewardToken = _reward_token;
+        _tokenData(_token).timestampLastUpdated = _blockTimestamp();
+        _emitUpdateToken(_token);
+    }
+
+    function setTokensRewardToken(
+        address[] memory _tokens,
+        address[] memory _reward_tokens
+    ) public whenStorageMigrated {
+        require(
+            _tokens.length == _reward_tokens.length,
+            "Tokens and reward tokens length mismatch."
+        );
+        for (
+            uint256 tokenIndex = 0;
+            tokenIndex < _tokens.length;
+            tokenIndex++
+        ) {
+            setTokenRewardToken(
+                _tokens[tokenIndex],
+                _reward_tokens[tokenIndex]
+            );
+        }
     }
 
     function setTokenAdminStakeUnstakeFees(
         address _token,
         uint256 _adminStakeFee,
         uint256 _adminUnstakeFee
-    ) public onlyRole(_toRole(_token)) {
+    ) public onlyRole(_toRole(_token)) whenStorageMigrated {
         _setTokenStakeUnstakeFees(
             _token,
             _adminStakeFee,
@@ -254,23 +426,41 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
     function enableTokenMultiTokenRewards(address _token)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         require(tokenExists(_token), "Token does not exist.");
-        require(tokensData[_token].isVerified, "Token not verified.");
-        tokensData[_token].hasMultiTokenRewards = true;
+        require(_tokenData(_token).isVerified, "Token not verified.");
+        _tokenData(_token).hasMultiTokenRewards = true;
+        _emitUpdateToken(_token);
+    }
+
+    function enableTokensMultiTokenRewards(address[] memory _tokens)
+        public
+        whenStorageMigrated
+    {
+        for (
+            uint256 tokenIndex = 0;
+            tokenIndex < _tokens.length;
+            tokenIndex++
+        ) {
+            enableTokenMultiTokenRewards(_tokens[tokenIndex]);
+        }
     }
 
     function disableTokenMultiTokenRewards(address _token)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         require(tokenExists(_token), "Token does not exist.");
-        tokensData[_token].hasMultiTokenRewards = false;
+        _tokenData(_token).hasMultiTokenRewards = false;
+        _emitUpdateToken(_token);
     }
 
     function depositToken(address _token, uint256 _amount)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         require(tokenExists(_token), "Token does not exist.");
         require(_amount > 0, "Amount must be greater than zero.");
@@ -291,21 +481,24 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
             );
         uint256 depositAmount = _amount - devDepositFeeAmount;
         IERC20(_token).transferFrom(_msgSender(), address(this), depositAmount);
-        tokensData[_token].rewardBalance += depositAmount;
+        _tokenData(_token).rewardBalance += SafeCast.toUint128(depositAmount);
+        _emitUpdateTokenBalances(_token);
     }
 
     function withdrawToken(address _token, uint256 _amount)
         public
         onlyRole(_toRole(_token))
+        whenStorageMigrated
     {
         require(tokenExists(_token), "Token does not exist.");
         require(_amount > 0, "Amount must be greater than zero.");
         require(
-            tokensData[_token].rewardBalance >= _amount,
+            _tokenData(_token).rewardBalance >= _amount,
             "Insufficient reward balance."
         );
 
-        tokensData[_token].rewardBalance -= _amount;
+        _tokenData(_token).rewardBalance -= SafeCast.toUint128(_amount);
+        _emitUpdateTokenBalances(_token);
         (
             uint256 devWithdrawFeeAmount,
             uint256 adminWithdrawFeeAmount
@@ -333,35 +526,35 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
             keccak256(abi.encodePacked(_action)) ==
             keccak256(abi.encodePacked("deposit"))
         ) {
-            devFee = (tokensData[_token].fees.devDepositFee > 1) /* in wei */
-                ? tokensData[_token].fees.devDepositFee
+            devFee = (_tokenData(_token).devDepositFee > 1) /* in wei */
+                ? _tokenData(_token).devDepositFee
                 : configData.defaultDepositWithdrawFee;
         } else if (
             keccak256(abi.encodePacked(_action)) ==
             keccak256(abi.encodePacked("withdraw"))
         ) {
-            devFee = (tokensData[_token].fees.devWithdrawFee > 1) /* in wei */
-                ? tokensData[_token].fees.devWithdrawFee
+            devFee = (_tokenData(_token).devWithdrawFee > 1) /* in wei */
+                ? _tokenData(_token).devWithdrawFee
                 : configData.defaultDepositWithdrawFee;
         } else if (
             keccak256(abi.encodePacked(_action)) ==
             keccak256(abi.encodePacked("stake"))
         ) {
-            devFee = (tokensData[_token].fees.devStakeFee > 1) /* in wei */
-                ? tokensData[_token].fees.devStakeFee
+            devFee = (_tokenData(_token).devStakeFee > 1) /* in wei */
+                ? _tokenData(_token).devStakeFee
                 : configData.defaultStakeUnstakeFee;
-            adminFee = (tokensData[_token].fees.adminStakeFee > 1) /* in wei */
-                ? tokensData[_token].fees.adminStakeFee
+            adminFee = (_tokenData(_token).adminStakeFee > 1) /* in wei */
+                ? _tokenData(_token).adminStakeFee
                 : configData.defaultStakeUnstakeFee;
         } else if (
             keccak256(abi.encodePacked(_action)) ==
             keccak256(abi.encodePacked("unstake"))
         ) {
-            devFee = (tokensData[_token].fees.devUnstakeFee > 1) /* in wei */
-                ? tokensData[_token].fees.devUnstakeFee
+            devFee = (_tokenData(_token).devUnstakeFee > 1) /* in wei */
+                ? _tokenData(_token).devUnstakeFee
                 : configData.defaultStakeUnstakeFee;
-            adminFee = (tokensData[_token].fees.adminUnstakeFee > 1) /* in wei */
-                ? tokensData[_token].fees.adminUnstakeFee
+            adminFee = (_tokenData(_token).adminUnstakeFee > 1) /* in wei */
+                ? _tokenData(_token).adminUnstakeFee
                 : configData.defaultStakeUnstakeFee;
         }
 
@@ -423,16 +616,19 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
             keccak256(abi.encodePacked(_for)) ==
             keccak256(abi.encodePacked("dev"))
         ) {
-            tokensData[_token].fees.devDepositFee = _depositFee;
-            tokensData[_token].fees.devWithdrawFee = _withdrawFee;
+            _tokenData(_token).devDepositFee = SafeCast.toUint64(_depositFee);
+            _tokenData(_token).devWithdrawFee = SafeCast.toUint64(
+                _withdrawFee
+            );
         } else if (
             keccak256(abi.encodePacked(_for)) ==
             keccak256(abi.encodePacked("admin"))
         ) {
-            // tokensData[_token].fees.adminDepositFee = _depositFee;
-            // tokensData[_token].fees.adminWithdrawFee = _withdrawFee;
+            // _tokenData(_token).adminDepositFee = _depositFee;
+            // _tokenData(_token).adminWithdrawFee = _withdrawFee;
         }
-        tokensData[_token].timestampLastUpdated = block.timestamp;
+        _tokenData(_token).timestampLastUpdated = _blockTimestamp();
+        _emitUpdateToken(_token);
     }
 
     function _setTokenStakeUnstakeFees(
@@ -469,16 +665,203 @@ contract SavvyFinanceFarmToken is SavvyFinanceFarmBase {
             keccak256(abi.encodePacked(_for)) ==
             keccak256(abi.encodePacked("dev"))
         ) {
-            tokensData[_token].fees.devStakeFee = _stakeFee;
-            tokensData[_token].fees.devUnstakeFee = _unstakeFee;
+            _tokenData(_token).devStakeFee = SafeCast.toUint64(_stakeFee);
+            _tokenData(_token).devUnstakeFee = SafeCast.toUint64(_unstakeFee);
         } else if (
             keccak256(abi.encodePacked(_for)) ==
             keccak256(abi.encodePacked("admin"))
         ) {
-            tokensData[_token].fees.adminStakeFee = _stakeFee;
-            tokensData[_token].fees.adminUnstakeFee = _unstakeFee;
+            _tokenData(_token).adminStakeFee = SafeCast.toUint64(_stakeFee);
+            _tokenData(_token).adminUnstakeFee = SafeCast.toUint64(
+                _unstakeFee
+            );
         }
-        tokensData[_token].timestampLastUpdated = block.timestamp;
+        _tokenData(_token).timestampLastUpdated = _blockTimestamp();
+        _emitUpdateToken(_token);
+    }
+
+    function _emitUpdateToken(address _token) internal {
+        emit UpdateToken(_token, _toTokenDetails(_token));
+    }
+
+    function _emitUpdateTokenBalances(address _token) internal {
+        PackedTokenDetails storage tokenData = _tokenData(_token);
+        emit UpdateTokenBalances(
+            _token,
+            tokenData.rewardBalance,
+            tokenData.stakingBalance,
+            tokenData.timestampLastUpdated
+        );
+    }
+
+    function _packedTokens()
+        internal
+        pure
+        returns (PackedTokensDetails storage packedTokens)
+    {
+        bytes32 slot = PACKED_TOKENS_SLOT;
+        assembly {
+            packedTokens.slot := slot
+        }
+    }
+
+    function _tokenData(address _token)
+        internal
+        view
+        returns (PackedTokenDetails storage)
+    {
+        return _packedTokens().tokens[_token];
+    }
+
+    function _toTokenDetails(address _token)
+        internal
+        view
+        returns (TokenDetails memory tokenDetails)
+    {
+        PackedTokenDetails storage tokenData = _tokenData(_token);
+        tokenDetails.isActive = tokenData.isActive;
+        tokenDetails.isVerified = tokenData.isVerified;
+        tokenDetails.hasMultiTokenRewards = tokenData.hasMultiTokenRewards;
+        tokenDetails.name = tokenData.name;
+        tokenDetails.category = tokenData.category;
+        tokenDetails.dex = tokenData.dex;
+        tokenDetails.rewardBalance = tokenData.rewardBalance;
+        tokenDetails.stakingBalance = tokenData.stakingBalance;
+        tokenDetails.stakingApr = tokenData.stakingApr;
+        tokenDetails.rewardToken = tokenData.rewardToken;
+        tokenDetails.admin = tokenData.admin;
+        tokenDetails.fees = TokenFeesDetails(
+            tokenData.devDepositFee,
+            tokenData.devWithdrawFee,
+            tokenData.devStakeFee,
+            tokenData.devUnstakeFee,
+            tokenData.adminStakeFee,
+            tokenData.adminUnstakeFee
+        );
+        tokenDetails.timestampAdded = tokenData.timestampAdded;
+        tokenDetails.timestampLastUpdated = tokenData.timestampLastUpdated;
+    }
+
+    // copies a layout version 1 entry, see SavvyFinanceFarm.migrateStorage.
+    // Tokens already migrated are skipped. Balances that don't fit revert (the
+    // upgrade script checks them first), the other values are clamped.
+    function _migrateToken(address _token) internal {
+        TokenDetails storage legacyTokenData = legacyTokensData[_token];
+        if (legacyTokenData.timestampAdded == 0 || tokenExists(_token)) return;
+        TokenFeesDetails storage legacyFees = legacyTokenData.fees;
+        PackedTokenDetails storage tokenData = _tokenData(_token);
+        tokenData.rewardBalance = SafeCast.toUint128(
+            legacyTokenData.rewardBalance
+        );
+        tokenData.stakingBalance = SafeCast.toUint128(
+            legacyTokenData.stakingBalance
+        );
+        tokenData.rewardToken = legacyTokenData.rewardToken;
+        tokenData.timestampLastUpdated = uint64(
+            _clamp(
+                _token,
+                address(0x0),
+                "timestampLastUpdated",
+                legacyTokenData.timestampLastUpdated,
+                type(uint64).max
+            )
+        );
+        tokenData.isActive = legacyTokenData.isActive;
+        tokenData.isVerified = legacyTokenData.isVerified;
+        tokenData.hasMultiTokenRewards = legacyTokenData.hasMultiTokenRewards;
+        tokenData.category = uint8(
+            _clamp(
+                _token,
+                address(0x0),
+                "category",
+                legacyTokenData.category,
+                type(uint8).max
+            )
+        );
+        tokenData.admin = legacyTokenData.admin;
+        tokenData.timestampAdded = uint64(
+            _clamp(
+                _token,
+                address(0x0),
+                "timestampAdded",
+                legacyTokenData.timestampAdded,
+                type(uint64).max
+            )
+        );
+        tokenData.dex = uint8(
+            _clamp(
+                _token,
+                address(0x0),
+                "dex",
+                legacyTokenData.dex,
+                type(uint8).max
+            )
+        );
+        tokenData.stakingApr = uint96(
+            _clamp(
+                _token,
+                address(0x0),
+                "stakingApr",
+                legacyTokenData.stakingApr,
+                type(uint96).max
+            )
+        );
+        tokenData.adminStakeFee = uint64(
+            _clamp(
+                _token,
+                address(0x0),
+                "adminStakeFee",
+                legacyFees.adminStakeFee,
+                type(uint64).max
+            )
+        );
+        tokenData.adminUnstakeFee = uint64(
+            _clamp(
+                _token,
+                address(0x0),
+                "adminUnstakeFee",
+                legacyFees.adminUnstakeFee,
+                type(uint64).max
+            )
+        );
+        tokenData.devDepositFee = uint64(
+            _clamp(
+                _token,
+                address(0x0),
+                "devDepositFee",
+                legacyFees.devDepositFee,
+                type(uint64).max
+            )
+        );
+        tokenData.devWithdrawFee = uint64(
+            _clamp(
+                _token,
+                address(0x0),
+                "devWithdrawFee",
+                legacyFees.devWithdrawFee,
+                type(uint64).max
+            )
+        );
+        tokenData.devStakeFee = uint64(
+            _clamp(
+                _token,
+                address(0x0),
+                "devStakeFee",
+                legacyFees.devStakeFee,
+                type(uint64).max
+            )
+        );
+        tokenData.devUnstakeFee = uint64(
+            _clamp(
+                _token,
+                address(0x0),
+                "devUnstakeFee",
+                legacyFees.devUnstakeFee,
+                type(uint64).max
+            )
+        );
+        tokenData.name = legacyTokenData.name;
+        delete legacyTokensData[_token];
     }
 
     function _toRole(address a) internal pure returns (bytes32) {
@@ -7,4 +7,9 @@ contract MockToken is ERC20 {
     constructor() ERC20("Mock Token", "MT") {
         _mint(msg.sender, 1000000 * (10**18));
     }
+
+    // to test amounts past the initial supply
+    function mint(address _to, uint256 _amount) public {
+        _mint(_to, _amount);
+    }
 }
@@ -0,0 +1,24 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+/**
+ * @title MockUniswapV2Router
+ * @notice Router and factory without any pair, so that
+ * SavvyFinanceFarmLibrary.getTokenPrice falls back to its
+ * default price of 1 on networks without a DEX
+ */
+contract MockUniswapV2Router {
+    address public WETH;
+
+    constructor(address _weth) {
+        WETH = _weth;
+    }
+
+    function factory() public view returns (address) {
+        return address(this);
+    }
+
+    function getPair(address, address) public pure returns (address) {
+        return address(0);
+    }
+}
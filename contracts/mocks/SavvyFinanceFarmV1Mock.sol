@@ -0,0 +1,174 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+import "@openzeppelin/contracts/access/Ownable.sol";
+import "@openzeppelin/contracts/access/AccessControl.sol";
+
+// The storage layout version 1 of SavvyFinanceFarm (Base, Token, Staker and
+// Farm state variables in order, entries unpacked), with setters to fill it,
+// to test the upgrade to the packed layout and SavvyFinanceFarm.migrateStorage
+contract SavvyFinanceFarmV1Mock is Ownable, AccessControl {
+    // SavvyFinanceFarmBase
+    struct ConfigDetails {
+        address developmentWallet;
+        uint256 defaultDex;
+        uint256 minimumTokenNameLength;
+        uint256 maximumTokenNameLength;
+        uint256 minimumStakingApr;
+        uint256 maximumStakingApr;
+        uint256 defaultStakingApr;
+        uint256 minimumStakeUnstakeFee;
+        uint256 maximumStakeUnstakeFee;
+        uint256 defaultStakeUnstakeFee;
+        uint256 minimumDepositWithdrawFee;
+        uint256 maximumDepositWithdrawFee;
+        uint256 defaultDepositWithdrawFee;
+    }
+    ConfigDetails public configData;
+    struct DexDetails {
+        string name;
+        address router;
+        address usdToken;
+    }
+    mapping(uint256 => DexDetails) public dexs;
+    mapping(address => bool) public isExcludedFromFees;
+
+    // SavvyFinanceFarmToken
+    mapping(uint256 => string) public tokenCategory;
+    mapping(address => mapping(address => bool))
+        public isExcludedFromTokenAdminFees;
+    address[] public tokens;
+    struct TokenFeesDetails {
+        uint256 devDepositFee;
+        uint256 devWithdrawFee;
+        uint256 devStakeFee;
+        uint256 devUnstakeFee;
+        uint256 adminStakeFee;
+        uint256 adminUnstakeFee;
+    }
+    struct TokenDetails {
+        bool isActive;
+        bool isVerified;
+        bool hasMultiTokenRewards;
+        string name;
+        uint256 category;
+        uint256 dex;
+        uint256 rewardBalance;
+        uint256 stakingBalance;
+        uint256 stakingApr;
+        address rewardToken;
+        address admin;
+        TokenFeesDetails fees;
+        uint256 timestampAdded;
+        uint256 timestampLastUpdated;
+    }
+    mapping(address => TokenDetails) public tokensData;
+
+    // SavvyFinanceFarmStaker
+    address[] public stakers;
+    struct StakerDetails {
+        bool isActive;
+        uint256 uniqueTokensStaked;
+        uint256 timestampAdded;
+        uint256 timestampLastUpdated;
+    }
+    mapping(address => StakerDetails) public stakersData;
+
+    // SavvyFinanceFarm
+    struct TokenStakerRewardDetails {
+        uint256 id;
+        address staker;
+        address rewardToken;
+        uint256 rewardTokenPrice;
+        uint256 rewardTokenAmount;
+        address stakedToken;
+        uint256 stakedTokenPrice;
+        uint256 stakedTokenAmount;
+        uint256 stakingApr;
+        uint256 stakingDurationInSeconds;
+        string[2] triggeredBy;
+        uint256 timestampAdded;
+        uint256 timestampLastUpdated;
+    }
+    struct TokenStakerDetails {
+        uint256 rewardBalance;
+        uint256 stakingBalance;
+        address stakingRewardToken;
+        TokenStakerRewardDetails[] stakingRewards;
+        uint256 timestampLastRewarded;
+        uint256 timestampAdded;
+        uint256 timestampLastUpdated;
+    }
+    mapping(address => mapping(address => TokenStakerDetails))
+        public tokensStakersData;
+    bool public compactStakingRewards;
+    mapping(address => mapping(address => uint256))
+        public compactStakingRewardsCount;
+
+    function initialize() public {
+        configData.developmentWallet = _msgSender();
+        _setupRole(DEFAULT_ADMIN_ROLE, _msgSender());
+        _transferOwnership(_msgSender());
+    }
+
+    function getTokens() public view returns (address[] memory) {
+        return tokens;
+    }
+
+    function getStakers() public view returns (address[] memory) {
+        return stakers;
+    }
+
+    function getTokenData(address _token)
+        public
+        view
+        returns (TokenDetails memory)
+    {
+        return tokensData[_token];
+    }
+
+    function setToken(address _token, TokenDetails memory _tokenData)
+        public
+        onlyOwner
+    {
+        if (tokensData[_token].timestampAdded == 0) tokens.push(_token);
+        tokensData[_token] = _tokenData;
+    }
+
+    function setStaker(address _staker, StakerDetails memory _stakerData)
+        public
+        onlyOwner
+    {
+        if (stakersData[_staker].timestampAdded == 0) stakers.push(_staker);
+        stakersData[_staker] = _stakerData;
+    }
+
+    function setTokenStaker(
+        address _token,
+        address _staker,
+        uint256 _rewardBalance,
+        uint256 _stakingBalance,
+        address _stakingRewardToken,
+        uint256 _timestampLastRewarded,
+        uint256 _timestampAdded,
+        uint256 _timestampLastUpdated
+    ) public onlyOwner {
+        TokenStakerDetails storage tokenStakerData = tokensStakersData[_token][
+            _staker
+        ];
+        tokenStakerData.rewardBalance = _rewardBalance;
+        tokenStakerData.stakingBalance = _stakingBalance;
+        tokenStakerData.stakingRewardToken = _stakingRewardToken;
+        tokenStakerData.timestampLastRewarded = _timestampLastRewarded;
+        tokenStakerData.timestampAdded = _timestampAdded;
+        tokenStakerData.timestampLastUpdated = _timestampLastUpdated;
+    }
+
+    function pushStakingReward(
+        address _token,
+        address _staker,
+        TokenStakerRewardDetails memory _stakingReward
+    ) public onlyOwner {
+        tokensStakersData[_token][_staker].stakingRewards.push(_stakingReward);
+    }
+}
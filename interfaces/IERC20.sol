@@ -31,6 +31,11 @@ interface IERC20 {
      */
     function symbol() external view returns (string memory);
 
+    /**
+     * @dev Returns the decimals places of the token.
+     */
+    function decimals() external view returns (uint8);
+
     /**
      * @dev Returns the amount of tokens in existence.
      */
@@ -0,0 +1,547 @@
+from brownie import MockToken, MockUniswapV2Router, accounts, chain, network, web3
+from brownie.convert import to_address
+from scripts.common import (
+    get_account,
+    to_wei,
+    send_transactions,
+)
+from scripts.savvy_finance_farm import (
+    get_contracts,
+    erc20_token_transfer,
+    deposit_token,
+    stake_token,
+    add_tokens,
+    activate_tokens,
+    verify_tokens,
+    enable_tokens_multi_token_rewards,
+)
+import os, sys, json, itertools, subprocess, time
+
+BENCHMARKS_FOLDER = "./benchmarks"
+# seconds to move the chain forward before a call that issues a staking reward
+BENCHMARK_STAKING_DURATION = 60
+# relative increase of a metric between two runs that is flagged as a regression
+BENCHMARK_TOLERANCES = {"gasUsed": 0.01, "wallTimeMs": 0.5, "storageSlots": 0}
+# run by benchmark_import_time in a fresh interpreter. The contract containers
+# the scripts import from brownie only exist once the project is loaded.
+IMPORT_TIME_SCRIPT = """
+from brownie import project
+project.load(".")
+import {module_name}
+"""
+
+
+def deploy_mock_tokens(count, account=None):
+    account = account or get_account()
+    return {
+        "mt" + str(index): MockToken.deploy({"from": account}).address
+        for index in range(count)
+    }
+
+
+def config_mock_dex(contract, weth_token, account=None):
+    """Points the farm dex 0 at a MockUniswapV2Router, so every token is priced
+    at 1 on networks without a DEX.
+    """
+    account = account or get_account()
+    router = MockUniswapV2Router.deploy(weth_token, {"from": account})
+    contract.configDex(0, ("Mock", router.address, weth_token), {"from": account})
+    return router
+
+
+def get_gas_used(receipts):
+    return sum(receipt.gas_used for receipt in receipts if receipt is not None)
+
+
+def benchmark_token_onboarding(tokens_count=10, account=None):
+    """Compares the gas used to add, activate, verify and enable multi token
+    rewards for `tokens_count` tokens with the single-token calls and with the
+    batch entry points, each on a freshly deployed farm.
+    Returns:
+        [dict]: action => (single gas used, batch gas used).
+    """
+    account = account or get_account()
+    (_, _, single_farm, _) = get_contracts("all")
+    single_tokens = deploy_mock_tokens(tokens_count, account)
+    single_receipts = {
+        "addToken": send_transactions(
+            [
+                (
+                    single_farm.addToken,
+                    (
+                        token,
+                        token_name.upper(),
+                        0,
+                        0,
+                        to_wei(100),
+                        to_wei(1),
+                        to_wei(1),
+                        token,
+                    ),
+                    "Added " + token_name + " token.",
+                )
+                for token_name, token in single_tokens.items()
+            ],
+            account,
+            pipelined=False,
+        )
+    }
+    for action in ["activateToken", "verifyToken", "enableTokenMultiTokenRewards"]:
+        single_receipts[action] = send_transactions(
+            [
+                (getattr(single_farm, action), (token,), action + " " + token_name)
+                for token_name, token in single_tokens.items()
+            ],
+            account,
+            pipelined=False,
+        )
+
+    (_, _, batch_farm, _) = get_contracts("all")
+    batch_tokens = deploy_mock_tokens(tokens_count, account)
+    batch_receipts = {
+        "addToken": add_tokens(batch_farm, batch_tokens, account),
+        "activateToken": activate_tokens(batch_farm, batch_tokens, account),
+        "verifyToken": verify_tokens(batch_farm, batch_tokens, account),
+        "enableTokenMultiTokenRewards": enable_tokens_multi_token_rewards(
+            batch_farm, batch_tokens, account
+        ),
+    }
+
+    results = {}
+    for action in single_receipts:
+        single_gas_used = get_gas_used(single_receipts[action])
+        batch_gas_used = get_gas_used(batch_receipts[action])
+        results[action] = (single_gas_used, batch_gas_used)
+        print(
+            action
+            + " x "
+            + str(tokens_count)
+            + ": "
+            + str(single_gas_used)
+            + " gas in "
+            + str(len(single_receipts[action]))
+            + " transactions, "
+            + str(batch_gas_used)
+            + " gas in "
+            + str(len(batch_receipts[action]))
+            + " transactions ("
+            + str(round(100 - batch_gas_used * 100 / single_gas_used, 2))
+            + "% saved).",
+            "\n\n",
+        )
+    return results
+
+
+def add_stakers(contract, token, count, account=None):
+    """Adds `count` new stakers to the farm, each from a new funded account, by
+    setting their staking reward token (the cheapest call that adds a staker).
+    """
+    account = account or get_account()
+    for _ in range(count):
+        staker = accounts.add()
+        account.transfer(staker, to_wei(0.01), silent=True)
+        contract.changeStakingRewardToken(token, token, {"from": staker})
+
+
+def benchmark_staker_membership(stakers_counts=(10, 1000, 10000), account=None):
+    """Measures the gas a new staker's first call and a stakerExists lookup cost
+    as the number of stakers grows. Both only read the staker's own entry, so
+    they stay flat.
+    Returns:
+        [dict]: stakers count => (new staker gas used, stakerExists gas).
+    """
+    account = account or get_account()
+    (_, proxy_savvy_finance, proxy_savvy_finance_farm, _) = get_contracts("all")
+    token = proxy_savvy_finance.address
+    add_tokens(proxy_savvy_finance_farm, {"svf": token}, account)
+
+    results = {}
+    stakers_count = 0
+    for target_stakers_count in sorted(stakers_counts):
+        add_stakers(
+            proxy_savvy_finance_farm, token, target_stakers_count - stakers_count
+        )
+        stakers_count = target_stakers_count
+        staker = accounts.add()
+        account.transfer(staker, to_wei(0.01), silent=True)
+        new_staker_gas_used = proxy_savvy_finance_farm.changeStakingRewardToken(
+            token, token, {"from": staker}
+        ).gas_used
+        stakers_count += 1
+        staker_exists_gas = proxy_savvy_finance_farm.stakerExists.estimate_gas(
+            get_account(1).address
+        )
+        results[target_stakers_count] = (new_staker_gas_used, staker_exists_gas)
+        print(
+            str(target_stakers_count)
+            + " stakers: new staker "
+            + str(new_staker_gas_used)
+            + " gas, stakerExists "
+            + str(staker_exists_gas)
+            + " gas.",
+            "\n\n",
+        )
+    return results
+
+
+def benchmark_compact_staking_rewards(claims_count=20, account=None):
+    """Measures the gas of a staking reward claim with the rewards history kept
+    in storage and with compact staking rewards (kept bit packed in the logs).
+    Returns:
+        [tuple]: (stored claim gas used, compact claim gas used), per claim.
+    """
+    account = account or get_account()
+    staker = get_account(1)
+    (_, proxy_savvy_finance, proxy_savvy_finance_farm, _) = get_contracts("all")
+    config_mock_dex(proxy_savvy_finance_farm, proxy_savvy_finance.address, account)
+    token = proxy_savvy_finance.address
+    tokens = {"svf": token}
+    add_tokens(proxy_savvy_finance_farm, tokens, account)
+    activate_tokens(proxy_savvy_finance_farm, tokens, account)
+    erc20_token_transfer(proxy_savvy_finance, staker.address, 10000, account)
+    deposit_token(proxy_savvy_finance_farm, proxy_savvy_finance, 100000, account)
+    stake_token(proxy_savvy_finance_farm, proxy_savvy_finance, 1000, staker)
+
+    claims_gas_used = {}
+    for compact in [False, True]:
+        proxy_savvy_finance_farm.configCompactStakingRewards(compact, {"from": account})
+        claims_gas_used[compact] = []
+        for _ in range(claims_count):
+            chain.sleep(BENCHMARK_STAKING_DURATION)
+            claims_gas_used[compact].append(
+                proxy_savvy_finance_farm.claimStakingReward(
+                    token, {"from": staker}
+                ).gas_used
+            )
+    stored_gas_used = sum(claims_gas_used[False]) / claims_count
+    compact_gas_used = sum(claims_gas_used[True]) / claims_count
+    print(
+        "claimStakingReward: "
+        + str(round(stored_gas_used))
+        + " gas stored, "
+        + str(round(compact_gas_used))
+        + " gas compact ("
+        + str(round(100 - compact_gas_used * 100 / stored_gas_used, 2))
+        + "% saved).",
+        "\n\n",
+    )
+    return list(zip(claims_gas_used[False], claims_gas_used[True]))
+
+
+def benchmark_import_time(
+    module_names=("scripts.common", "scripts.savvy_finance_farm"),
+    repeats=5,
+    tree=".",
+):
+    """Measures the cold start every script pays before doing any work: each
+    module is imported in a fresh interpreter, once the brownie project of
+    `tree` is loaded like `brownie run` does, and timed with
+    `python -X importtime`.
+    Args:
+        tree (string, optional): The project checkout to import the modules
+        from, e.g. a `git worktree` of the base commit.
+    Returns:
+        [dict]: module name => best of `repeats` cumulative import times in
+        milliseconds.
+    """
+    tree = os.path.abspath(tree)
+    results = {}
+    for module_name in module_names:
+        import_times = []
+        for _ in range(repeats):
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-X",
+                    "importtime",
+                    "-c",
+                    IMPORT_TIME_SCRIPT.format(module_name=module_name),
+                ],
+                cwd=tree,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            import_times.append(get_import_time(process.stderr, module_name))
+        results[module_name] = min(import_times)
+        print(
+            module_name + " import: " + str(round(results[module_name], 2)) + " ms.",
+            "\n\n",
+        )
+    return results
+
+
+def get_import_time(importtime_output, module_name):
+    # "import time: self [us] | cumulative | imported package" lines
+    for line in importtime_output.splitlines():
+        columns = line.split("|")
+        if len(columns) == 3 and columns[2].strip() == module_name:
+            return int(columns[1]) / 1000
+    raise ValueError(module_name + " was not imported.")
+
+
+def compare_import_time(
+    base_tree,
+    head_tree=".",
+    module_names=("scripts.common", "scripts.savvy_finance_farm"),
+    repeats=5,
+):
+    """Runs benchmark_import_time on two checkouts.
+    Returns:
+        [dict]: module name => (base ms, head ms).
+    """
+    base_results = benchmark_import_time(module_names, repeats, base_tree)
+    head_results = benchmark_import_time(module_names, repeats, head_tree)
+    comparison = {}
+    for module_name in module_names:
+        comparison[module_name] = (base_results[module_name], head_results[module_name])
+        print(
+            module_name
+            + " import: "
+            + str(round(base_results[module_name], 2))
+            + " ms => "
+            + str(round(head_results[module_name], 2))
+            + " ms.",
+            "\n\n",
+        )
+    return comparison
+
+
+def get_storage_growth(tx):
+    """Counts the storage slots a transaction filled minus the ones it cleared,
+    across every contract it wrote to.
+    """
+    storage_addresses = [tx.receiver]
+    written_slots = set()
+    trace = tx.trace
+    for step_index, step in enumerate(trace):
+        if step["depth"] > len(storage_addresses):
+            previous_step = trace[step_index - 1]
+            if previous_step["op"] in ["DELEGATECALL", "CALLCODE"]:
+                storage_addresses.append(storage_addresses[-1])
+            elif previous_step["op"] in ["CALL", "STATICCALL"]:
+                storage_addresses.append(
+                    to_address("0x" + previous_step["stack"][-2][-40:])
+                )
+            else:
+                storage_addresses.append(None)
+        del storage_addresses[step["depth"] :]
+        if step["op"] == "SSTORE" and storage_addresses[-1] is not None:
+            written_slots.add((storage_addresses[-1], int(step["stack"][-1], 16)))
+
+    storage_growth = 0
+    for address, slot in written_slots:
+        before = int(
+            web3.eth.get_storage_at(address, slot, tx.block_number - 1).hex(), 16
+        )
+        after = int(web3.eth.get_storage_at(address, slot, tx.block_number).hex(), 16)
+        if before == 0 and after != 0:
+            storage_growth += 1
+        elif before != 0 and after == 0:
+            storage_growth -= 1
+    return storage_growth
+
+
+def measure_transaction(contract_call, args, account):
+    start = time.perf_counter()
+    tx = contract_call(*args, {"from": account})
+    tx.wait(1)
+    wall_time_ms = (time.perf_counter() - start) * 1000
+    return {
+        "gasUsed": tx.gas_used,
+        "wallTimeMs": round(wall_time_ms, 3),
+        "storageSlots": get_storage_growth(tx),
+    }
+
+
+def benchmark_farm_operations(
+    tokens_count=1, stakers_count=1, rewards_count=1, account=None
+):
+    """Deploys a farm with `tokens_count` tokens, each staked by `stakers_count`
+    stakers that already claimed `rewards_count` staking rewards, and measures
+    the farm operations on the first token, as its admin and as the last staker.
+    Returns:
+        [dict]: operation => {gasUsed, wallTimeMs, storageSlots}.
+    """
+    account = account or get_account()
+    (_, proxy_savvy_finance, proxy_savvy_finance_farm, _) = get_contracts("all")
+    config_mock_dex(proxy_savvy_finance_farm, proxy_savvy_finance.address, account)
+    tokens = deploy_mock_tokens(tokens_count, account)
+    add_tokens(proxy_savvy_finance_farm, tokens, account)
+    activate_tokens(proxy_savvy_finance_farm, tokens, account)
+    tokens_contracts = [MockToken.at(token) for token in tokens.values()]
+    for token_contract in tokens_contracts:
+        deposit_token(proxy_savvy_finance_farm, token_contract, 100000, account)
+
+    stakers = []
+    for _ in range(stakers_count):
+        staker = accounts.add()
+        account.transfer(staker, to_wei(1), silent=True)
+        for token_contract in tokens_contracts:
+            erc20_token_transfer(token_contract, staker.address, 100, account)
+            stake_token(proxy_savvy_finance_farm, token_contract, 50, staker)
+        stakers.append(staker)
+    for _ in range(rewards_count):
+        chain.sleep(BENCHMARK_STAKING_DURATION)
+        for staker, token_contract in itertools.product(stakers, tokens_contracts):
+            proxy_savvy_finance_farm.claimStakingReward(
+                token_contract.address, {"from": staker}
+            )
+
+    token_contract = tokens_contracts[0]
+    token = token_contract.address
+    staker = stakers[-1]
+    amount = to_wei(10)
+    token_contract.approve(proxy_savvy_finance_farm.address, amount, {"from": account})
+    token_contract.approve(proxy_savvy_finance_farm.address, amount, {"from": staker})
+    results = {
+        "depositToken": measure_transaction(
+            proxy_savvy_finance_farm.depositToken, (token, amount), account
+        ),
+        "withdrawToken": measure_transaction(
+            proxy_savvy_finance_farm.withdrawToken, (token, amount), account
+        ),
+    }
+    for function_name, args in [
+        ("stakeToken", (token, amount)),
+        ("claimStakingReward", (token,)),
+        ("unstakeToken", (token, amount)),
+    ]:
+        chain.sleep(BENCHMARK_STAKING_DURATION)
+        results[function_name] = measure_transaction(
+            getattr(proxy_savvy_finance_farm, function_name), args, staker
+        )
+    reward_balance = proxy_savvy_finance_farm.getTokenStakerSummary(
+        token, staker.address
+    )[0]
+    results["withdrawRewardToken"] = measure_transaction(
+        proxy_savvy_finance_farm.withdrawRewardToken, (token, reward_balance), staker
+    )
+    return results
+
+
+def run_benchmarks(
+    tokens_counts=(1, 5),
+    stakers_counts=(1, 10),
+    rewards_counts=(1, 10),
+    path=None,
+    account=None,
+):
+    """Runs benchmark_farm_operations for every combination of the counts and
+    writes the results to a JSON file, to be compared with compare_benchmarks.
+    Args:
+        path (string, optional): Defaults to
+        ./benchmarks/<active network>-<unix time>.json.
+    Returns:
+        [string]: The path of the JSON file.
+    """
+    account = account or get_account()
+    if not path:
+        os.makedirs(BENCHMARKS_FOLDER, exist_ok=True)
+        path = os.path.join(
+            BENCHMARKS_FOLDER,
+            network.show_active() + "-" + str(int(time.time())) + ".json",
+        )
+    runs = []
+    for tokens_count, stakers_count, rewards_count in itertools.product(
+        tokens_counts, stakers_counts, rewards_counts
+    ):
+        runs.append(
+            {
+                "tokensCount": tokens_count,
+                "stakersCount": stakers_count,
+                "rewardsCount": rewards_count,
+                "operations": benchmark_farm_operations(
+                    tokens_count, stakers_count, rewards_count, account
+                ),
+            }
+        )
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "network": network.show_active(),
+                "timestamp": int(time.time()),
+                "runs": runs,
+            },
+            file,
+            indent=4,
+        )
+    print("Wrote benchmarks to " + path + ".", "\n\n")
+    return path
+
+
+def compare_benchmarks(base_path, head_path, tolerances=BENCHMARK_TOLERANCES):
+    """Compares two run_benchmarks files and flags every metric of the head run
+    that grew by more than its tolerance over the base run.
+    Returns:
+        [list]: The regressions, as dicts.
+    """
+    with open(base_path) as file:
+        base_runs = json.load(file)["runs"]
+    with open(head_path) as file:
+        head_runs = json.load(file)["runs"]
+
+    def get_run_key(run):
+        return (run["tokensCount"], run["stakersCount"], run["rewardsCount"])
+
+    base_runs = {get_run_key(run): run for run in base_runs}
+    regressions = []
+    for head_run in head_runs:
+        base_run = base_runs.get(get_run_key(head_run))
+        if not base_run:
+            continue
+        for operation, head_metrics in head_run["operations"].items():
+            base_metrics = base_run["operations"].get(operation)
+            if not base_metrics:
+                continue
+            for metric, tolerance in tolerances.items():
+                base_value = base_metrics[metric]
+                head_value = head_metrics[metric]
+                if head_value <= base_value + abs(base_value) * tolerance:
+                    continue
+                regressions.append(
+                    {
+                        "tokensCount": head_run["tokensCount"],
+                        "stakersCount": head_run["stakersCount"],
+                        "rewardsCount": head_run["rewardsCount"],
+                        "operation": operation,
+                        "metric": metric,
+                        "base": base_value,
+                        "head": head_value,
+                    }
+                )
+                print(
+                    "Regression: "
+                    + operation
+                    + " "
+                    + metric
+                    + " "
+                    + str(base_value)
+                    + " -> "
+                    + str(head_value)
+                    + " with "
+                    + str(head_run["tokensCount"])
+                    + " tokens, "
+                    + str(head_run["stakersCount"])
+                    + " stakers, "
+                    + str(head_run["rewardsCount"])
+                    + " rewards per staker.",
+                    "\n\n",
+                )
+    if not regressions:
+        print("No regressions.", "\n\n")
+    return regressions
+
+
+def main():
+    # BENCHMARK_BASE_TREE: a checkout of the base commit to compare with
+    base_tree = os.getenv("BENCHMARK_BASE_TREE")
+    if base_tree:
+        compare_import_time(base_tree)
+    else:
+        benchmark_import_time()
+    benchmark_staker_membership()
+    benchmark_compact_staking_rewards()
+    run_benchmarks()
+    for tokens_count in [1, 10, 20]:
+        benchmark_token_onboarding(tokens_count)
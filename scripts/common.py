@@ -13,7 +13,11 @@ from brownie import (
     web3,
     interface,
 )
-import os, shutil, json, requests
+from brownie.exceptions import VirtualMachineError
+from concurrent.futures import ThreadPoolExecutor
+from web3.exceptions import TransactionNotFound
+from scripts.instrumentation import instrumented
+import os, shutil, json, time, hashlib, requests, contextvars
 
 NON_FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS = ["development", "ganache", "hardhat"]
 FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS = [
@@ -23,6 +27,30 @@ FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS = [
 LOCAL_BLOCKCHAIN_ENVIRONMENTS = (
     NON_FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS + FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS
 )
+MULTICALL_CHUNK_SIZE = 100
+RPC_RETRIES = 3
+RPC_RETRY_BACKOFF_IN_SECONDS = 0.5
+TRANSACTION_RETRIES = 2
+TRANSACTION_TIMEOUT_IN_SECONDS = 300
+TRANSACTION_POLL_INTERVAL_IN_SECONDS = 1
+# nodes only replace a pending transaction paying at least 10% more
+TRANSACTION_GAS_PRICE_BUMP = 1.125
+# failure of a transaction whose nonce was used by another transaction of the
+# account, see send_transactions
+NONCE_USED_FAILURE = "Nonce used by another transaction."
+# JSON-RPC error codes returned by rate limited or overloaded nodes
+TRANSIENT_RPC_ERROR_CODES = [-32005, 429]
+DEPLOYMENTS_FOLDER = "./deployments"
+# EIP-1967 storage slots of TransparentUpgradeableProxy
+IMPLEMENTATION_SLOT = (
+    "0x360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc"
+)
+ADMIN_SLOT = "0xb53127684a568b3173ae13b9f8a6016e243e63b6e8ee1178d6a717850b5d6103"
+
+# (network, index, id) => account, see get_account
+accounts_cache = {}
+# (network, implementation address) => deployed code, see has_function
+implementations_code_cache = {}
 
 contract_name_to_mock = {
     # "token": MockToken,
@@ -52,18 +80,29 @@ def from_wei(number):
 
 
 def get_account(index=0, id=None):
+    """Resolved at call time (functions default to `account=None`) rather than at
+    import, and cached per active network, since loading or adding an account
+    decrypts a keystore or derives a key and adds a duplicate on every call.
+    """
     if network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
         return accounts[index]
-    if id:
-        return accounts.load(id)
-    return accounts.add(config["wallets"]["development"]["private_key"])
+    cache_key = (network.show_active(), index, id)
+    if cache_key not in accounts_cache:
+        if id:
+            accounts_cache[cache_key] = accounts.load(id)
+        else:
+            accounts_cache[cache_key] = accounts.add(
+                config["wallets"]["development"]["private_key"]
+            )
+    return accounts_cache[cache_key]
 
 
 def get_address(address_name):
     return config["addresses"][address_name]
 
 
-def get_contract_address(contract_name, network_name=network.show_active()):
+def get_contract_address(contract_name, network_name=None):
+    network_name = network_name or network.show_active()
     return config["networks"][network_name]["contracts"][contract_name]
 
 
@@ -113,10 +152,11 @@ def get_contract(contract_name):
     return contract
 
 
-def deploy_contract_mocks(account=get_account()):
+def deploy_contract_mocks(account=None):
     """
     Use this script if you want to deploy contract mocks to a testnet.
     """
+    account = account or get_account()
     print(f"Current active network is {network.show_active()}.")
     print("Deploying Contract Mocks...")
     # print("Deploying Mock Token...")
@@ -136,7 +176,8 @@ def deploy_contract_mocks(account=get_account()):
     print("Contract Mocks Deployed!")
 
 
-def fund_with_link(address, amount=web3.toWei(0.1, "ether"), account=get_account()):
+def fund_with_link(address, amount=web3.toWei(0.1, "ether"), account=None):
+    account = account or get_account()
     link_token = get_contract("link_token")
     ### Keep this line to show how it could be done without deploying a contract mock.
     # tx = interface.ILinkToken(link_token.address).transfer(
@@ -167,22 +208,382 @@ def encode_function_data(*args, initializer=None):
     return b""
 
 
-def deploy_proxy_admin(account=get_account()):
+def is_transient_rpc_error(error):
+    if isinstance(
+        error,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.HTTPError,
+        ),
+    ):
+        return True
+    if isinstance(error, ValueError) and error.args:
+        rpc_error = error.args[0]
+        return (
+            isinstance(rpc_error, dict)
+            and rpc_error.get("code") in TRANSIENT_RPC_ERROR_CODES
+        )
+    return False
+
+
+def call_with_retry(
+    function, args=(), retries=RPC_RETRIES, backoff=RPC_RETRY_BACKOFF_IN_SECONDS
+):
+    for attempt in range(retries + 1):
+        try:
+            return function(*args)
+        except Exception as error:
+            if attempt == retries or not is_transient_rpc_error(error):
+                raise
+            time.sleep(backoff * (2**attempt))
+
+
+def map_concurrently(
+    function,
+    args_list,
+    max_workers=None,
+    retries=RPC_RETRIES,
+    backoff=RPC_RETRY_BACKOFF_IN_SECONDS,
+):
+    """Calls `function` once per args tuple, retrying transient RPC errors.
+    Args:
+        function (callable): Usually a contract call, e.g. `farm.getTokenData`.
+        args_list (list): One args tuple per call.
+        max_workers (int, optional): Maximum number of calls in flight.
+        Calls run one at a time when not set.
+    Returns:
+        [list]: The results, in the order of `args_list`.
+    """
+    if not max_workers or len(args_list) <= 1:
+        return [call_with_retry(function, args, retries, backoff) for args in args_list]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # every call runs in its own copy of the caller's context, so the
+        # instrumented helper that started it is still active, see
+        # scripts/instrumentation.py
+        return list(
+            executor.map(
+                lambda context, args: context.run(
+                    call_with_retry, function, args, retries, backoff
+                ),
+                [contextvars.copy_context() for _ in args_list],
+                args_list,
+            )
+        )
+
+
+def multicall(
+    multicall_contract,
+    calls,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    block_identifier=None,
+    max_workers=None,
+):
+    """Packs many contract calls into SavvyFinanceFarmMulticall.aggregate eth_calls.
+    Args:
+        multicall_contract (brownie.network.contract.ProjectContract):
+        The deployed SavvyFinanceFarmMulticall contract.
+        calls (list): (contract_call, args) pairs, e.g. `(farm.getTokenData, (token,))`.
+        chunk_size (int, optional): Maximum number of calls per eth_call.
+        block_identifier (int, optional): Block to read the state at.
+        max_workers (int, optional): Maximum number of eth_calls in flight.
+    Returns:
+        [list]: The decoded return value of every call, in the order of `calls`.
+    """
+    chunks = [
+        calls[chunk_start : chunk_start + chunk_size]
+        for chunk_start in range(0, len(calls), chunk_size)
+    ]
+    # pin every chunk to the same block so the results are consistent
+    if block_identifier is None and len(chunks) > 1:
+        block_identifier = web3.eth.block_number
+
+    def aggregate(chunk):
+        block_number, return_data = multicall_contract.aggregate.call(
+            [
+                (contract_call._address, contract_call.encode_input(*args))
+                for contract_call, args in chunk
+            ],
+            block_identifier=block_identifier,
+        )
+        return [
+            contract_call.decode_output(data)
+            for (contract_call, args), data in zip(chunk, return_data)
+        ]
+
+    results = []
+    for chunk_results in map_concurrently(
+        aggregate, [(chunk,) for chunk in chunks], max_workers
+    ):
+        results += chunk_results
+    return results
+
+
+@instrumented
+def batch_calls(
+    calls,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    block_identifier=None,
+):
+    """Runs (contract_call, args) pairs through multicall when a multicall contract
+    is given, or as individual (optionally concurrent) eth_calls otherwise."""
+    if multicall_contract:
+        return multicall(
+            multicall_contract, calls, chunk_size, block_identifier, max_workers
+        )
+    return map_concurrently(
+        lambda contract_call, *args: contract_call(
+            *args, block_identifier=block_identifier
+        ),
+        [(contract_call, *args) for contract_call, args in calls],
+        max_workers,
+    )
+
+
+def batch_call(
+    contract_call,
+    args_list,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    block_identifier=None,
+):
+    return batch_calls(
+        [(contract_call, args) for args in args_list],
+        multicall_contract,
+        chunk_size,
+        max_workers,
+        block_identifier,
+    )
+
+
+@instrumented
+def send_transactions(
+    transactions,
+    account=None,
+    pipelined=True,
+    required_confs=1,
+    retries=TRANSACTION_RETRIES,
+    timeout=TRANSACTION_TIMEOUT_IN_SECONDS,
+):
+    """Sends (contract_tx, args, description) transactions from one account.
+    When pipelined, nonces are assigned locally from the account's pending
+    nonce and the whole batch is broadcast back to back, then all receipts are
+    awaited together, so the batch takes about as many blocks as the slowest
+    transaction instead of one block per transaction. Up to `retries` times,
+    transactions still pending after `timeout` seconds are replaced (same
+    nonce, gas price bumped by TRANSACTION_GAS_PRICE_BUMP), the ones mined
+    without `required_confs` confirmations yet are awaited again, and the
+    ones that failed to broadcast are sent again with a new nonce. Reverts are
+    deterministic, so reverted transactions are reported and not sent again,
+    and neither are the ones whose nonce was used by another transaction of
+    the account, since they may have been mined from another process.
+    Transactions in a batch must not depend on each other, since each one is
+    gas estimated against the state before the batch.
+    Returns:
+        [list]: The receipt of every transaction, None for the ones that failed.
+    """
+    account = account or get_account()
+    if not pipelined:
+        receipts = []
+        for contract_tx, args, description in transactions:
+            tx = contract_tx(*args, {"from": account})
+            tx.wait(required_confs)
+            print(description, "\n\n")
+            receipts.append(tx)
+        return receipts
+
+    receipts = [None] * len(transactions)
+    failures = {}
+    # index => every receipt sent for it, the last one with the highest gas
+    # price. Any of them may be the one mined.
+    sent = {}
+    to_send = list(range(len(transactions)))
+    to_replace = []
+    to_await = []
+    for attempt in range(retries + 1):
+        nonce = web3.eth.get_transaction_count(account.address, "pending")
+        for index in to_send:
+            tx = send_transaction(transactions[index], account, {"nonce": nonce})
+            if isinstance(tx, str):
+                failures[index] = tx
+                continue
+            failures.pop(index, None)
+            nonce += 1
+            sent.setdefault(index, []).append(tx)
+        for index in to_replace:
+            tx = send_transaction(
+                transactions[index],
+                account,
+                get_replacement_parameters(sent[index][-1]),
+            )
+            if isinstance(tx, str):
+                # usually the pending one was mined meanwhile, it is awaited
+                # again below
+                continue
+            sent[index].append(tx)
+
+        pending = [
+            index for index in sent if receipts[index] is None and index not in failures
+        ]
+        mined = wait_for_transactions(
+            {index: sent[index] for index in pending}, required_confs, timeout
+        )
+        to_send = [index for index in failures if not is_final_failure(failures[index])]
+        to_replace = []
+        to_await = []
+        for index in pending:
+            tx = mined.get(index)
+            if tx is None:
+                if (
+                    web3.eth.get_transaction_count(account.address)
+                    <= sent[index][-1].nonce
+                ):
+                    to_replace.append(index)
+                # the nonce was used, by one of the transactions sent for it
+                # (mined, not confirmed yet) or by another one
+                elif get_mined_transaction(sent[index])[0] is not None:
+                    to_await.append(index)
+                else:
+                    failures[index] = NONCE_USED_FAILURE
+            elif tx.status == 1:
+                receipts[index] = tx
+                failures.pop(index, None)
+                print(transactions[index][2], "\n\n")
+            else:
+                failures[index] = "Reverted: " + str(tx.revert_msg)
+        if not to_send and not to_replace and not to_await:
+            break
+        if attempt < retries:
+            print(
+                "Resubmitting "
+                + str(len(to_send))
+                + ", replacing "
+                + str(len(to_replace))
+                + " and awaiting "
+                + str(len(to_await))
+                + " failed transactions.",
+                "\n\n",
+            )
+    for index in to_replace + to_await:
+        failures[index] = "Not confirmed after " + str(timeout) + " seconds."
+
+    for index, failure in sorted(failures.items()):
+        print(
+            "Transaction "
+            + str(index)
+            + " failed ("
+            + transactions[index][2]
+            + "): "
+            + failure,
+            "\n\n",
+        )
+    return receipts
+
+
+def send_transaction(transaction, account, parameters):
+    """Broadcasts a (contract_tx, args, description) transaction without
+    waiting for it.
+    Returns:
+        [TransactionReceipt]: The pending transaction, or the error message
+        when it couldn't be broadcast. Reverts during the gas estimation are
+        prefixed by "Reverted: ".
+    """
+    contract_tx, args, _ = transaction
+    try:
+        return contract_tx(
+            *args, dict(parameters, **{"from": account, "required_confs": 0})
+        )
+    except VirtualMachineError as error:
+        return "Reverted: " + str(error.revert_msg)
+    except Exception as error:
+        return str(error)
+
+
+def is_final_failure(failure):
+    return failure.startswith("Reverted: ") or failure == NONCE_USED_FAILURE
+
+
+def get_mined_transaction(txs):
+    """Returns:
+    [tuple]: The one of txs, sent with the same nonce, that was mined and its
+    receipt, (None, None) if none was.
+    """
+    for tx in txs:
+        try:
+            return tx, web3.eth.get_transaction_receipt(tx.txid)
+        except TransactionNotFound:
+            continue
+    return None, None
+
+
+def get_replacement_parameters(tx):
+    # same nonce, paying more, so nodes replace the pending transaction. At
+    # least 1 wei more, so 0 (development networks) and dust prices go up too.
+    if tx.max_fee:
+        return {
+            "nonce": tx.nonce,
+            "max_fee": bump_gas_price(tx.max_fee),
+            "priority_fee": bump_gas_price(tx.priority_fee),
+        }
+    return {"nonce": tx.nonce, "gas_price": bump_gas_price(tx.gas_price)}
+
+
+def bump_gas_price(gas_price):
+    return max(int(gas_price * TRANSACTION_GAS_PRICE_BUMP), gas_price + 1)
+
+
+def wait_for_transactions(
+    sent,
+    required_confs=1,
+    timeout=TRANSACTION_TIMEOUT_IN_SECONDS,
+    poll_interval=TRANSACTION_POLL_INTERVAL_IN_SECONDS,
+):
+    """Polls the receipts of pending transactions until they have
+    `required_confs` confirmations or `timeout` seconds have passed, without
+    blocking any thread on the ones that don't.
+    Args:
+        sent (dict): key => receipts sent with the same nonce.
+    Returns:
+        [dict]: key => the mined receipt, for the keys mined in time.
+    """
+    mined = {}
+    deadline = time.time() + timeout
+    while True:
+        block_number = web3.eth.block_number
+        for key, txs in sent.items():
+            if key in mined:
+                continue
+            tx, receipt = get_mined_transaction(txs)
+            if tx is None:
+                continue
+            if block_number - receipt["blockNumber"] + 1 >= required_confs:
+                # returns at once, the receipt is confirmed
+                tx.wait(required_confs)
+                mined[key] = tx
+        if len(mined) == len(sent) or time.time() >= deadline:
+            return mined
+        time.sleep(poll_interval)
+
+
+def deploy_proxy_admin(account=None):
+    account = account or get_account()
     return ProxyAdmin.deploy(
         {"from": account},
         publish_source=config["networks"][network.show_active()].get("verify", False),
     )
 
 
-def deploy_transparent_upgradeable_proxy(
-    proxy_admin, contract, *args, account=get_account()
-):
+def deploy_transparent_upgradeable_proxy(proxy_admin, contract, *args, account=None):
     # If we want an intializer function we can add
     # `1, initializer=box.store`
     # to simulate the initializer being the `store` function
     # with a `newValue` of 1
     # box_encoded_initializer_function = encode_function_data()
     # box_encoded_initializer_function = encode_function_data(1, initializer=box.store)
+    account = account or get_account()
     encoded_initializer_function = encode_function_data(
         *args, initializer=contract.initialize
     )
@@ -196,8 +597,9 @@ def deploy_transparent_upgradeable_proxy(
 
 
 def upgrade_transparent_upgradeable_proxy(
-    proxy_admin, proxy_contract, new_contract, *args, account=get_account()
+    proxy_admin, proxy_contract, new_contract, *args, account=None
 ):
+    account = account or get_account()
     if args:
         # If we want an intializer function we can add
         # `1, initializer=box.store`
@@ -254,6 +656,153 @@ def upgrade(
     return transaction
 
 
+def get_bytecode_hash(contract_container, *libraries_bytecode_hashes):
+    """Hashes the deployment bytecode of a contract. Libraries are linked at
+    deploy time, so the hashes of the libraries a contract links are folded
+    into its own.
+    """
+    bytecode_hash = hashlib.sha256(contract_container.bytecode.encode())
+    for library_bytecode_hash in libraries_bytecode_hashes:
+        bytecode_hash.update(library_bytecode_hash.encode())
+    return bytecode_hash.hexdigest()
+
+
+def get_code_hash(address):
+    return web3.keccak(web3.eth.get_code(address)).hex()
+
+
+def get_implementation_address(address, block_identifier=None):
+    """Returns the EIP-1967 implementation of a proxy, or the address itself
+    when it isn't one."""
+    implementation = web3.eth.get_storage_at(
+        address, IMPLEMENTATION_SLOT, block_identifier
+    ).hex()[-40:]
+    if int(implementation, 16) == 0:
+        return address
+    return web3.toChecksumAddress("0x" + implementation)
+
+
+def has_function(contract, function_name, block_identifier=None):
+    """Whether the code deployed at the contract address, behind its proxy if
+    any, has the function. The contract ABI can't tell, since the farm proxy
+    is always used with the latest SavvyFinanceFarm ABI, so the dispatcher of
+    the deployed code is searched for the function selector instead.
+    """
+    contract_call = getattr(contract, function_name, None)
+    if contract_call is None:
+        return False
+    implementation = get_implementation_address(contract.address, block_identifier)
+    cache_key = (network.show_active(), implementation)
+    if cache_key not in implementations_code_cache:
+        implementations_code_cache[cache_key] = bytes(
+            web3.eth.get_code(implementation, block_identifier)
+        )
+    # solc pushes the selector with PUSHn, n its length without leading zeros
+    selector = bytes.fromhex(contract_call.signature[2:]).lstrip(b"\x00")
+    return (
+        bytes([0x5F + len(selector)]) + selector
+        in implementations_code_cache[cache_key]
+    )
+
+
+def get_deployment_manifest_path(network_name=None):
+    network_name = network_name or network.show_active()
+    return os.path.join(DEPLOYMENTS_FOLDER, network_name + ".json")
+
+
+def load_deployment_manifest(network_name=None):
+    """Loads the contracts deployed on a network, as
+    name => {address, bytecodeHash, codeHash} for implementations and
+    name => {address} for proxies.
+    """
+    path = get_deployment_manifest_path(network_name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_deployment_manifest(manifest, network_name=None):
+    os.makedirs(DEPLOYMENTS_FOLDER, exist_ok=True)
+    with open(get_deployment_manifest_path(network_name), "w") as file:
+        json.dump(manifest, file, indent=4)
+
+
+def get_deployed_contract(manifest, name, contract_container):
+    """Returns the contract recorded in the manifest under `name`, without
+    deploying anything."""
+    deployment = manifest.get(name)
+    if not deployment:
+        raise ValueError(
+            name
+            + " is not recorded in "
+            + get_deployment_manifest_path()
+            + ", deploy it first."
+        )
+    return contract_container.at(deployment["address"])
+
+
+def get_or_deploy_contract(
+    manifest, name, contract_container, deploy, bytecode_hash=None
+):
+    """Reuses the contract recorded in the manifest under `name` when it was
+    deployed from the same bytecode and its code is still on chain (local
+    chains are reset), otherwise deploys it with `deploy` and records it.
+    """
+    bytecode_hash = bytecode_hash or get_bytecode_hash(contract_container)
+    deployment = manifest.get(name)
+    if (
+        deployment
+        and deployment["bytecodeHash"] == bytecode_hash
+        and get_code_hash(deployment["address"]) == deployment["codeHash"]
+    ):
+        return contract_container.at(deployment["address"])
+    contract = deploy()
+    manifest[name] = {
+        "address": contract.address,
+        "bytecodeHash": bytecode_hash,
+        "codeHash": get_code_hash(contract.address),
+    }
+    save_deployment_manifest(manifest)
+    return contract
+
+
+def get_or_deploy_transparent_upgradeable_proxy(
+    manifest, name, proxy_admin, contract, *args, account=None
+):
+    """Reuses the proxy recorded in the manifest under `name`, moving it to
+    `proxy_admin` and upgrading it to `contract` only if needed, otherwise
+    deploys it with `contract` initialized with `args` and records it.
+    """
+    deployment = manifest.get(name)
+    if deployment and get_code_hash(deployment["address"]) == deployment["codeHash"]:
+        account = account or get_account()
+        proxy = TransparentUpgradeableProxy.at(deployment["address"])
+        admin = "0x" + web3.eth.get_storage_at(proxy.address, ADMIN_SLOT).hex()[-40:]
+        if web3.toChecksumAddress(admin) != proxy_admin.address:
+            ProxyAdmin.at(admin).changeProxyAdmin(
+                proxy.address, proxy_admin.address, {"from": account}
+            ).wait(1)
+        implementation = (
+            "0x"
+            + web3.eth.get_storage_at(proxy.address, IMPLEMENTATION_SLOT).hex()[-40:]
+        )
+        if web3.toChecksumAddress(implementation) != contract.address:
+            upgrade_transparent_upgradeable_proxy(
+                proxy_admin, proxy, contract, account=account
+            ).wait(1)
+        return proxy
+    proxy = deploy_transparent_upgradeable_proxy(
+        proxy_admin, contract, *args, account=account
+    )
+    manifest[name] = {
+        "address": proxy.address,
+        "codeHash": get_code_hash(proxy.address),
+    }
+    save_deployment_manifest(manifest)
+    return proxy
+
+
 # def get_token_price(token_address, network_name=network.show_active()):
 #     response = requests.get(
 #         "https://api.pancakeswap.info/api/v2/tokens/{}".format(token_address)
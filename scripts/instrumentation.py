@@ -0,0 +1,220 @@
+from brownie import web3
+from brownie.network.transaction import TransactionReceipt
+from functools import wraps
+import os, json, time, atexit, bisect, threading, contextvars
+
+# set to 1 to record the RPC calls, latencies and gas of the instrumented
+# helpers and print them at exit, see instrumented
+INSTRUMENTATION_VARIABLE = "SAVVY_FINANCE_INSTRUMENTATION"
+INSTRUMENTATION_FOLDER = "./instrumentation"
+# upper bounds of the latency histogram buckets, the last one is unbounded
+LATENCY_BUCKETS_IN_MS = [1, 5, 10, 50, 100, 500, 1000, 5000]
+# RPC calls made while no instrumented helper runs
+NO_HELPER = "-"
+
+instrumentation_enabled = os.getenv(INSTRUMENTATION_VARIABLE, "") not in [
+    "",
+    "0",
+    "false",
+]
+instrumentation_lock = threading.Lock()
+# names of the instrumented helpers being run by the current thread, innermost
+# last. map_concurrently runs its workers in copies of the caller's context, so
+# their RPC calls go to the helper that started them, and concurrent helpers
+# don't charge each other.
+active_helpers = contextvars.ContextVar("active_helpers", default=())
+# name => stats, see new_stats
+helpers_stats = {}
+# RPC method => stats
+rpc_stats = {}
+# transaction hashes whose receipt gas was already counted
+counted_transactions = set()
+
+
+def new_stats():
+    return {
+        "calls": 0,
+        "errors": 0,
+        "totalMs": 0.0,
+        "latencyHistogram": [0] * (len(LATENCY_BUCKETS_IN_MS) + 1),
+        "rpcCalls": 0,
+        "bytesSent": 0,
+        "bytesReceived": 0,
+        "transactions": 0,
+        "gasUsed": 0,
+        "reverts": {},
+    }
+
+
+def record_latency(stats, milliseconds):
+    stats["calls"] += 1
+    stats["totalMs"] += milliseconds
+    stats["latencyHistogram"][
+        bisect.bisect_left(LATENCY_BUCKETS_IN_MS, milliseconds)
+    ] += 1
+
+
+def record_revert(stats, reason):
+    stats["reverts"][reason] = stats["reverts"].get(reason, 0) + 1
+
+
+def get_active_helpers_stats():
+    # every active helper is charged, so a helper includes its nested helpers
+    return [
+        helpers_stats.setdefault(helper, new_stats())
+        for helper in dict.fromkeys(active_helpers.get() or [NO_HELPER])
+    ]
+
+
+def to_int(value):
+    # raw receipts are hex encoded below the web3 result formatters
+    return int(value, 16) if isinstance(value, str) else value
+
+
+def instrumentation_middleware(make_request, w3):
+    def middleware(method, params):
+        started = time.perf_counter()
+        response = make_request(method, params)
+        milliseconds = (time.perf_counter() - started) * 1000
+        # sizes of the JSON encoded params and response, not of the HTTP bodies
+        bytes_sent = len(json.dumps(params, default=str))
+        bytes_received = len(json.dumps(response, default=str))
+        with instrumentation_lock:
+            method_stats = rpc_stats.setdefault(method, new_stats())
+            record_latency(method_stats, milliseconds)
+            active_helpers_stats = get_active_helpers_stats()
+            for stats in [method_stats, *active_helpers_stats]:
+                stats["rpcCalls"] += 1
+                stats["bytesSent"] += bytes_sent
+                stats["bytesReceived"] += bytes_received
+            if "error" in response:
+                method_stats["errors"] += 1
+            receipt = response.get("result")
+            if (
+                method == "eth_getTransactionReceipt"
+                and receipt
+                and receipt["transactionHash"] not in counted_transactions
+            ):
+                counted_transactions.add(receipt["transactionHash"])
+                for stats in active_helpers_stats:
+                    stats["transactions"] += 1
+                    stats["gasUsed"] += to_int(receipt["gasUsed"])
+                    # reverted without raising, e.g. on live networks
+                    if to_int(receipt["status"]) == 0:
+                        record_revert(stats, "(reverted transaction)")
+        return response
+
+    return middleware
+
+
+def instrumented(function=None, name=None):
+    """Records the calls, latency histogram, errors and revert reasons of a
+    helper, and the RPC calls, bytes, transactions and gas used while it
+    runs, when SAVVY_FINANCE_INSTRUMENTATION is set. Otherwise returns the
+    helper itself, so it costs nothing.
+    Args:
+        name (string, optional): Defaults to the helper name.
+    """
+    if function is None:
+        return lambda function: instrumented(function, name)
+    if not instrumentation_enabled:
+        return function
+    name = name or function.__name__
+
+    @wraps(function)
+    def instrumented_function(*args, **kwargs):
+        active_helpers_token = active_helpers.set(active_helpers.get() + (name,))
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception as error:
+            with instrumentation_lock:
+                stats = helpers_stats.setdefault(name, new_stats())
+                stats["errors"] += 1
+                # brownie's VirtualMachineError
+                if hasattr(error, "revert_msg"):
+                    record_revert(stats, error.revert_msg or "(no reason)")
+            raise
+        finally:
+            milliseconds = (time.perf_counter() - started) * 1000
+            active_helpers.reset(active_helpers_token)
+            with instrumentation_lock:
+                record_latency(
+                    helpers_stats.setdefault(name, new_stats()), milliseconds
+                )
+
+    return instrumented_function
+
+
+def get_instrumentation_summary():
+    with instrumentation_lock:
+        return {
+            "latencyBucketsInMs": LATENCY_BUCKETS_IN_MS,
+            "helpers": json.loads(json.dumps(helpers_stats)),
+            "rpc": json.loads(json.dumps(rpc_stats)),
+        }
+
+
+def format_instrumentation_table(stats_by_name):
+    columns = [
+        ("calls", "calls"),
+        ("errors", "errors"),
+        ("avg ms", None),
+        ("rpc", "rpcCalls"),
+        ("sent", "bytesSent"),
+        ("received", "bytesReceived"),
+        ("txs", "transactions"),
+        ("gas", "gasUsed"),
+    ]
+    rows = [["name"] + [title for title, _ in columns]]
+    for name, stats in sorted(
+        stats_by_name.items(), key=lambda item: item[1]["totalMs"], reverse=True
+    ):
+        rows.append(
+            [name]
+            + [
+                (
+                    str(stats[key])
+                    if key
+                    else str(round(stats["totalMs"] / max(stats["calls"], 1), 1))
+                )
+                for _, key in columns
+            ]
+        )
+    widths = [max(len(row[index]) for row in rows) for index in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if index == 0 else cell.rjust(width)
+            for index, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    )
+
+
+def dump_instrumentation(path=None):
+    """Prints the helpers and RPC methods tables and writes the summary JSON.
+    Args:
+        path (string, optional): Defaults to
+        ./instrumentation/<unix timestamp>.json.
+    """
+    summary = get_instrumentation_summary()
+    if not path:
+        os.makedirs(INSTRUMENTATION_FOLDER, exist_ok=True)
+        path = os.path.join(INSTRUMENTATION_FOLDER, str(int(time.time())) + ".json")
+    with open(path, "w") as summary_file:
+        json.dump(summary, summary_file, indent=4)
+    print(format_instrumentation_table(summary["helpers"]), "\n\n")
+    print(format_instrumentation_table(summary["rpc"]), "\n\n")
+    for name, stats in summary["helpers"].items():
+        for reason, count in stats["reverts"].items():
+            print(name + " reverted " + str(count) + "x: " + reason, "\n\n")
+    print("Instrumentation summary written to " + path + ".", "\n\n")
+
+
+if instrumentation_enabled:
+    web3.middleware_onion.add(instrumentation_middleware, "instrumentation")
+    # how long every confirmation wait blocks
+    TransactionReceipt.wait = instrumented(
+        TransactionReceipt.wait, "TransactionReceipt.wait"
+    )
+    atexit.register(dump_instrumentation)
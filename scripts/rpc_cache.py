@@ -0,0 +1,250 @@
+from brownie import network, web3
+from scripts.common import call_with_retry
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os, json, sqlite3, hashlib, threading, requests
+
+RPC_CACHE_FOLDER = "./rpc_cache"
+RPC_CACHE_HOST = "127.0.0.1"
+RPC_CACHE_PORT = 8546
+RPC_CACHE_TIMEOUT_IN_SECONDS = 60
+# method => index of its block parameter. The result at a block number or
+# hash never changes, so these are served from the cache when pinned.
+RPC_CACHE_BLOCK_METHODS = {
+    "eth_call": 1,
+    "eth_getStorageAt": 2,
+    "eth_getCode": 1,
+    "eth_getBalance": 1,
+    "eth_getTransactionCount": 1,
+}
+# methods whose result only depends on the upstream chain
+RPC_CACHE_CHAIN_METHODS = ["eth_chainId", "net_version"]
+# JSON-RPC error codes of the requests the proxy can't answer
+RPC_PARSE_ERROR = -32700
+RPC_INTERNAL_ERROR = -32603
+
+
+def open_rpc_cache(database=None):
+    """Opens (and creates if needed) the SQLite cache of the JSON-RPC results.
+    A cache only holds the results of one upstream chain.
+    Args:
+        database (string, optional): Path of the SQLite file.
+        Defaults to ./rpc_cache/<active network>.sqlite.
+    Returns:
+        [sqlite3.Connection]: The cache connection, usable from any thread.
+    """
+    if not database:
+        os.makedirs(RPC_CACHE_FOLDER, exist_ok=True)
+        database = os.path.join(RPC_CACHE_FOLDER, network.show_active() + ".sqlite")
+    connection = sqlite3.connect(database, check_same_thread=False)
+    connection.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            method TEXT NOT NULL,
+            result TEXT NOT NULL
+        );
+        """
+    )
+    return connection
+
+
+def is_pinned_block(block):
+    # a block number or an EIP-1898 block object, not a tag ("latest", ...)
+    if isinstance(block, dict):
+        return "blockHash" in block or is_pinned_block(block.get("blockNumber"))
+    return isinstance(block, str) and block.startswith("0x")
+
+
+def get_rpc_cache_key(rpc_request):
+    """Returns the cache key of a JSON-RPC request, None when its result can
+    change and must be forwarded.
+    """
+    method = rpc_request.get("method")
+    params = rpc_request.get("params", [])
+    if method in RPC_CACHE_BLOCK_METHODS:
+        block_index = RPC_CACHE_BLOCK_METHODS[method]
+        if len(params) <= block_index or not is_pinned_block(params[block_index]):
+            return None
+    elif method not in RPC_CACHE_CHAIN_METHODS:
+        return None
+    return hashlib.sha256(
+        json.dumps([method, params], sort_keys=True).encode()
+    ).hexdigest()
+
+
+def get_rpc_error_response(rpc_request, code, message):
+    return {
+        "jsonrpc": "2.0",
+        "id": rpc_request.get("id") if isinstance(rpc_request, dict) else None,
+        "error": {"code": code, "message": message},
+    }
+
+
+def post_rpc_requests(session, upstream, rpc_requests):
+    response = session.post(
+        upstream,
+        json=rpc_requests if len(rpc_requests) > 1 else rpc_requests[0],
+        timeout=RPC_CACHE_TIMEOUT_IN_SECONDS,
+    )
+    response.raise_for_status()
+    rpc_responses = response.json()
+    if not isinstance(rpc_responses, list):
+        return [rpc_responses]
+    rpc_responses_by_id = {
+        rpc_response.get("id"): rpc_response for rpc_response in rpc_responses
+    }
+    return [rpc_responses_by_id[rpc_request.get("id")] for rpc_request in rpc_requests]
+
+
+class RpcCacheProxy(ThreadingHTTPServer):
+    """JSON-RPC proxy serving the cacheable requests (see get_rpc_cache_key)
+    from the cache and forwarding the others, and the cache misses, to the
+    upstream node. Only successful results are cached.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, upstream, connection, host=RPC_CACHE_HOST, port=RPC_CACHE_PORT):
+        super().__init__((host, port), RpcCacheRequestHandler)
+        self.upstream = upstream
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.sessions = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def url(self):
+        return "http://" + self.server_address[0] + ":" + str(self.server_address[1])
+
+    def get_session(self):
+        # requests sessions are not thread safe, one per handler thread
+        if not hasattr(self.sessions, "session"):
+            self.sessions.session = requests.Session()
+        return self.sessions.session
+
+    def handle_rpc_requests(self, rpc_requests):
+        keys = [get_rpc_cache_key(rpc_request) for rpc_request in rpc_requests]
+        rpc_responses = [None] * len(rpc_requests)
+        with self.lock:
+            for index, (rpc_request, key) in enumerate(zip(rpc_requests, keys)):
+                if key is None:
+                    continue
+                cached = self.connection.execute(
+                    "SELECT result FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if cached is not None:
+                    rpc_responses[index] = {
+                        "jsonrpc": "2.0",
+                        "id": rpc_request.get("id"),
+                        "result": json.loads(cached[0]),
+                    }
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        forwarded = [
+            index
+            for index, rpc_response in enumerate(rpc_responses)
+            if rpc_response is None
+        ]
+        if forwarded:
+            forwarded_responses = call_with_retry(
+                partial(
+                    post_rpc_requests,
+                    self.get_session(),
+                    self.upstream,
+                    [rpc_requests[index] for index in forwarded],
+                )
+            )
+            with self.lock:
+                for index, rpc_response in zip(forwarded, forwarded_responses):
+                    rpc_responses[index] = rpc_response
+                    if keys[index] is not None and "result" in rpc_response:
+                        self.connection.execute(
+                            "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                            (
+                                keys[index],
+                                rpc_requests[index]["method"],
+                                json.dumps(rpc_response["result"]),
+                            ),
+                        )
+                self.connection.commit()
+        return rpc_responses
+
+
+class RpcCacheRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        except ValueError as error:
+            self.send_json(
+                get_rpc_error_response(
+                    None, RPC_PARSE_ERROR, "Parse error: " + str(error)
+                )
+            )
+            return
+        rpc_requests = body if isinstance(body, list) else [body]
+        try:
+            rpc_responses = self.server.handle_rpc_requests(rpc_requests)
+        except Exception as error:
+            # an unreachable upstream node, a malformed request or an upstream
+            # batch response missing ids, answered instead of dropping the
+            # connection
+            rpc_responses = [
+                get_rpc_error_response(
+                    rpc_request,
+                    RPC_INTERNAL_ERROR,
+                    type(error).__name__ + ": " + str(error),
+                )
+                for rpc_request in rpc_requests
+            ]
+        self.send_json(rpc_responses if isinstance(body, list) else rpc_responses[0])
+
+    def send_json(self, data):
+        content = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_rpc_cache_proxy(
+    upstream, database=None, host=RPC_CACHE_HOST, port=RPC_CACHE_PORT
+):
+    """Starts an RpcCacheProxy in a background thread.
+    Args:
+        upstream (string): The URL of the upstream node.
+        port (int, optional): 0 for any free port, see the proxy url.
+    Returns:
+        [RpcCacheProxy]: The running proxy, stopped with shutdown().
+    """
+    proxy = RpcCacheProxy(upstream, open_rpc_cache(database), host, port)
+    threading.Thread(target=proxy.serve_forever, daemon=True).start()
+    return proxy
+
+
+def main():
+    """Serves the active network through the cache, e.g. with
+    `brownie run scripts/rpc_cache.py --network bsc-main`, for forks started
+    with `brownie networks modify bsc-main-fork fork=http://127.0.0.1:8546`.
+    Pinned calls are then read from the upstream node once across sessions.
+    RPC_CACHE_UPSTREAM overrides the upstream node.
+    """
+    upstream = os.getenv("RPC_CACHE_UPSTREAM") or web3.provider.endpoint_uri
+    proxy = RpcCacheProxy(upstream, open_rpc_cache())
+    print("Caching " + upstream + " on " + proxy.url + ".", "\n\n")
+    try:
+        proxy.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.server_close()
+        print(
+            str(proxy.hits) + " cache hits, " + str(proxy.misses) + " cache misses.",
+            "\n\n",
+        )
@@ -5,12 +5,15 @@ from brownie import (
     SavvyFinanceUpgradeable,
     SavvyFinanceFarmLibrary,
     SavvyFinanceFarm,
+    SavvyFinanceFarmMulticall,
     Contract,
     network,
     config,
     web3,
 )
 from scripts.common import (
+    NON_FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS,
+    MULTICALL_CHUNK_SIZE,
     print_json,
     copy_folder,
     to_wei,
@@ -21,22 +24,121 @@ from scripts.common import (
     # get_lp_token_price,
     get_contract_address,
     get_contract,
+    batch_call,
+    call_with_retry,
+    map_concurrently,
+    send_transactions,
     deploy_proxy_admin,
     deploy_transparent_upgradeable_proxy,
     upgrade_transparent_upgradeable_proxy,
+    get_bytecode_hash,
+    get_code_hash,
+    get_implementation_address,
+    load_deployment_manifest,
+    save_deployment_manifest,
+    get_deployed_contract,
+    get_or_deploy_contract,
+    get_or_deploy_transparent_upgradeable_proxy,
+    has_function,
 )
-import shutil, yaml, json
+from brownie.convert import to_address
+from scripts.instrumentation import instrumented
+from scripts.savvy_finance_farm_records import (
+    WEI_DECIMALS,
+    get_tokens_decimals,
+    TokenRecord,
+    StakerRecord,
+    StakingRewardRecord,
+    TokenStakerRecord,
+)
+from functools import partial
+from itertools import islice
+import os, shutil, yaml, json, gzip, hashlib, eth_event
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TOKENS_BATCH_SIZE = 20
+# items per call of the paginated farm views (getTokensPage, getStakersPage and
+# getTokenStakerRewardsPage)
+PAGE_SIZE = 500
+# blocks per eth_getLogs query
+LOGS_BLOCK_RANGE = 5000
+# SavvyFinanceFarm.StakingRewardTrigger => triggeredBy[0]
+STAKING_REWARD_TRIGGERS = [
+    "stake",
+    "unstake",
+    "claim staking reward",
+    "issue staking reward",
+]
+# SavvyFinanceFarmBase.STORAGE_VERSION
+STORAGE_VERSION = 2
+# entries copied per migrateStorage transaction, see migrate_storage
+STORAGE_MIGRATION_BATCH_SIZE = 100
+# (field, index, bits) of the layout version 1 values migrated to packed
+# fields, as read by check_storage_migration (getTokenData, TokenDetails fees,
+# stakersData and tokensStakersData)
+TOKEN_MIGRATED_FIELDS = [
+    ("category", 4, 8),
+    ("dex", 5, 8),
+    ("rewardBalance", 6, 128),
+    ("stakingBalance", 7, 128),
+    ("stakingApr", 8, 96),
+    ("timestampAdded", 12, 64),
+    ("timestampLastUpdated", 13, 64),
+]
+TOKEN_FEES_MIGRATED_FIELDS = [
+    ("devDepositFee", 0, 64),
+    ("devWithdrawFee", 1, 64),
+    ("devStakeFee", 2, 64),
+    ("devUnstakeFee", 3, 64),
+    ("adminStakeFee", 4, 64),
+    ("adminUnstakeFee", 5, 64),
+]
+STAKER_MIGRATED_FIELDS = [
+    ("uniqueTokensStaked", 1, 32),
+    ("timestampAdded", 2, 64),
+    ("timestampLastUpdated", 3, 64),
+]
+TOKEN_STAKER_MIGRATED_FIELDS = [
+    ("rewardBalance", 0, 128),
+    ("stakingBalance", 1, 128),
+    ("timestampLastRewarded", 3, 64),
+    ("timestampAdded", 4, 64),
+    ("timestampLastUpdated", 5, 64),
+]
+# migrateStorage reverts on these instead of clamping them
+UNCLAMPED_MIGRATED_FIELDS = ["rewardBalance", "stakingBalance"]
+FRONT_END_TOKENS_FOLDER = "./tokens"
+FRONT_END_TOKENS_INDEX = "index.json"
+FRONT_END_TOKENS_FILE = "./tokens.json"
+# compression => extension of the precompressed variant of a front end file
+FRONT_END_COMPRESSIONS_EXTENSIONS = {"gzip": ".gz", "brotli": ".br"}
+
+# network => tokens, see get_tokens
+tokens_cache = {}
 
 
 def get_tokens():
-    return {
+    # mocks can be redeployed on non forked local networks, so only cache the
+    # addresses read from the config
+    network_name = network.show_active()
+    if network_name in tokens_cache:
+        return tokens_cache[network_name]
+    tokens = {
         "wbnb": get_contract("wbnb_token").address,
         "busd": get_contract("busd_token").address,
         "wbnb_busd": get_contract("wbnb_busd_lp_token").address,
     }
+    if network_name not in NON_FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        tokens_cache[network_name] = tokens
+    return tokens
 
 
-def deploy_savvy_finance(account=get_account()):
+def deploy_savvy_finance(account=None):
+    account = account or get_account()
     return SavvyFinance.deploy(
         web3.toWei(1000000, "ether"),
         {"from": account},
@@ -44,28 +146,41 @@ def deploy_savvy_finance(account=get_account()):
     )
 
 
-def deploy_savvy_finance_upgradeable(account=get_account()):
+def deploy_savvy_finance_upgradeable(account=None):
+    account = account or get_account()
     return SavvyFinanceUpgradeable.deploy(
         {"from": account},
         publish_source=config["networks"][network.show_active()].get("verify", False),
     )
 
 
-def deploy_savvy_finance_farm_library(account=get_account()):
+def deploy_savvy_finance_farm_library(account=None):
+    account = account or get_account()
     return SavvyFinanceFarmLibrary.deploy(
         {"from": account},
         publish_source=config["networks"][network.show_active()].get("verify", False),
     )
 
 
-def deploy_savvy_finance_farm(account=get_account()):
+def deploy_savvy_finance_farm(account=None):
+    account = account or get_account()
     return SavvyFinanceFarm.deploy(
         {"from": account},
         publish_source=config["networks"][network.show_active()].get("verify", False),
     )
 
 
-def erc20_token_transfer(token_contract, to, amount, account=get_account()):
+def deploy_savvy_finance_farm_multicall(account=None):
+    account = account or get_account()
+    return SavvyFinanceFarmMulticall.deploy(
+        {"from": account},
+        publish_source=config["networks"][network.show_active()].get("verify", False),
+    )
+
+
+@instrumented
+def erc20_token_transfer(token_contract, to, amount, account=None):
+    account = account or get_account()
     amount2 = to_wei(amount)
     token_contract.transfer(to, amount2, {"from": account}).wait(1)
     print(
@@ -80,130 +195,746 @@ def erc20_token_transfer(token_contract, to, amount, account=get_account()):
     )
 
 
-def get_token_price(library, contract, token, category, account=get_account()):
+def get_token_price(library, contract, token, category, price_cache=None, account=None):
+    if price_cache:
+        return float(from_wei(price_cache.get_token_price(token, category)))
     return float(from_wei(library.getTokenPrice(contract.address, token, category)))
 
 
-def get_tokens_data(contract, tokens=None, account=get_account()):
-    if not tokens:
-        tokens = list(contract.getTokens())
-    else:
-        tokens = list(tokens.values())
+def token_data_to_dict(token, token_data, decimals=WEI_DECIMALS):
+    return TokenRecord(token, token_data, decimals).to_dict()
 
-    tokens_data = []
-    for token in tokens:
-        token_data = contract.getTokenData(token)
-        token_data_dict = {
-            "address": token,
-            "isActive": token_data[0],
-            "isVerified": token_data[1],
-            "hasMultiTokenRewards": token_data[2],
-            "name": token_data[3],
-            "category": token_data[4],
-            "dex": token_data[5],
-            "rewardBalance": float(from_wei(token_data[6])),
-            "stakingBalance": float(from_wei(token_data[7])),
-            "stakingApr": float(from_wei(token_data[8])),
-            "rewardToken": token_data[9],
-            "admin": token_data[10],
-            "devDepositFee": float(from_wei(token_data[11][0])),
-            "devWithdrawFee": float(from_wei(token_data[11][1])),
-            "devStakeFee": float(from_wei(token_data[11][2])),
-            "devUnstakeFee": float(from_wei(token_data[11][3])),
-            "adminStakeFee": float(from_wei(token_data[11][4])),
-            "adminUnstakeFee": float(from_wei(token_data[11][5])),
-            "timestampAdded": token_data[12],
-            "timestampLastUpdated": token_data[13],
-        }
-        tokens_data.append(token_data_dict)
-    return tokens_data
 
+def staker_data_to_dict(staker, staker_data):
+    return StakerRecord(staker, staker_data).to_dict()
 
-def get_stakers_data(contract, stakers=None, account=get_account()):
-    if not stakers:
-        stakers = list(contract.getStakers())
-
-    stakers_data = []
-    for staker in stakers:
-        staker_data = contract.getStakerData(staker)
-        staker_data_dict = {
-            "address": staker,
-            "isActive": staker_data[0],
-            "uniqueTokensStaked": staker_data[1],
-            "timestampAdded": staker_data[2],
-            "timestampLastUpdated": staker_data[3],
-        }
-        stakers_data.append(staker_data_dict)
-    return stakers_data
 
+def staking_reward_to_dict(
+    staking_reward,
+    reward_token_decimals=WEI_DECIMALS,
+    staked_token_decimals=WEI_DECIMALS,
+):
+    return StakingRewardRecord(
+        staking_reward, reward_token_decimals, staked_token_decimals
+    ).to_dict()
+
+
+def compact_staking_reward_to_record(staker, token, id, reward_data):
+    """Unpacks the rewardData of an IssueCompactStakingReward log into the same
+    record a stored staking reward is decoded to.
+    """
+    trigger = (reward_data[0] >> 160) & 0xFF
+    trigger_amount = reward_data[3] >> 192
+    return StakingRewardRecord(
+        (
+            id,
+            staker,
+            to_address("0x" + format(reward_data[0] & (2**160 - 1), "040x")),
+            reward_data[1] & (2**128 - 1),
+            reward_data[1] >> 128,
+            token,
+            reward_data[2] & (2**128 - 1),
+            reward_data[2] >> 128,
+            reward_data[3] & (2**96 - 1),
+            (reward_data[3] >> 96) & (2**96 - 1),
+            [
+                STAKING_REWARD_TRIGGERS[trigger],
+                str(trigger_amount) if trigger in [0, 1] else "",
+            ],
+            (reward_data[0] >> 168) & (2**64 - 1),
+            0,
+        )
+    )
+
+
+def compact_staking_reward_to_dict(staker, token, id, reward_data):
+    return compact_staking_reward_to_record(staker, token, id, reward_data).to_dict()
+
+
+def iter_compact_staking_rewards(
+    contract,
+    from_block=None,
+    to_block=None,
+    block_range=LOGS_BLOCK_RANGE,
+):
+    """Yields the staking rewards issued in compact mode, one eth_getLogs
+    block range at a time, so the logs are never held in memory as a whole.
+    Args:
+        from_block (int, optional): Defaults to the block compact mode was
+        enabled in (compactStakingRewardsFromBlock), required on the farms
+        that don't record it.
+    Returns:
+        [generator]: (last block of the range, StakingRewardRecord list in
+        log order) per block range. The rewards that didn't fit the compact
+        log were emitted whole by IssueStakingReward, they are told from the
+        stored ones by an id past the stored rewards count.
+    """
+    if to_block is None:
+        to_block = web3.eth.block_number
+    if from_block is None:
+        if not has_function(contract, "compactStakingRewardsFromBlock", to_block):
+            raise ValueError(
+                "The farm doesn't record the block compact mode was enabled in,"
+                " pass from_block."
+            )
+        from_block = contract.compactStakingRewardsFromBlock(block_identifier=to_block)
+        if from_block == 0:
+            # compact mode was never enabled
+            return
+    # the farms without getTokenStakerSummary don't fall back to IssueStakingReward
+    events = ["IssueCompactStakingReward"]
+    if has_function(contract, "getTokenStakerSummary", to_block):
+        events.append("IssueStakingReward")
+    topic_map = {
+        topic: event
+        for topic, event in eth_event.get_topic_map(contract.abi).items()
+        if event["name"] in events
+    }
+    # (token, staker) => stored staking rewards count
+    stored_counts = {}
+    for range_from_block in range(from_block, to_block + 1, block_range):
+        range_to_block = min(range_from_block + block_range - 1, to_block)
+        logs = call_with_retry(
+            partial(
+                web3.eth.get_logs,
+                {
+                    "address": contract.address,
+                    "fromBlock": range_from_block,
+                    "toBlock": range_to_block,
+                    "topics": [list(topic_map)],
+                },
+            )
+        )
+        staking_rewards = []
+        for event in eth_event.decode_logs([dict(log) for log in logs], topic_map):
+            data = {field["name"]: field["value"] for field in event["data"]}
+            if event["name"] == "IssueCompactStakingReward":
+                staking_rewards.append(
+                    compact_staking_reward_to_record(
+                        to_address(data["staker"]),
+                        to_address(data["token"]),
+                        data["id"],
+                        data["rewardData"],
+                    )
+                )
+                continue
+            token_staker = (to_address(data["token"]), to_address(data["staker"]))
+            if token_staker not in stored_counts:
+                stored_counts[token_staker] = call_with_retry(
+                    partial(
+                        contract.getTokenStakerSummary,
+                        *token_staker,
+                        block_identifier=to_block,
+                    )
+                )[3]
+            if data["rewardData"][0] < stored_counts[token_staker]:
+                continue
+            staking_reward = list(data["rewardData"])
+            for index in [1, 2, 5]:
+                staking_reward[index] = to_address(staking_reward[index])
+            staking_rewards.append(StakingRewardRecord(staking_reward))
+        yield range_to_block, staking_rewards
+
+
+def get_compact_staking_rewards(
+    contract,
+    from_block=None,
+    to_block=None,
+    block_range=LOGS_BLOCK_RANGE,
+    as_records=False,
+):
+    """Reads the staking rewards issued in compact mode from the farm logs.
+    Args:
+        from_block (int, optional): See iter_compact_staking_rewards.
+    Returns:
+        [dict]: (token, staker) => staking rewards (dicts, or
+        StakingRewardRecord with `as_records`), in id order.
+    """
+    compact_staking_rewards = {}
+    for _, staking_rewards in iter_compact_staking_rewards(
+        contract, from_block, to_block, block_range
+    ):
+        for staking_reward in staking_rewards:
+            compact_staking_rewards.setdefault(
+                (staking_reward.stakedToken, staking_reward.staker), []
+            ).append(staking_reward)
+    for token_staker, staking_rewards in compact_staking_rewards.items():
+        staking_rewards.sort(key=lambda staking_reward: staking_reward.id)
+        if not as_records:
+            compact_staking_rewards[token_staker] = [
+                staking_reward.to_dict() for staking_reward in staking_rewards
+            ]
+    return compact_staking_rewards
+
+
+def token_staker_data_to_dict(
+    token_staker_data, decimals=WEI_DECIMALS, tokens_decimals=None
+):
+    """
+    Args:
+        decimals (int, optional): The staked token decimals.
+        tokens_decimals (dict, optional): reward token => decimals, 18 for
+        the reward tokens left out.
+    """
+    tokens_decimals = tokens_decimals or {}
+    return TokenStakerRecord(
+        token_staker_data,
+        [
+            StakingRewardRecord(
+                staking_reward,
+                tokens_decimals.get(staking_reward[2], WEI_DECIMALS),
+                decimals,
+            )
+            for staking_reward in token_staker_data[3]
+        ],
+        decimals=decimals,
+    ).to_dict()
+
+
+def iter_pages(
+    contract_call, args=(), page_size=PAGE_SIZE, block_identifier=None, offset=0
+):
+    """Yields the items of a paginated farm view, e.g. getTokensPage, one
+    (offset, limit) page call at a time, at a pinned block.
+    """
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+    while True:
+        page = call_with_retry(
+            partial(
+                contract_call,
+                *args,
+                offset,
+                page_size,
+                block_identifier=block_identifier,
+            )
+        )
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+
+def iter_tokens(contract, page_size=PAGE_SIZE, block_identifier=None):
+    """Yields the farm tokens page by page, or all at once on farms deployed
+    before the paginated views."""
+    if not has_function(contract, "getTokensPage", block_identifier):
+        yield from call_with_retry(
+            partial(contract.getTokens, block_identifier=block_identifier)
+        )
+        return
+    yield from iter_pages(contract.getTokensPage, (), page_size, block_identifier)
 
-def get_tokens_stakers_data(contract, tokens=None, stakers=None, account=get_account()):
+
+def iter_stakers(contract, page_size=PAGE_SIZE, block_identifier=None):
+    if not has_function(contract, "getStakersPage", block_identifier):
+        yield from call_with_retry(
+            partial(contract.getStakers, block_identifier=block_identifier)
+        )
+        return
+    yield from iter_pages(contract.getStakersPage, (), page_size, block_identifier)
+
+
+def iter_token_staker_rewards(
+    contract, token, staker, page_size=PAGE_SIZE, block_identifier=None
+):
+    yield from iter_pages(
+        contract.getTokenStakerRewardsPage,
+        (token, staker),
+        page_size,
+        block_identifier,
+    )
+
+
+def token_staker_summary_to_dict(token_staker_summary, decimals=WEI_DECIMALS):
+    return TokenStakerRecord(
+        token_staker_summary,
+        staking_rewards_count=token_staker_summary[3],
+        decimals=decimals,
+    ).to_dict()
+
+
+@instrumented
+def get_tokens_data(
+    contract,
+    tokens=None,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    block_identifier=None,
+    account=None,
+    as_records=False,
+):
+    """Returns:
+    [list]: The dict of every token, or its TokenRecord with `as_records`.
+    """
     if not tokens:
-        tokens = list(contract.getTokens())
+        tokens = list(iter_tokens(contract, block_identifier=block_identifier))
     else:
         tokens = list(tokens.values())
+    read_options = {
+        "multicall_contract": multicall_contract,
+        "chunk_size": chunk_size,
+        "max_workers": max_workers,
+        "block_identifier": block_identifier,
+    }
+
+    tokens_data = batch_call(
+        contract.getTokenData, [(token,) for token in tokens], **read_options
+    )
+    tokens_decimals = get_tokens_decimals(tokens, **read_options)
+    tokens_records = [
+        TokenRecord(token, token_data, tokens_decimals[token])
+        for token, token_data in zip(tokens, tokens_data)
+    ]
+    if as_records:
+        return tokens_records
+    return [token_record.to_dict() for token_record in tokens_records]
+
+
+@instrumented
+def get_stakers_data(
+    contract,
+    stakers=None,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    block_identifier=None,
+    account=None,
+    as_records=False,
+):
     if not stakers:
-        stakers = list(contract.getStakers())
-
-    tokens_stakers_data = []
-    for token in tokens:
-        token_stakers_data = {}
-        for staker in stakers:
-            token_staker_data = contract.getTokenStakerData(token, staker)
-            staking_rewards = []
-            for staking_reward in token_staker_data[3]:
-                staking_reward_dict = {
-                    "id": staking_reward[0],
-                    "staker": staking_reward[1],
-                    "rewardToken": staking_reward[2],
-                    "rewardTokenPrice": float(web3.fromWei(staking_reward[3], "ether")),
-                    "rewardTokenAmount": float(
-                        web3.fromWei(staking_reward[4], "ether")
-                    ),
-                    "stakedToken": staking_reward[5],
-                    "stakedTokenPrice": float(web3.fromWei(staking_reward[6], "ether")),
-                    "stakedTokenAmount": float(
-                        web3.fromWei(staking_reward[7], "ether")
-                    ),
-                    "stakingApr": float(web3.fromWei(staking_reward[8], "ether")),
-                    "stakingDurationInSeconds": float(
-                        web3.fromWei(staking_reward[9], "ether")
+        stakers = list(iter_stakers(contract, block_identifier=block_identifier))
+
+    stakers_data = batch_call(
+        contract.getStakerData,
+        [(staker,) for staker in stakers],
+        multicall_contract,
+        chunk_size,
+        max_workers,
+        block_identifier,
+    )
+    stakers_records = [
+        StakerRecord(staker, staker_data)
+        for staker, staker_data in zip(stakers, stakers_data)
+    ]
+    if as_records:
+        return stakers_records
+    return [staker_record.to_dict() for staker_record in stakers_records]
+
+
+def chunk_by_staking_rewards_count(items, staking_rewards_counts, page_size):
+    """Splits the items of the pairs into chunks whose first pages hold at most `page_size`
+    staking rewards in total, so a multicall of the first pages returns no
+    more than one page. A pair with a full first page is a chunk of its own.
+    Returns:
+        [list]: The chunks of items, in order.
+    """
+    chunks = []
+    chunk = []
+    chunk_staking_rewards_count = 0
+    for item, staking_rewards_count in zip(items, staking_rewards_counts):
+        first_page_count = min(staking_rewards_count, page_size)
+        if chunk and chunk_staking_rewards_count + first_page_count > page_size:
+            chunks.append(chunk)
+            chunk = []
+            chunk_staking_rewards_count = 0
+        chunk.append(item)
+        chunk_staking_rewards_count += first_page_count
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+@instrumented
+def get_tokens_stakers_data(
+    contract,
+    tokens=None,
+    stakers=None,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    block_identifier=None,
+    account=None,
+    with_staking_rewards=True,
+    page_size=PAGE_SIZE,
+    compact_from_block=None,
+    as_records=False,
+):
+    """Reads the data of every (token, staker) pair.
+    On farms with the paginated views, the pairs are read as summaries and
+    their staking rewards history in pages of `page_size`, so no single call
+    returns an unbounded history.
+    Args:
+        with_staking_rewards (bool, optional): Read the staking rewards history.
+        When False, every pair has its stakingRewardsCount instead, when True
+        its stakingRewards only, as on the farms without the summaries.
+        compact_from_block (int, optional): The first block to read the
+        staking rewards issued in compact mode from, see
+        get_compact_staking_rewards.
+        as_records (bool, optional): Return TokenStakerRecord instead of dicts.
+    """
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+    if not tokens:
+        tokens = list(iter_tokens(contract, page_size, block_identifier))
+    else:
+        tokens = list(tokens.values())
+    if not stakers:
+        stakers = list(iter_stakers(contract, page_size, block_identifier))
+    read_options = {
+        "multicall_contract": multicall_contract,
+        "chunk_size": chunk_size,
+        "max_workers": max_workers,
+        "block_identifier": block_identifier,
+    }
+
+    tokens_stakers = [(token, staker) for token in tokens for staker in stakers]
+    tokens_decimals = get_tokens_decimals(tokens, **read_options)
+    tokens_stakers_staking_rewards = {}
+    has_token_staker_summary = has_function(
+        contract, "getTokenStakerSummary", block_identifier
+    )
+    if not has_token_staker_summary:
+        tokens_stakers_data = batch_call(
+            contract.getTokenStakerData, tokens_stakers, **read_options
+        )
+        tokens_stakers_records = {
+            (token, staker): TokenStakerRecord(
+                token_staker_data, decimals=tokens_decimals[token]
+            )
+            for (token, staker), token_staker_data in zip(
+                tokens_stakers, tokens_stakers_data
+            )
+        }
+        tokens_stakers_staking_rewards = {
+            token_staker: token_staker_data[3]
+            for token_staker, token_staker_data in zip(
+                tokens_stakers, tokens_stakers_data
+            )
+        }
+        # getTokenStakerData always returns the staking rewards history
+        with_staking_rewards = True
+    else:
+        tokens_stakers_records = {
+            (token, staker): TokenStakerRecord(
+                token_staker_summary,
+                staking_rewards_count=token_staker_summary[3],
+                decimals=tokens_decimals[token],
+            )
+            for (token, staker), token_staker_summary in zip(
+                tokens_stakers,
+                batch_call(
+                    contract.getTokenStakerSummary, tokens_stakers, **read_options
+                ),
+            )
+        }
+    if with_staking_rewards and has_token_staker_summary:
+        rewarded_tokens_stakers = [
+            token_staker
+            for token_staker in tokens_stakers
+            if tokens_stakers_records[token_staker].stakingRewardsCount > 0
+        ]
+        # the first page of every pair in one batch, the next ones pair by pair
+        first_pages_args = [
+            (token, staker, 0, page_size) for token, staker in rewarded_tokens_stakers
+        ]
+        if not multicall_contract:
+            first_pages = batch_call(
+                contract.getTokenStakerRewardsPage, first_pages_args, **read_options
+            )
+        else:
+            # multicall chunks sized by rewards, not by pairs, so no eth_call
+            # returns more than `page_size` rewards
+            chunks = chunk_by_staking_rewards_count(
+                first_pages_args,
+                [
+                    tokens_stakers_records[token_staker].stakingRewardsCount
+                    for token_staker in rewarded_tokens_stakers
+                ],
+                page_size,
+            )
+            first_pages = [
+                first_page
+                for chunk_first_pages in map_concurrently(
+                    lambda chunk: batch_call(
+                        contract.getTokenStakerRewardsPage,
+                        chunk,
+                        multicall_contract,
+                        len(chunk),
+                        block_identifier=block_identifier,
                     ),
-                    "triggeredBy": list(staking_reward[10]),
-                    "timestampAdded": staking_reward[11],
-                    "timestampLastUpdated": staking_reward[12],
+                    [(chunk,) for chunk in chunks],
+                    max_workers,
+                )
+                for first_page in chunk_first_pages
+            ]
+        for (token, staker), first_page in zip(rewarded_tokens_stakers, first_pages):
+            staking_rewards = list(first_page)
+            if tokens_stakers_records[(token, staker)].stakingRewardsCount > page_size:
+                staking_rewards.extend(
+                    iter_pages(
+                        contract.getTokenStakerRewardsPage,
+                        (token, staker),
+                        page_size,
+                        block_identifier,
+                        page_size,
+                    )
+                )
+            tokens_stakers_staking_rewards[(token, staker)] = staking_rewards
+        # the history replaces the count, as on the farms without summaries
+        for token_staker_record in tokens_stakers_records.values():
+            token_staker_record.stakingRewardsCount = None
+
+    if with_staking_rewards:
+        # reward tokens are not necessarily among `tokens`
+        tokens_decimals.update(
+            get_tokens_decimals(
+                {
+                    staking_reward[2]
+                    for staking_rewards in tokens_stakers_staking_rewards.values()
+                    for staking_reward in staking_rewards
                 }
-                staking_rewards.append(staking_reward_dict)
-            token_staker_data_dict = {
-                "rewardBalance": float(web3.fromWei(token_staker_data[0], "ether")),
-                "stakingBalance": float(web3.fromWei(token_staker_data[1], "ether")),
-                "stakingRewardToken": token_staker_data[2],
-                "stakingRewards": staking_rewards,
-                "timestampLastRewarded": token_staker_data[4],
-                "timestampAdded": token_staker_data[5],
-                "timestampLastUpdated": token_staker_data[6],
+                - set(tokens_decimals),
+                **read_options,
+            )
+        )
+        for token_staker, token_staker_record in tokens_stakers_records.items():
+            token_staker_record.stakingRewards = [
+                StakingRewardRecord(
+                    staking_reward,
+                    tokens_decimals[staking_reward[2]],
+                    tokens_decimals[token_staker[0]],
+                )
+                for staking_reward in tokens_stakers_staking_rewards.get(
+                    token_staker, []
+                )
+            ]
+    if (
+        with_staking_rewards
+        and has_function(contract, "compactStakingRewardsCount", block_identifier)
+        and any(
+            batch_call(
+                contract.compactStakingRewardsCount, tokens_stakers, **read_options
+            )
+        )
+    ):
+        compact_staking_rewards = {
+            token_staker: staking_rewards
+            for token_staker, staking_rewards in get_compact_staking_rewards(
+                contract, compact_from_block, block_identifier, as_records=True
+            ).items()
+            if token_staker in tokens_stakers_records
+        }
+        tokens_decimals.update(
+            get_tokens_decimals(
+                {
+                    staking_reward.rewardToken
+                    for staking_rewards in compact_staking_rewards.values()
+                    for staking_reward in staking_rewards
+                }
+                - set(tokens_decimals),
+                **read_options,
+            )
+        )
+        for token_staker, staking_rewards in compact_staking_rewards.items():
+            for staking_reward in staking_rewards:
+                staking_reward.rewardTokenDecimals = tokens_decimals[
+                    staking_reward.rewardToken
+                ]
+                staking_reward.stakedTokenDecimals = tokens_decimals[token_staker[0]]
+            tokens_stakers_records[token_staker].stakingRewards.extend(staking_rewards)
+
+    return [
+        {
+            token: {
+                staker: (
+                    tokens_stakers_records[(token, staker)]
+                    if as_records
+                    else tokens_stakers_records[(token, staker)].to_dict()
+                )
+                for staker in stakers
             }
-            token_stakers_data[staker] = token_staker_data_dict
-        tokens_stakers_data.append({token: token_stakers_data})
-    return tokens_stakers_data
+        }
+        for token in tokens
+    ]
 
 
-def exclude_from_fees(contract, address, account=get_account()):
+def exclude_from_fees(contract, address, account=None):
+    account = account or get_account()
     contract.excludeFromFees(address, {"from": account}).wait(1)
     print("Excluded " + address + " from fees.", "\n\n")
 
 
-def include_in_fees(contract, address, account=get_account()):
+def include_in_fees(contract, address, account=None):
+    account = account or get_account()
     contract.includeInFees(address, {"from": account}).wait(1)
     print("Included " + address + " in fees.", "\n\n")
 
 
-def set_token_categories(contract, categories, account=get_account()):
+def set_token_categories(contract, categories, account=None):
+    account = account or get_account()
     for index, category in enumerate(categories):
         contract.configTokenCategory(index, category, {"from": account}).wait(1)
 
 
-def add_tokens(contract, tokens=get_tokens(), account=get_account()):
+def get_overflowing_fields(values, fields):
+    """Returns:
+    [list]: The (field, value) of the fields whose value doesn't fit its bits.
+    """
+    return [
+        (field, values[index])
+        for field, index, bits in fields
+        if values[index] >= 2**bits
+    ]
+
+
+def check_storage_migration(contract, allow_clamped=False, max_workers=None):
+    """Compares every value a farm with the unpacked storage layout will
+    migrate with the packed field it is migrated to, before it is upgraded.
+    migrateStorage reverts on balances that don't fit, which would leave the
+    farm locked, and clamps the other values (ClampMigratedValue events).
+    Args:
+        allow_clamped (bool, optional): Whether clamping values other than
+        balances is fine. Defaults to False.
+    Returns:
+        [list]: The (token, staker, field, value) that will be clamped, token or
+        staker None for staker or token values.
+    Raises:
+        ValueError: If a balance doesn't fit, or another value without
+        allow_clamped.
+    """
+    read_options = {"max_workers": max_workers}
+    tokens = contract.getTokens()
+    stakers = contract.getStakers()
+    tokens_stakers = [(token, staker) for token in tokens for staker in stakers]
+    tokens_data = batch_call(
+        contract.getTokenData, [(token,) for token in tokens], **read_options
+    )
+    stakers_data = batch_call(
+        contract.stakersData, [(staker,) for staker in stakers], **read_options
+    )
+    tokens_stakers_data = batch_call(
+        contract.tokensStakersData, tokens_stakers, **read_options
+    )
+    overflows = []
+    for token, token_data in zip(tokens, tokens_data):
+        for field, value in get_overflowing_fields(
+            token_data, TOKEN_MIGRATED_FIELDS
+        ) + get_overflowing_fields(token_data[11], TOKEN_FEES_MIGRATED_FIELDS):
+            overflows.append((token, None, field, value))
+    for staker, staker_data in zip(stakers, stakers_data):
+        for field, value in get_overflowing_fields(staker_data, STAKER_MIGRATED_FIELDS):
+            overflows.append((None, staker, field, value))
+    for (token, staker), token_staker_data in zip(tokens_stakers, tokens_stakers_data):
+        for field, value in get_overflowing_fields(
+            token_staker_data, TOKEN_STAKER_MIGRATED_FIELDS
+        ):
+            overflows.append((token, staker, field, value))
+    failing = [
+        overflow
+        for overflow in overflows
+        if not allow_clamped or overflow[2] in UNCLAMPED_MIGRATED_FIELDS
+    ]
+    if failing:
+        raise ValueError(
+            "Values that don't fit the packed storage layout: "
+            + ", ".join(
+                str(token or staker)
+                + (" of " + str(staker) if token and staker else "")
+                + " "
+                + field
+                + " "
+                + str(value)
+                for token, staker, field, value in failing
+            )
+        )
+    return overflows
+
+
+def migrate_storage(
+    contract, batch_size=STORAGE_MIGRATION_BATCH_SIZE, max_workers=None, account=None
+):
+    """Copies the token, staker and token staker entries of a farm upgraded
+    from the unpacked storage layout to the packed one, batch_size entries per
+    transaction. The token stakers with an entry are found with eth_calls and
+    migrated with migrateTokensStakers, so the migrateStorage transactions
+    don't pay for the tokens x stakers scan. Does nothing once the migration
+    is done.
+    Returns:
+        [int]: The number of transactions sent.
+    """
+    account = account or get_account()
+    transactions_count = 0
+    if contract.getStorageVersion() == STORAGE_VERSION:
+        return transactions_count
+    stakers = contract.getStakers()
+    tokens_stakers = [
+        (token, staker) for token in contract.getTokens() for staker in stakers
+    ]
+    are_legacy = batch_call(
+        contract.isLegacyTokenStaker, tokens_stakers, max_workers=max_workers
+    )
+    tokens_stakers = [
+        token_staker
+        for token_staker, is_legacy in zip(tokens_stakers, are_legacy)
+        if is_legacy
+    ]
+    # one transaction even without token stakers, to skip the scan
+    for offset in range(0, len(tokens_stakers) or 1, batch_size):
+        batch = tokens_stakers[offset : offset + batch_size]
+        contract.migrateTokensStakers(
+            [token for token, _ in batch],
+            [staker for _, staker in batch],
+            offset + batch_size >= len(tokens_stakers),
+            {"from": account},
+        ).wait(1)
+        transactions_count += 1
+    while contract.getStorageVersion() != STORAGE_VERSION:
+        contract.migrateStorage(batch_size, {"from": account}).wait(1)
+        transactions_count += 1
+    print(
+        "Migrated the farm storage in " + str(transactions_count) + " transactions.",
+        "\n\n",
+    )
+    return transactions_count
+
+
+def get_tokens_transactions(
+    contract,
+    function_name,
+    batch_function_name,
+    tokens_args,
+    descriptions,
+    batch_size=TOKENS_BATCH_SIZE,
+    get_batch_args=lambda batch_args: tuple(
+        list(batch_arg) for batch_arg in zip(*batch_args)
+    ),
+):
+    """Builds the transactions for a per-token admin action, using the farm's batch
+    entry point (e.g. activateTokens) when the deployed contract has one, so
+    `batch_size` tokens cost one transaction and one base fee instead of one each.
+    """
+    if not has_function(contract, batch_function_name):
+        return [
+            (getattr(contract, function_name), args, description)
+            for args, description in zip(tokens_args, descriptions)
+        ]
+    return [
+        (
+            getattr(contract, batch_function_name),
+            get_batch_args(tokens_args[batch_start : batch_start + batch_size]),
+            " ".join(descriptions[batch_start : batch_start + batch_size]),
+        )
+        for batch_start in range(0, len(tokens_args), batch_size)
+    ]
+
+
+@instrumented
+def add_tokens(contract, tokens=None, account=None, pipelined=False):
+    tokens = tokens or get_tokens()
+    account = account or get_account()
+    tokens_args = []
     for token_name in tokens:
         token = tokens[token_name]
         token_name_2 = token_name.replace("_", "-").upper()
@@ -213,23 +944,34 @@ def add_tokens(contract, tokens=get_tokens(), account=get_account()):
         token_admin_stake_fee = to_wei(1)
         token_admin_unstake_fee = to_wei(1)
         token_reward_token = token
-        contract.addToken(
-            token,
-            token_name_2,
-            token_category,
-            token_dex,
-            token_staking_apr,
-            token_admin_stake_fee,
-            token_admin_unstake_fee,
-            token_reward_token,
-            {"from": account},
-        ).wait(1)
-        print("Added " + token_name + " token.", "\n\n")
+        tokens_args.append(
+            (
+                token,
+                token_name_2,
+                token_category,
+                token_dex,
+                token_staking_apr,
+                token_admin_stake_fee,
+                token_admin_unstake_fee,
+                token_reward_token,
+            )
+        )
+    return send_transactions(
+        get_tokens_transactions(
+            contract,
+            "addToken",
+            "addTokens",
+            tokens_args,
+            ["Added " + token_name + " token." for token_name in tokens],
+            get_batch_args=lambda batch_args: (list(batch_args),),
+        ),
+        account,
+        pipelined,
+    )
 
 
-def exclude_from_token_admin_fees(
-    contract, token_contract, address, account=get_account()
-):
+def exclude_from_token_admin_fees(contract, token_contract, address, account=None):
+    account = account or get_account()
     contract.excludeFromTokenAdminFees(
         token_contract.address, address, {"from": account}
     ).wait(1)
@@ -239,9 +981,8 @@ def exclude_from_token_admin_fees(
     )
 
 
-def include_in_token_admin_fees(
-    contract, token_contract, address, account=get_account()
-):
+def include_in_token_admin_fees(contract, token_contract, address, account=None):
+    account = account or get_account()
     contract.includeInTokenAdminFees(
         token_contract.address, address, {"from": account}
     ).wait(1)
@@ -251,55 +992,118 @@ def include_in_token_admin_fees(
     )
 
 
-def activate_tokens(contract, tokens=get_tokens(), account=get_account()):
-    for token_name in tokens:
-        token = tokens[token_name]
-        contract.activateToken(token, {"from": account}).wait(1)
-        print("Activated " + token_name + " token.", "\n\n")
+@instrumented
+def activate_tokens(contract, tokens=None, account=None, pipelined=False):
+    tokens = tokens or get_tokens()
+    account = account or get_account()
+    return send_transactions(
+        get_tokens_transactions(
+            contract,
+            "activateToken",
+            "activateTokens",
+            [(tokens[token_name],) for token_name in tokens],
+            ["Activated " + token_name + " token." for token_name in tokens],
+        ),
+        account,
+        pipelined,
+    )
 
 
-def deactivate_tokens(contract, tokens=get_tokens(), account=get_account()):
-    for token_name in tokens:
-        token = tokens[token_name]
-        contract.deactivateToken(token, {"from": account}).wait(1)
-        print("Deactivated " + token_name + " token.", "\n\n")
+@instrumented
+def deactivate_tokens(contract, tokens=None, account=None, pipelined=False):
+    tokens = tokens or get_tokens()
+    account = account or get_account()
+    return send_transactions(
+        [
+            (
+                contract.deactivateToken,
+                (tokens[token_name],),
+                "Deactivated " + token_name + " token.",
+            )
+            for token_name in tokens
+        ],
+        account,
+        pipelined,
+    )
 
 
-def verify_tokens(contract, tokens=get_tokens(), account=get_account()):
-    for token_name in tokens:
-        token = tokens[token_name]
-        contract.verifyToken(token, {"from": account}).wait(1)
-        print("Verified " + token_name + " token.", "\n\n")
+def verify_tokens(contract, tokens=None, account=None, pipelined=False):
+    tokens = tokens or get_tokens()
+    account = account or get_account()
+    return send_transactions(
+        get_tokens_transactions(
+            contract,
+            "verifyToken",
+            "verifyTokens",
+            [(tokens[token_name],) for token_name in tokens],
+            ["Verified " + token_name + " token." for token_name in tokens],
+        ),
+        account,
+        pipelined,
+    )
 
 
-def unverify_tokens(contract, tokens=get_tokens(), account=get_account()):
-    for token_name in tokens:
-        token = tokens[token_name]
-        contract.unverifyToken(token, {"from": account}).wait(1)
-        print("Unverified " + token_name + " token.", "\n\n")
+def unverify_tokens(contract, tokens=None, account=None, pipelined=False):
+    tokens = tokens or get_tokens()
+    account = account or get_account()
+    return send_transactions(
+        [
+            (
+                contract.unverifyToken,
+                (tokens[token_name],),
+                "Unverified " + token_name + " token.",
+            )
+            for token_name in tokens
+        ],
+        account,
+        pipelined,
+    )
 
 
 def enable_tokens_multi_token_rewards(
-    contract, tokens=get_tokens(), account=get_account()
+    contract, tokens=None, account=None, pipelined=False
 ):
-    for token_name in tokens:
-        token = tokens[token_name]
-        contract.enableTokenMultiTokenRewards(token, {"from": account}).wait(1)
-        print("Enabled " + token_name + " token multi token rewards.", "\n\n")
+    tokens = tokens or get_tokens()
+    account = account or get_account()
+    return send_transactions(
+        get_tokens_transactions(
+            contract,
+            "enableTokenMultiTokenRewards",
+            "enableTokensMultiTokenRewards",
+            [(tokens[token_name],) for token_name in tokens],
+            [
+                "Enabled " + token_name + " token multi token rewards."
+                for token_name in tokens
+            ],
+        ),
+        account,
+        pipelined,
+    )
 
 
 def disable_tokens_multi_token_rewards(
-    contract, tokens=get_tokens(), account=get_account()
+    contract, tokens=None, account=None, pipelined=False
 ):
-    for token_name in tokens:
-        token = tokens[token_name]
-        contract.disableTokenMultiTokenRewards(token, {"from": account}).wait(1)
-        print("Disabled " + token_name + " token multi token rewards.", "\n\n")
+    tokens = tokens or get_tokens()
+    account = account or get_account()
+    return send_transactions(
+        [
+            (
+                contract.disableTokenMultiTokenRewards,
+                (tokens[token_name],),
+                "Disabled " + token_name + " token multi token rewards.",
+            )
+            for token_name in tokens
+        ],
+        account,
+        pipelined,
+    )
 
 
 def set_token_reward_token(
-    contract, token_contract, reward_token_contract, account=get_account()
+    contract, token_contract, reward_token_contract, account=None
 ):
+    account = account or get_account()
     contract.setTokenRewardToken(
         token_contract.address, reward_token_contract.address, {"from": account}
     ).wait(1)
@@ -312,22 +1116,51 @@ def set_token_reward_token(
     )
 
 
-def deposit_token(contract, token_contract, amount, account=get_account()):
+def set_tokens_reward_token(
+    contract, tokens_reward_tokens, account=None, pipelined=False
+):
+    """Sets the reward token of many tokens.
+    Args:
+        tokens_reward_tokens (dict): token name => (token, reward token) addresses.
+    """
+    account = account or get_account()
+    return send_transactions(
+        get_tokens_transactions(
+            contract,
+            "setTokenRewardToken",
+            "setTokensRewardToken",
+            list(tokens_reward_tokens.values()),
+            [
+                token_name + " token reward token set."
+                for token_name in tokens_reward_tokens
+            ],
+        ),
+        account,
+        pipelined,
+    )
+
+
+@instrumented
+def deposit_token(contract, token_contract, amount, account=None):
+    account = account or get_account()
     amount2 = web3.toWei(amount, "ether")
     token_contract.approve(contract.address, amount2, {"from": account}).wait(1)
     contract.depositToken(token_contract.address, amount2, {"from": account}).wait(1)
     print("Deposited " + str(amount) + " " + token_contract.symbol() + ".", "\n\n")
 
 
-def withdraw_token(contract, token_contract, amount, account=get_account()):
+@instrumented
+def withdraw_token(contract, token_contract, amount, account=None):
+    account = account or get_account()
     amount2 = web3.toWei(amount, "ether")
     contract.withdrawToken(token_contract.address, amount2, {"from": account}).wait(1)
     print("Withdrew " + str(amount) + " " + token_contract.symbol() + ".", "\n\n")
 
 
 def change_staking_reward_token(
-    contract, token_contract, reward_token_contract, account=get_account()
+    contract, token_contract, reward_token_contract, account=None
 ):
+    account = account or get_account()
     contract.changeStakingRewardToken(
         token_contract.address, reward_token_contract.address, {"from": account}
     ).wait(1)
@@ -340,20 +1173,26 @@ def change_staking_reward_token(
     )
 
 
-def stake_token(contract, token_contract, amount, account=get_account()):
+@instrumented
+def stake_token(contract, token_contract, amount, account=None):
+    account = account or get_account()
     amount2 = web3.toWei(amount, "ether")
     token_contract.approve(contract.address, amount2, {"from": account}).wait(1)
     contract.stakeToken(token_contract.address, amount2, {"from": account}).wait(1)
     print("Staked " + str(amount) + " " + token_contract.symbol() + ".", "\n\n")
 
 
-def unstake_token(contract, token_contract, amount, account=get_account()):
+@instrumented
+def unstake_token(contract, token_contract, amount, account=None):
+    account = account or get_account()
     amount2 = web3.toWei(amount, "ether")
     contract.unstakeToken(token_contract.address, amount2, {"from": account}).wait(1)
     print("Unstaked " + str(amount) + " " + token_contract.symbol() + ".", "\n\n")
 
 
-def claim_staking_reward(contract, token_contract, account=get_account()):
+@instrumented
+def claim_staking_reward(contract, token_contract, account=None):
+    account = account or get_account()
     contract.claimStakingReward(token_contract.address, {"from": account}).wait(1)
     print(
         "Claimed " + token_contract.symbol() + " staking reward.",
@@ -361,9 +1200,9 @@ def claim_staking_reward(contract, token_contract, account=get_account()):
     )
 
 
-def withdraw_staking_reward(
-    contract, reward_token_contract, amount, account=get_account()
-):
+@instrumented
+def withdraw_staking_reward(contract, reward_token_contract, amount, account=None):
+    account = account or get_account()
     amount2 = web3.toWei(amount, "ether")
     contract.withdrawRewardToken(
         reward_token_contract.address, amount2, {"from": account}
@@ -374,50 +1213,215 @@ def withdraw_staking_reward(
     )
 
 
-def generate_front_end_tokens_data(contract):
-    tokens_data = get_tokens_data(contract)
+def to_front_end_token_data(token_data):
+    category = token_data["category"]
+    name = token_data["name"].lower()
+    token_data["icon"] = (
+        ["/savvy-finance/icons/{}.png".format(name)]
+        if category == 0
+        else [
+            "/savvy-finance/icons/{}.png".format(name.split("-")[0]),
+            "/savvy-finance/icons/{}.png".format(name.split("-")[1]),
+        ]
+    )
+    token_data["stakerData"] = {
+        "walletBalance": 0,
+        "rewardBalance": 0,
+        "stakingBalance": 0,
+        "stakingRewardToken": get_address("zero"),
+        "stakingRewards": [
+            # {
+            #     "id": 0,
+            #     "staker": get_address("zero"),
+            #     "rewardToken": get_address("zero"),
+            #     "rewardTokenPrice": 0,
+            #     "rewardTokenAmount": 0,
+            #     "stakedToken": get_address("zero"),
+            #     "stakedTokenPrice": 0,
+            #     "stakedTokenAmount": 0,
+            #     "stakingApr": 0,
+            #     "stakingDurationInSeconds": 0,
+            #     "triggeredBy": ["", ""],
+            #     "timestampAdded": 0,
+            #     "timestampLastUpdated": 0,
+            # }
+        ],
+        "timestampLastRewarded": 0,
+        "timestampAdded": 0,
+        "timestampLastUpdated": 0,
+    }
+    return token_data
+
+
+def iter_front_end_tokens_data(
+    contract, chunk_size=MULTICALL_CHUNK_SIZE, multicall_contract=None
+):
+    """Yields the front end data of every token, reading `chunk_size` tokens at a
+    time at a pinned block, so the whole token list is never held in memory.
+    """
+    block_identifier = web3.eth.block_number
+    tokens = iter_tokens(contract, chunk_size, block_identifier)
+    while True:
+        tokens_chunk = list(islice(tokens, chunk_size))
+        if not tokens_chunk:
+            return
+        for token_data in get_tokens_data(
+            contract,
+            {token: token for token in tokens_chunk},
+            multicall_contract,
+            chunk_size,
+            block_identifier=block_identifier,
+        ):
+            yield to_front_end_token_data(token_data)
+
+
+def replace_front_end_file(path, content):
+    # written next to the file then renamed over it, so a reader never sees a
+    # partially written file
+    with open(path + ".tmp", "wb") as front_end_file:
+        front_end_file.write(content)
+    os.replace(path + ".tmp", path)
+
+
+def write_front_end_file(path, content, compressions=()):
+    """Writes `content` (bytes) to `path` and its precompressed variants
+    (path.gz, path.br) for each of `compressions` ("gzip", "brotli").
+    """
+    for compression in compressions:
+        if compression not in FRONT_END_COMPRESSIONS_EXTENSIONS:
+            raise ValueError("Unknown compression: " + compression)
+        if compression == "brotli" and brotli is None:
+            raise ImportError("Install brotli to write brotli compressed files.")
+    replace_front_end_file(path, content)
+    for compression in compressions:
+        if compression == "gzip":
+            # mtime=0 keeps the output identical for identical content
+            replace_front_end_file(path + ".gz", gzip.compress(content, 9, mtime=0))
+        else:
+            replace_front_end_file(path + ".br", brotli.compress(content))
+
+
+def front_end_file_exists(path, compressions=()):
+    # the file and every precompressed variant of it
+    return os.path.exists(path) and all(
+        os.path.exists(path + FRONT_END_COMPRESSIONS_EXTENSIONS[compression])
+        for compression in compressions
+    )
+
+
+def get_front_end_tokens_index(folder):
+    index_path = os.path.join(folder, FRONT_END_TOKENS_INDEX)
+    if not os.path.exists(index_path):
+        return {"tokens": []}
+    with open(index_path, "r") as front_end_tokens_index:
+        return json.load(front_end_tokens_index)
+
+
+def generate_front_end_tokens_data(
+    contract,
+    split=False,
+    folder=FRONT_END_TOKENS_FOLDER,
+    compressions=(),
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    multicall_contract=None,
+):
+    """Exports the front end tokens data.
+    By default the tokens are streamed into a single ./tokens.json, through a
+    temporary file renamed over it once complete.
+    When split, every token is written to <folder>/<address>.json next to an
+    index.json listing each token file with the sha256 of its content. Files
+    whose hash did not change since the last export, and which exist with all
+    their precompressed variants, are not rewritten, so the front end only
+    needs to refetch the files whose hash changed in the index.
+    Args:
+        compressions (tuple, optional): Also write precompressed variants of
+        every written file, "gzip" (.gz) and/or "brotli" (.br).
+    Returns:
+        [int]: The number of token files written.
+    """
+    tokens_data = iter_front_end_tokens_data(contract, chunk_size, multicall_contract)
+    if not split:
+        with open(FRONT_END_TOKENS_FILE + ".tmp", "w") as front_end_tokens_data:
+            front_end_tokens_data.write("[")
+            for index, token_data in enumerate(tokens_data):
+                if index > 0:
+                    front_end_tokens_data.write(", ")
+                json.dump(token_data, front_end_tokens_data)
+            front_end_tokens_data.write("]")
+        os.replace(FRONT_END_TOKENS_FILE + ".tmp", FRONT_END_TOKENS_FILE)
+        return 1
+
+    os.makedirs(folder, exist_ok=True)
+    previous_hashes = {
+        token["file"]: token["hash"]
+        for token in get_front_end_tokens_index(folder)["tokens"]
+    }
+    index = {"tokens": []}
+    written_files = 0
     for token_data in tokens_data:
-        category = token_data["category"]
-        name = token_data["name"].lower()
-        token_data["icon"] = (
-            ["/savvy-finance/icons/{}.png".format(name)]
-            if category == 0
-            else [
-                "/savvy-finance/icons/{}.png".format(name.split("-")[0]),
-                "/savvy-finance/icons/{}.png".format(name.split("-")[1]),
-            ]
+        content = json.dumps(token_data).encode()
+        content_hash = hashlib.sha256(content).hexdigest()
+        file = token_data["address"] + ".json"
+        index["tokens"].append(
+            {"address": token_data["address"], "file": file, "hash": content_hash}
         )
-        token_data["stakerData"] = {
-            "walletBalance": 0,
-            "rewardBalance": 0,
-            "stakingBalance": 0,
-            "stakingRewardToken": get_address("zero"),
-            "stakingRewards": [
-                # {
-                #     "id": 0,
-                #     "staker": get_address("zero"),
-                #     "rewardToken": get_address("zero"),
-                #     "rewardTokenPrice": 0,
-                #     "rewardTokenAmount": 0,
-                #     "stakedToken": get_address("zero"),
-                #     "stakedTokenPrice": 0,
-                #     "stakedTokenAmount": 0,
-                #     "stakingApr": 0,
-                #     "stakingDurationInSeconds": 0,
-                #     "triggeredBy": ["", ""],
-                #     "timestampAdded": 0,
-                #     "timestampLastUpdated": 0,
-                # }
-            ],
-            "timestampLastRewarded": 0,
-            "timestampAdded": 0,
-            "timestampLastUpdated": 0,
-        }
-    with open("./tokens.json", "w") as front_end_tokens_data:
-        json.dump(tokens_data, front_end_tokens_data)
+        if previous_hashes.pop(file, None) == content_hash and front_end_file_exists(
+            os.path.join(folder, file), compressions
+        ):
+            continue
+        write_front_end_file(os.path.join(folder, file), content, compressions)
+        written_files += 1
+    # tokens that are no longer listed
+    for file in previous_hashes:
+        for extension in ["", ".gz", ".br"]:
+            if os.path.exists(os.path.join(folder, file + extension)):
+                os.remove(os.path.join(folder, file + extension))
+    write_front_end_file(
+        os.path.join(folder, FRONT_END_TOKENS_INDEX),
+        json.dumps(index).encode(),
+        compressions,
+    )
+    print(
+        str(written_files)
+        + " of "
+        + str(len(index["tokens"]))
+        + " token files written.",
+        "\n\n",
+    )
+    return written_files
+
+
+def sync_front_end_tokens_data(src, dest):
+    """Copies the token files of a split export whose hash changed, removes the
+    ones that are no longer listed, then copies the index.
+    """
+    os.makedirs(dest, exist_ok=True)
+    dest_hashes = {
+        token["file"]: token["hash"]
+        for token in get_front_end_tokens_index(dest)["tokens"]
+    }
+    for token in get_front_end_tokens_index(src)["tokens"]:
+        if dest_hashes.pop(token["file"], None) == token["hash"]:
+            continue
+        for extension in ["", ".gz", ".br"]:
+            if os.path.exists(os.path.join(src, token["file"] + extension)):
+                shutil.copyfile(
+                    os.path.join(src, token["file"] + extension),
+                    os.path.join(dest, token["file"] + extension),
+                )
+    for file in dest_hashes:
+        for extension in ["", ".gz", ".br"]:
+            if os.path.exists(os.path.join(dest, file + extension)):
+                os.remove(os.path.join(dest, file + extension))
+    for extension in ["", ".gz", ".br"]:
+        if os.path.exists(os.path.join(src, FRONT_END_TOKENS_INDEX + extension)):
+            shutil.copyfile(
+                os.path.join(src, FRONT_END_TOKENS_INDEX + extension),
+                os.path.join(dest, FRONT_END_TOKENS_INDEX + extension),
+            )
 
 
-def update_front_end():
+def update_front_end(split=False):
     copy_folder("./build", "../front_end/src/back_end_build")
     with open("./brownie-config.yaml", "r") as brownie_config:
         config_dict = yaml.load(brownie_config, Loader=yaml.FullLoader)
@@ -425,27 +1429,152 @@ def update_front_end():
             "../front_end/src/brownie-config.json", "w"
         ) as front_end_brownie_config:
             json.dump(config_dict, front_end_brownie_config)
-    shutil.copyfile("./tokens.json", "../front_end/src/tokens.json")
+    if split:
+        sync_front_end_tokens_data(
+            FRONT_END_TOKENS_FOLDER, "../front_end/public/tokens"
+        )
+    else:
+        shutil.copyfile(FRONT_END_TOKENS_FILE, "../front_end/src/tokens.json")
     print("Front end updated!")
 
 
-def upgrade_savvy_finance_farm():
-    proxy_admin = ProxyAdmin[-1]
-    savvy_finance_farm_proxy = TransparentUpgradeableProxy[-1]
-    savvy_finance_farm_library = deploy_savvy_finance_farm_library()
-    savvy_finance_farm = deploy_savvy_finance_farm()
-    upgrade_transparent_upgradeable_proxy(
-        proxy_admin, savvy_finance_farm_proxy, savvy_finance_farm
+def deploy_savvy_finance_contracts(manifest, account=None):
+    """Deploys (or reuses, see get_or_deploy_contract) the ProxyAdmin and the
+    SavvyFinance token behind its proxy.
+    """
+    account = account or get_account()
+    proxy_admin = get_or_deploy_contract(
+        manifest, "ProxyAdmin", ProxyAdmin, partial(deploy_proxy_admin, account)
+    )
+    savvy_finance = get_or_deploy_contract(
+        manifest,
+        "SavvyFinanceUpgradeable",
+        SavvyFinanceUpgradeable,
+        partial(deploy_savvy_finance_upgradeable, account),
+    )
+    savvy_finance_proxy = get_or_deploy_transparent_upgradeable_proxy(
+        manifest,
+        "SavvyFinanceProxy",
+        proxy_admin,
+        savvy_finance,
+        web3.toWei(1000000, "ether"),
+        account=account,
+    )
+    return proxy_admin, savvy_finance, savvy_finance_proxy
+
+
+def deploy_savvy_finance_farm_contracts(manifest, proxy_admin, account=None):
+    """Deploys (or reuses) the farm library and the farm, and points the farm
+    proxy at the farm, upgrading it only if the farm or its library changed.
+    """
+    account = account or get_account()
+    savvy_finance_farm_library_bytecode_hash = get_bytecode_hash(
+        SavvyFinanceFarmLibrary
     )
+    savvy_finance_farm_library = get_or_deploy_contract(
+        manifest,
+        "SavvyFinanceFarmLibrary",
+        SavvyFinanceFarmLibrary,
+        partial(deploy_savvy_finance_farm_library, account),
+        savvy_finance_farm_library_bytecode_hash,
+    )
+    savvy_finance_farm = get_or_deploy_contract(
+        manifest,
+        "SavvyFinanceFarm",
+        SavvyFinanceFarm,
+        partial(deploy_savvy_finance_farm, account),
+        get_bytecode_hash(SavvyFinanceFarm, savvy_finance_farm_library_bytecode_hash),
+    )
+    savvy_finance_farm_proxy = get_or_deploy_transparent_upgradeable_proxy(
+        manifest,
+        "SavvyFinanceFarmProxy",
+        proxy_admin,
+        savvy_finance_farm,
+        account=account,
+    )
+    return savvy_finance_farm_library, savvy_finance_farm, savvy_finance_farm_proxy
+
+
+def import_deployment_manifest():
+    """Returns the deployment manifest, importing it once from the contracts
+    brownie recorded in build/deployments when the network has none yet. The
+    proxies are told apart by their implementation. The implementations are
+    imported without a bytecode hash, so get_contracts("update") redeploys
+    them once.
+    """
+    manifest = load_deployment_manifest()
+    if manifest:
+        return manifest
+    for name, contract_container in [
+        ("ProxyAdmin", ProxyAdmin),
+        ("SavvyFinanceUpgradeable", SavvyFinanceUpgradeable),
+        ("SavvyFinanceFarmLibrary", SavvyFinanceFarmLibrary),
+        ("SavvyFinanceFarm", SavvyFinanceFarm),
+    ]:
+        if len(contract_container) > 0:
+            manifest[name] = {
+                "address": contract_container[-1].address,
+                "bytecodeHash": None,
+                "codeHash": get_code_hash(contract_container[-1].address),
+            }
+    proxies_implementations = {
+        "SavvyFinanceProxy": [contract.address for contract in SavvyFinanceUpgradeable],
+        "SavvyFinanceFarmProxy": [contract.address for contract in SavvyFinanceFarm],
+    }
+    # oldest first, so the latest proxy of each implementation is kept
+    for proxy in TransparentUpgradeableProxy:
+        implementation = get_implementation_address(proxy.address)
+        for name, implementations in proxies_implementations.items():
+            if implementation in implementations:
+                manifest[name] = {
+                    "address": proxy.address,
+                    "codeHash": get_code_hash(proxy.address),
+                }
+    if manifest:
+        save_deployment_manifest(manifest)
+        print("Imported the deployment manifest from build/deployments.", "\n\n")
+    return manifest
+
+
+def upgrade_savvy_finance_farm(allow_clamped=False):
+    """Upgrades the recorded farm proxy to the current farm and migrates its
+    storage, after check_storage_migration when it has the unpacked layout.
+    """
+    manifest = import_deployment_manifest()
+    proxy_admin = get_deployed_contract(manifest, "ProxyAdmin", ProxyAdmin)
+    savvy_finance_farm_proxy = get_deployed_contract(
+        manifest, "SavvyFinanceFarmProxy", TransparentUpgradeableProxy
+    )
+    old_savvy_finance_farm = Contract.from_abi(
+        SavvyFinanceFarm._name, savvy_finance_farm_proxy.address, SavvyFinanceFarm.abi
+    )
+    # farms with the unpacked storage layout have no storage version
+    if not has_function(old_savvy_finance_farm, "getStorageVersion"):
+        check_storage_migration(old_savvy_finance_farm, allow_clamped)
+    (
+        _,
+        savvy_finance_farm,
+        savvy_finance_farm_proxy,
+    ) = deploy_savvy_finance_farm_contracts(manifest, proxy_admin)
     proxy_savvy_finance_farm = Contract.from_abi(
         savvy_finance_farm._name,
         savvy_finance_farm_proxy.address,
         savvy_finance_farm.abi,
     )
+    migrate_storage(proxy_savvy_finance_farm)
     return proxy_savvy_finance_farm
 
 
 def get_contracts(deploy=None):
+    """Returns the proxy admin, the token and farm proxies (with the token and
+    farm ABIs) and the farm library.
+    Args:
+        deploy (string, optional): "all" deploys a new stack and "farm" a new
+        farm for the recorded token, neither is recorded in the deployment
+        manifest. "update" deploys only what is missing or changed since the
+        stack recorded in deployments/<network>.json. Defaults to None, which
+        deploys nothing and raises when a contract is not recorded.
+    """
     if deploy == "all":
         proxy_admin = deploy_proxy_admin()
         savvy_finance = deploy_savvy_finance_upgradeable()
@@ -457,22 +1586,43 @@ def get_contracts(deploy=None):
         savvy_finance_farm_proxy = deploy_transparent_upgradeable_proxy(
             proxy_admin, savvy_finance_farm
         )
-    elif deploy == "farm":
-        proxy_admin = ProxyAdmin[-1]
-        savvy_finance = SavvyFinanceUpgradeable[-1]
-        savvy_finance_proxy = TransparentUpgradeableProxy[-2]
-        savvy_finance_farm_library = deploy_savvy_finance_farm_library()
-        savvy_finance_farm = deploy_savvy_finance_farm()
-        savvy_finance_farm_proxy = deploy_transparent_upgradeable_proxy(
-            proxy_admin, savvy_finance_farm
-        )
+    elif deploy == "update":
+        manifest = import_deployment_manifest()
+        (
+            proxy_admin,
+            savvy_finance,
+            savvy_finance_proxy,
+        ) = deploy_savvy_finance_contracts(manifest)
+        (
+            savvy_finance_farm_library,
+            savvy_finance_farm,
+            savvy_finance_farm_proxy,
+        ) = deploy_savvy_finance_farm_contracts(manifest, proxy_admin)
     else:
-        proxy_admin = ProxyAdmin[-1]
-        savvy_finance = SavvyFinanceUpgradeable[-1]
-        savvy_finance_proxy = TransparentUpgradeableProxy[-2]
-        savvy_finance_farm_library = SavvyFinanceFarmLibrary[-1]
-        savvy_finance_farm = SavvyFinanceFarm[-1]
-        savvy_finance_farm_proxy = TransparentUpgradeableProxy[-1]
+        manifest = import_deployment_manifest()
+        proxy_admin = get_deployed_contract(manifest, "ProxyAdmin", ProxyAdmin)
+        savvy_finance = get_deployed_contract(
+            manifest, "SavvyFinanceUpgradeable", SavvyFinanceUpgradeable
+        )
+        savvy_finance_proxy = get_deployed_contract(
+            manifest, "SavvyFinanceProxy", TransparentUpgradeableProxy
+        )
+        if deploy == "farm":
+            savvy_finance_farm_library = deploy_savvy_finance_farm_library()
+            savvy_finance_farm = deploy_savvy_finance_farm()
+            savvy_finance_farm_proxy = deploy_transparent_upgradeable_proxy(
+                proxy_admin, savvy_finance_farm
+            )
+        else:
+            savvy_finance_farm_library = get_deployed_contract(
+                manifest, "SavvyFinanceFarmLibrary", SavvyFinanceFarmLibrary
+            )
+            savvy_finance_farm = get_deployed_contract(
+                manifest, "SavvyFinanceFarm", SavvyFinanceFarm
+            )
+            savvy_finance_farm_proxy = get_deployed_contract(
+                manifest, "SavvyFinanceFarmProxy", TransparentUpgradeableProxy
+            )
 
     proxy_savvy_finance = Contract.from_abi(
         savvy_finance._name, savvy_finance_proxy.address, savvy_finance.abi
@@ -500,7 +1650,7 @@ def main():
         proxy_savvy_finance,
         proxy_savvy_finance_farm,
         savvy_finance_farm_library,
-    ) = get_contracts("all")
+    ) = get_contracts("update")
     # proxy_savvy_finance_farm = upgrade_savvy_finance_farm()
 
     #####
@@ -531,16 +1681,16 @@ def main():
     # set_token_categories(proxy_savvy_finance_farm, ["DEFAULT", "LP"])
 
     #####
-    add_tokens(proxy_savvy_finance_farm, tokens, account1)
+    add_tokens(proxy_savvy_finance_farm, tokens, account1, pipelined=True)
     set_token_reward_token(
         proxy_savvy_finance_farm,
         get_contract("wbnb_busd_lp_token"),
         proxy_savvy_finance,
         account1,
     )
-    activate_tokens(proxy_savvy_finance_farm, tokens)
-    verify_tokens(proxy_savvy_finance_farm, tokensx)
-    enable_tokens_multi_token_rewards(proxy_savvy_finance_farm, tokensx)
+    activate_tokens(proxy_savvy_finance_farm, tokens, pipelined=True)
+    verify_tokens(proxy_savvy_finance_farm, tokensx, pipelined=True)
+    enable_tokens_multi_token_rewards(proxy_savvy_finance_farm, tokensx, pipelined=True)
     # #####
     exclude_from_fees(proxy_savvy_finance_farm, account1.address)
     deposit_token(proxy_savvy_finance_farm, proxy_savvy_finance, 2000, account1)
@@ -577,9 +1727,22 @@ def main():
     # proxy_savvy_finance_farm.issueStakingRewards({"from": get_account()}).wait(1)
     #####
 
-    print_json(get_tokens_data(proxy_savvy_finance_farm))
-    print_json(get_stakers_data(proxy_savvy_finance_farm))
-    print_json(get_tokens_stakers_data(proxy_savvy_finance_farm))
+    savvy_finance_farm_multicall = deploy_savvy_finance_farm_multicall()
+    print_json(
+        get_tokens_data(
+            proxy_savvy_finance_farm, multicall_contract=savvy_finance_farm_multicall
+        )
+    )
+    print_json(
+        get_stakers_data(
+            proxy_savvy_finance_farm, multicall_contract=savvy_finance_farm_multicall
+        )
+    )
+    print_json(
+        get_tokens_stakers_data(
+            proxy_savvy_finance_farm, multicall_contract=savvy_finance_farm_multicall
+        )
+    )
     print(from_wei(proxy_savvy_finance.balanceOf(proxy_savvy_finance_farm.address)))
     print(from_wei(proxy_savvy_finance.balanceOf(account1.address)))
     print(from_wei(proxy_savvy_finance.balanceOf(account2.address)))
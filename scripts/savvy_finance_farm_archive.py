@@ -0,0 +1,534 @@
+from brownie import network, web3
+from scripts.common import MULTICALL_CHUNK_SIZE, batch_call, has_function
+from scripts.savvy_finance_farm import (
+    PAGE_SIZE,
+    STAKING_REWARD_TRIGGERS,
+    get_contracts,
+    iter_compact_staking_rewards,
+    iter_pages,
+    iter_tokens,
+    iter_stakers,
+)
+from scripts.savvy_finance_farm_records import (
+    WEI_DECIMALS,
+    get_tokens_decimals,
+    StakingRewardRecord,
+)
+import os, json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ARCHIVES_FOLDER = "./archives"
+ARCHIVE_META = "meta.json"
+# rows buffered per append and scanned per query step, bounds the memory used
+# by the exporter and the queries whatever the archive size
+ARCHIVE_CHUNK_SIZE = 100000
+# (hi, lo) uint64 halves of a 128-bit unsigned integer, the widest the farm
+# packs its amounts in
+ARCHIVE_UINT128 = "<u8,<u8"
+# field => dtype of its column file. Prices, amounts, APRs and durations are
+# stored raw, as the farm returns them, see ARCHIVE_INTEGER_FIELDS. staker,
+# stakedToken and rewardToken are indexes into the archive stakers and tokens
+# dictionaries and trigger an index into STAKING_REWARD_TRIGGERS.
+ARCHIVE_FIELDS = {
+    "id": "<u8",
+    "staker": "<u4",
+    "stakedToken": "<u4",
+    "rewardToken": "<u4",
+    "rewardTokenPrice": ARCHIVE_UINT128,
+    "rewardTokenAmount": ARCHIVE_UINT128,
+    "stakedTokenPrice": ARCHIVE_UINT128,
+    "stakedTokenAmount": ARCHIVE_UINT128,
+    "stakingApr": ARCHIVE_UINT128,
+    "stakingDurationInSeconds": ARCHIVE_UINT128,
+    "trigger": "<u1",
+    "triggerAmount": ARCHIVE_UINT128,
+    "timestampAdded": "<i8",
+    "timestampLastUpdated": "<i8",
+}
+# raw integer field => the decimals it is scaled by when read, as in the
+# staking reward dicts, or the token field whose decimals scale it.
+# triggerAmount is already in whole staked tokens (_toTriggeredBy).
+ARCHIVE_INTEGER_FIELDS = {
+    "rewardTokenPrice": WEI_DECIMALS,
+    "rewardTokenAmount": "rewardToken",
+    "stakedTokenPrice": WEI_DECIMALS,
+    "stakedTokenAmount": "stakedToken",
+    "stakingApr": WEI_DECIMALS,
+    "stakingDurationInSeconds": WEI_DECIMALS,
+    "triggerAmount": 0,
+}
+ARCHIVE_ADDRESS_FIELDS = {
+    "staker": "stakers",
+    "stakedToken": "tokens",
+    "rewardToken": "tokens",
+}
+ARCHIVE_GROUP_KEYS = ["staker", "stakedToken", "rewardToken", "trigger", "day"]
+
+
+def get_archive_column_path(archive, field):
+    return os.path.join(archive["folder"], field + ".bin")
+
+
+def save_archive_meta(archive):
+    # the meta is written last and atomically, so rows appended to the column
+    # files by an interrupted export are ignored and truncated on the next open
+    path = os.path.join(archive["folder"], ARCHIVE_META)
+    with open(path + ".tmp", "w") as meta_file:
+        json.dump(
+            {key: value for key, value in archive.items() if key != "folder"},
+            meta_file,
+        )
+    os.replace(path + ".tmp", path)
+
+
+def open_staking_rewards_archive(folder=None):
+    """Opens (and creates if needed) the columnar archive of the staking
+    rewards history: one file of fixed-width little-endian values per field of
+    ARCHIVE_FIELDS, which can be memory-mapped, and a meta.json with the row
+    count, the stakers and tokens dictionaries (and the tokens decimals) and
+    the export progress.
+    Args:
+        folder (string, optional): Folder of the archive.
+        Defaults to ./archives/<active network>.
+    Returns:
+        [dict]: The archive meta, with its folder.
+    """
+    if numpy is None:
+        raise ImportError("Install numpy to use the staking rewards archive.")
+    if not folder:
+        folder = os.path.join(ARCHIVES_FOLDER, network.show_active())
+    os.makedirs(folder, exist_ok=True)
+    archive = {
+        "rows": 0,
+        "fields": ARCHIVE_FIELDS,
+        "stakers": [],
+        "tokens": [],
+        "tokensDecimals": [],
+        "stakingRewardsCounts": {},
+        "lastBlock": -1,
+    }
+    meta_path = os.path.join(folder, ARCHIVE_META)
+    if os.path.exists(meta_path):
+        with open(meta_path) as meta_file:
+            archive = json.load(meta_file)
+        if archive["fields"] != ARCHIVE_FIELDS:
+            raise ValueError(
+                "The archive in " + folder + " was written with other fields."
+            )
+    archive["folder"] = folder
+    for field, dtype in ARCHIVE_FIELDS.items():
+        path = get_archive_column_path(archive, field)
+        with open(path, "ab") as column_file:
+            column_file.truncate(archive["rows"] * numpy.dtype(dtype).itemsize)
+    if not os.path.exists(meta_path):
+        save_archive_meta(archive)
+    return archive
+
+
+def get_archive_index(archive, dictionary, address, indexes):
+    # indexes is the address => index map of the dictionary, kept by the caller
+    # so appends don't scan the dictionary
+    if address not in indexes:
+        indexes[address] = len(archive[dictionary])
+        archive[dictionary].append(address)
+    return indexes[address]
+
+
+def to_uint128_column(field, values):
+    if any(value >= 2**128 for value in values):
+        raise ValueError("A " + field + " value doesn't fit 128 bits.")
+    return numpy.array(
+        [(value >> 64, value & (2**64 - 1)) for value in values],
+        dtype=ARCHIVE_UINT128,
+    )
+
+
+def from_uint128_column(archive, field, values, token_indexes=None):
+    """Scales the raw (hi, lo) values of a field of ARCHIVE_INTEGER_FIELDS into
+    floats, each correctly rounded as in the staking reward dicts.
+    Args:
+        token_indexes (list, optional): The values of the token field that
+        scales `field`, when it is scaled by the token decimals.
+    """
+    decimals = ARCHIVE_INTEGER_FIELDS[field]
+    if isinstance(decimals, int):
+        decimals = [decimals] * len(values)
+    else:
+        decimals = [archive["tokensDecimals"][index] for index in token_indexes]
+    return numpy.array(
+        [
+            ((hi << 64) | lo) / 10**value_decimals
+            for (hi, lo), value_decimals in zip(values.tolist(), decimals)
+        ],
+        dtype="<f8",
+    )
+
+
+def get_archive_read_fields(fields):
+    # the fields and the token fields that scale them
+    return set(fields) | {
+        ARCHIVE_INTEGER_FIELDS[field]
+        for field in fields
+        if isinstance(ARCHIVE_INTEGER_FIELDS.get(field), str)
+    }
+
+
+def get_archive_read_dtype(field, raw=False):
+    # dtype of the values read_archive_column returns
+    if field not in ARCHIVE_INTEGER_FIELDS:
+        return ARCHIVE_FIELDS[field]
+    return object if raw else "<f8"
+
+
+def read_archive_column(archive, field, chunk, mask, raw=False):
+    # the masked rows of a chunk column, amounts scaled unless `raw`
+    values = numpy.asarray(chunk[field][mask])
+    if field not in ARCHIVE_INTEGER_FIELDS:
+        return values
+    if raw:
+        return numpy.array(
+            [(hi << 64) | lo for hi, lo in values.tolist()], dtype=object
+        )
+    token_field = ARCHIVE_INTEGER_FIELDS[field]
+    return from_uint128_column(
+        archive,
+        field,
+        values,
+        (
+            numpy.asarray(chunk[token_field][mask]).tolist()
+            if isinstance(token_field, str)
+            else None
+        ),
+    )
+
+
+def append_staking_rewards(archive, staking_rewards, staking_rewards_counts=None):
+    """Appends StakingRewardRecord rows to the archive columns.
+    Args:
+        staking_rewards_counts (dict, optional): "token:staker" => stored
+        staking rewards exported so far, saved with the rows.
+    """
+    dictionaries_indexes = {
+        dictionary: {
+            address: index for index, address in enumerate(archive[dictionary])
+        }
+        for dictionary in ["stakers", "tokens"]
+    }
+    columns = {field: [] for field in ARCHIVE_FIELDS}
+    for staking_reward in staking_rewards:
+        (trigger, trigger_amount) = staking_reward.triggeredBy
+        for field in ARCHIVE_FIELDS:
+            if field in ARCHIVE_ADDRESS_FIELDS:
+                dictionary = ARCHIVE_ADDRESS_FIELDS[field]
+                value = get_archive_index(
+                    archive,
+                    dictionary,
+                    getattr(staking_reward, field),
+                    dictionaries_indexes[dictionary],
+                )
+                if dictionary == "tokens" and value == len(archive["tokensDecimals"]):
+                    # a token new to the dictionary
+                    archive["tokensDecimals"].append(
+                        getattr(staking_reward, field + "Decimals")
+                    )
+            elif field == "trigger":
+                value = STAKING_REWARD_TRIGGERS.index(trigger)
+            elif field == "triggerAmount":
+                value = int(trigger_amount or 0)
+            else:
+                value = getattr(staking_reward, field)
+            columns[field].append(value)
+    for field, dtype in ARCHIVE_FIELDS.items():
+        with open(get_archive_column_path(archive, field), "ab") as column_file:
+            (
+                to_uint128_column(field, columns[field])
+                if dtype == ARCHIVE_UINT128
+                else numpy.array(columns[field], dtype=dtype)
+            ).tofile(column_file)
+    archive["rows"] += len(columns["id"])
+    archive["stakingRewardsCounts"].update(staking_rewards_counts or {})
+    save_archive_meta(archive)
+    return len(columns["id"])
+
+
+def export_staking_rewards(
+    contract,
+    archive=None,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    block_identifier=None,
+    page_size=PAGE_SIZE,
+):
+    """Appends the staking rewards issued since the last export to the archive,
+    at a pinned block. Stored staking rewards are read page by page from the
+    last exported one of every pair, and the ones issued in compact mode from
+    the logs after the last exported block, so the history is never held in
+    memory as a whole.
+    Returns:
+        [int]: The number of rows appended.
+    """
+    archive = archive or open_staking_rewards_archive()
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+    read_options = {
+        "multicall_contract": multicall_contract,
+        "chunk_size": chunk_size,
+        "max_workers": max_workers,
+        "block_identifier": block_identifier,
+    }
+    tokens = list(iter_tokens(contract, page_size, block_identifier))
+    stakers = list(iter_stakers(contract, page_size, block_identifier))
+    tokens_stakers = [(token, staker) for token in tokens for staker in stakers]
+    tokens_decimals = get_tokens_decimals(tokens, **read_options)
+
+    def to_records(staking_rewards):
+        tokens_decimals.update(
+            get_tokens_decimals(
+                {
+                    token
+                    for staking_reward in staking_rewards
+                    for token in [
+                        staking_reward.rewardToken,
+                        staking_reward.stakedToken,
+                    ]
+                }
+                - set(tokens_decimals),
+                **read_options,
+            )
+        )
+        for staking_reward in staking_rewards:
+            staking_reward.rewardTokenDecimals = tokens_decimals[
+                staking_reward.rewardToken
+            ]
+            staking_reward.stakedTokenDecimals = tokens_decimals[
+                staking_reward.stakedToken
+            ]
+        return staking_rewards
+
+    appended_rows = 0
+    pending_staking_rewards = []
+    pending_staking_rewards_counts = {}
+    for (token, staker), token_staker_summary in zip(
+        tokens_stakers,
+        batch_call(contract.getTokenStakerSummary, tokens_stakers, **read_options),
+    ):
+        key = token + ":" + staker
+        offset = archive["stakingRewardsCounts"].get(key, 0)
+        if token_staker_summary[3] <= offset:
+            continue
+        for staking_reward in iter_pages(
+            contract.getTokenStakerRewardsPage,
+            (token, staker),
+            page_size,
+            block_identifier,
+            offset,
+        ):
+            pending_staking_rewards.append(StakingRewardRecord(staking_reward))
+            offset += 1
+            pending_staking_rewards_counts[key] = offset
+            if len(pending_staking_rewards) >= ARCHIVE_CHUNK_SIZE:
+                appended_rows += append_staking_rewards(
+                    archive,
+                    to_records(pending_staking_rewards),
+                    pending_staking_rewards_counts,
+                )
+                pending_staking_rewards = []
+                pending_staking_rewards_counts = {}
+    if pending_staking_rewards:
+        appended_rows += append_staking_rewards(
+            archive,
+            to_records(pending_staking_rewards),
+            pending_staking_rewards_counts,
+        )
+
+    # the compact rows are flushed at the end of a log range, with the range
+    # as lastBlock, so they can't be appended twice
+    compact_staking_rewards = []
+    if has_function(contract, "compactStakingRewardsCount", block_identifier):
+        for range_to_block, staking_rewards in iter_compact_staking_rewards(
+            contract, archive["lastBlock"] + 1, block_identifier
+        ):
+            compact_staking_rewards.extend(staking_rewards)
+            if len(compact_staking_rewards) >= ARCHIVE_CHUNK_SIZE:
+                archive["lastBlock"] = range_to_block
+                appended_rows += append_staking_rewards(
+                    archive, to_records(compact_staking_rewards)
+                )
+                compact_staking_rewards = []
+    archive["lastBlock"] = block_identifier
+    appended_rows += append_staking_rewards(
+        archive, to_records(compact_staking_rewards)
+    )
+    print(
+        "Archived "
+        + str(appended_rows)
+        + " staking rewards up to block "
+        + str(block_identifier)
+        + ", "
+        + str(archive["rows"])
+        + " in total.",
+        "\n\n",
+    )
+    return appended_rows
+
+
+def get_archive_columns(archive, fields=None):
+    """Memory-maps the archive columns read-only, nothing is read until used.
+    Returns:
+        [dict]: field => numpy array of archive["rows"] values.
+    """
+    columns = {}
+    for field in fields or ARCHIVE_FIELDS:
+        dtype = ARCHIVE_FIELDS[field]
+        if archive["rows"] == 0:
+            # mmap can't map an empty file
+            columns[field] = numpy.empty(0, dtype=dtype)
+            continue
+        columns[field] = numpy.memmap(
+            get_archive_column_path(archive, field),
+            dtype=dtype,
+            mode="r",
+            shape=(archive["rows"],),
+        )
+    return columns
+
+
+def iter_archive_chunks(
+    archive,
+    fields,
+    tokens=None,
+    stakers=None,
+    reward_tokens=None,
+    from_timestamp=None,
+    to_timestamp=None,
+    chunk_size=ARCHIVE_CHUNK_SIZE,
+):
+    """Yields (columns, mask) for every `chunk_size` rows of the archive, with
+    the `fields` columns of the chunk and the mask of its rows matching the
+    filters. The token and staker filters are lists of addresses and the time
+    range is on timestampAdded, both bounds included.
+    """
+    filters = {
+        "stakedToken": (tokens, "tokens"),
+        "staker": (stakers, "stakers"),
+        "rewardToken": (reward_tokens, "tokens"),
+    }
+    filters_indexes = {}
+    for field, (addresses, dictionary) in filters.items():
+        if addresses is not None:
+            addresses = set(addresses)
+            filters_indexes[field] = numpy.array(
+                [
+                    index
+                    for index, address in enumerate(archive[dictionary])
+                    if address in addresses
+                ],
+                dtype=ARCHIVE_FIELDS[field],
+            )
+    filtered_fields = list(filters_indexes)
+    if from_timestamp is not None or to_timestamp is not None:
+        filtered_fields.append("timestampAdded")
+    columns = get_archive_columns(archive, set(fields) | set(filtered_fields))
+    for start in range(0, archive["rows"], chunk_size):
+        chunk = {
+            field: column[start : start + chunk_size]
+            for field, column in columns.items()
+        }
+        mask = numpy.ones(min(chunk_size, archive["rows"] - start), dtype=bool)
+        for field, indexes in filters_indexes.items():
+            mask &= numpy.isin(chunk[field], indexes)
+        if from_timestamp is not None:
+            mask &= chunk["timestampAdded"] >= from_timestamp
+        if to_timestamp is not None:
+            mask &= chunk["timestampAdded"] <= to_timestamp
+        yield chunk, mask
+
+
+def query_staking_rewards(archive, fields=None, raw=False, **filters):
+    """Reads the rows matching the filters of iter_archive_chunks, one chunk
+    at a time, so only the matching rows of `fields` are held in memory.
+    Args:
+        raw (bool, optional): Return the fields of ARCHIVE_INTEGER_FIELDS as
+        exact integers (object arrays) instead of scaling them into floats.
+    Returns:
+        [dict]: field => numpy array. Address fields hold addresses and
+        trigger the STAKING_REWARD_TRIGGERS names.
+    """
+    fields = list(fields or ARCHIVE_FIELDS)
+    selected = {field: [] for field in fields}
+    for chunk, mask in iter_archive_chunks(
+        archive, get_archive_read_fields(fields), **filters
+    ):
+        for field in fields:
+            selected[field].append(
+                read_archive_column(archive, field, chunk, mask, raw)
+            )
+    rows = {}
+    for field in fields:
+        values = (
+            numpy.concatenate(selected[field])
+            if selected[field]
+            else numpy.empty(0, dtype=get_archive_read_dtype(field, raw))
+        )
+        if field in ARCHIVE_ADDRESS_FIELDS:
+            dictionary = archive[ARCHIVE_ADDRESS_FIELDS[field]]
+            values = numpy.array(dictionary, dtype=object)[values.astype(numpy.intp)]
+        elif field == "trigger":
+            values = numpy.array(STAKING_REWARD_TRIGGERS, dtype=object)[
+                values.astype(numpy.intp)
+            ]
+        rows[field] = values
+    return rows
+
+
+def sum_staking_rewards(
+    archive, by, fields=("rewardTokenAmount", "stakedTokenAmount"), **filters
+):
+    """Sums `fields` over the rows matching the filters of iter_archive_chunks,
+    grouped by one of ARCHIVE_GROUP_KEYS ("day" is timestampAdded // 86400).
+    Returns:
+        [dict]: group => {"count": rows, field: sum, ...}, groups being
+        addresses, trigger names or days.
+    """
+    if by not in ARCHIVE_GROUP_KEYS:
+        raise ValueError("Cannot group staking rewards by " + by + ".")
+    key_field = "timestampAdded" if by == "day" else by
+    groups = {}
+    for chunk, mask in iter_archive_chunks(
+        archive, get_archive_read_fields([key_field, *fields]), **filters
+    ):
+        keys = numpy.asarray(chunk[key_field][mask])
+        if by == "day":
+            keys = keys // (60 * 60 * 24)
+        (chunk_groups, inverse) = numpy.unique(keys, return_inverse=True)
+        sums = {"count": numpy.bincount(inverse, minlength=len(chunk_groups))}
+        for field in fields:
+            sums[field] = numpy.bincount(
+                inverse,
+                weights=numpy.asarray(
+                    read_archive_column(archive, field, chunk, mask), dtype="<f8"
+                ),
+                minlength=len(chunk_groups),
+            )
+        for position, chunk_group in enumerate(chunk_groups.tolist()):
+            group = groups.setdefault(
+                chunk_group, {field: 0 for field in ["count", *fields]}
+            )
+            for field, field_sums in sums.items():
+                group[field] += field_sums[position].item()
+    if by in ARCHIVE_ADDRESS_FIELDS:
+        dictionary = archive[ARCHIVE_ADDRESS_FIELDS[by]]
+        return {dictionary[group]: sums for group, sums in groups.items()}
+    if by == "trigger":
+        return {STAKING_REWARD_TRIGGERS[group]: sums for group, sums in groups.items()}
+    return groups
+
+
+def main():
+    (_, _, proxy_savvy_finance_farm, _) = get_contracts()
+    export_staking_rewards(proxy_savvy_finance_farm)
@@ -0,0 +1,350 @@
+from brownie import network, web3
+from brownie.convert import to_address
+from scripts.common import call_with_retry
+from scripts.savvy_finance_farm import (
+    get_tokens_data,
+    get_stakers_data,
+    get_tokens_stakers_data,
+    token_data_to_dict,
+    staker_data_to_dict,
+    staking_reward_to_dict,
+    compact_staking_reward_to_record,
+)
+from scripts.savvy_finance_farm_records import get_tokens_decimals, to_amount
+from functools import partial
+import os, json, sqlite3, eth_event
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+INDEXES_FOLDER = "./indexes"
+INDEXER_BLOCK_RANGE = 5000
+# blocks to stay behind the chain head, so reorganized blocks are not indexed
+INDEXER_CONFIRMATIONS = 15
+INDEXER_EVENTS = [
+    "UpdateToken",
+    "UpdateTokenBalances",
+    "UpdateStaker",
+    "UpdateTokenStaker",
+    "IssueStakingReward",
+    "IssueCompactStakingReward",
+]
+
+
+def to_checksum_addresses(value):
+    """eth_event decodes addresses in lowercase, the farm getters return them
+    checksummed."""
+    if isinstance(value, (list, tuple)):
+        return [to_checksum_addresses(item) for item in value]
+    if isinstance(value, str) and len(value) == 42 and value.startswith("0x"):
+        return to_address(value)
+    return value
+
+
+def new_token_staker_data():
+    # a pair never staked, changed or rewarded, as read from the farm
+    return {
+        "rewardBalance": 0.0,
+        "stakingBalance": 0.0,
+        "stakingRewardToken": ZERO_ADDRESS,
+        "stakingRewards": [],
+        "timestampLastRewarded": 0,
+        "timestampAdded": 0,
+        "timestampLastUpdated": 0,
+    }
+
+
+class SavvyFinanceFarmIndexer:
+    """Event sourced model of the farm tokensData, stakersData and
+    tokensStakersData. Every state change of the farm emits an Update* event
+    with the new state of the entry it changed (and IssueStakingReward with the
+    new staking reward), so the model is kept in sync by folding the farm logs
+    in order, one eth_getLogs query per block range, without reading the
+    contract. The model and the last indexed block are saved together in SQLite
+    after every range, so a restarted indexer resumes where it stopped.
+    Args:
+        contract: The (proxy) farm contract.
+        database (string, optional): Path of the SQLite file.
+        Defaults to ./indexes/<active network>.sqlite, ":memory:" keeps the
+        model in memory only.
+        from_block (int, optional): The farm deployment block, the first block
+        to index when there is no checkpoint.
+    """
+
+    def __init__(
+        self,
+        contract,
+        database=None,
+        from_block=0,
+        block_range=INDEXER_BLOCK_RANGE,
+        confirmations=INDEXER_CONFIRMATIONS,
+    ):
+        self.contract = contract
+        self.block_range = block_range
+        self.confirmations = confirmations
+        self.topic_map = eth_event.get_topic_map(contract.abi)
+        self.topics = [
+            topic
+            for topic, event in self.topic_map.items()
+            if event["name"] in INDEXER_EVENTS
+        ]
+        if not database:
+            os.makedirs(INDEXES_FOLDER, exist_ok=True)
+            database = os.path.join(INDEXES_FOLDER, network.show_active() + ".sqlite")
+        self.connection = sqlite3.connect(database)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoint (
+                address TEXT PRIMARY KEY,
+                block INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                address TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (address, kind, key)
+            );
+            """
+        )
+        self.load(from_block)
+
+    def load(self, from_block=0):
+        row = self.connection.execute(
+            "SELECT block FROM checkpoint WHERE address = ?",
+            (self.contract.address,),
+        ).fetchone()
+        self.block = row[0] if row else from_block - 1
+        self.tokens_data = {}
+        self.stakers_data = {}
+        self.tokens_stakers_data = {}
+        models = {
+            "token": self.tokens_data,
+            "staker": self.stakers_data,
+            "token_staker": self.tokens_stakers_data,
+        }
+        for kind, key, data in self.connection.execute(
+            """
+            SELECT kind, key, data FROM entries WHERE address = ?
+            ORDER BY kind, position
+            """,
+            (self.contract.address,),
+        ):
+            models[kind][key] = json.loads(data)
+        self.changed = set()
+
+    def save(self):
+        models = {
+            "token": self.tokens_data,
+            "staker": self.stakers_data,
+            "token_staker": self.tokens_stakers_data,
+        }
+        positions = {
+            kind: {key: position for position, key in enumerate(models[kind])}
+            for kind in {kind for kind, _ in self.changed}
+        }
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        self.contract.address,
+                        kind,
+                        key,
+                        positions[kind][key],
+                        json.dumps(models[kind][key]),
+                    )
+                    for kind, key in self.changed
+                ],
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checkpoint VALUES (?, ?)",
+                (self.contract.address, self.block),
+            )
+        self.changed = set()
+
+    def seed(self, block_identifier=None, **read_options):
+        """Seeds the model with the farm state read at a block, for farms that
+        held tokens and stakers before they emitted events (i.e. upgraded
+        proxies), and indexes from the next block on.
+        """
+        if block_identifier is None:
+            block_identifier = web3.eth.block_number - self.confirmations
+        read_options["block_identifier"] = block_identifier
+        self.tokens_data.clear()
+        self.stakers_data.clear()
+        self.tokens_stakers_data.clear()
+        for token_data in get_tokens_data(self.contract, **read_options):
+            self.tokens_data[token_data["address"]] = token_data
+            self.changed.add(("token", token_data["address"]))
+        for staker_data in get_stakers_data(self.contract, **read_options):
+            self.stakers_data[staker_data["address"]] = staker_data
+            self.changed.add(("staker", staker_data["address"]))
+        for token_stakers_data in get_tokens_stakers_data(
+            self.contract,
+            {token: token for token in self.tokens_data},
+            list(self.stakers_data),
+            **read_options,
+        ):
+            for token, stakers_data in token_stakers_data.items():
+                for staker, token_staker_data in stakers_data.items():
+                    if (
+                        token_staker_data["timestampAdded"] == 0
+                        and token_staker_data["timestampLastUpdated"] == 0
+                    ):
+                        continue
+                    self.tokens_stakers_data[token + ":" + staker] = token_staker_data
+                    self.changed.add(("token_staker", token + ":" + staker))
+        self.block = block_identifier
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM entries WHERE address = ?", (self.contract.address,)
+            )
+        self.save()
+        return self.block
+
+    def get_token_decimals(self, token):
+        # the events carry raw amounts, the decimals are read once per token
+        # and network (see get_tokens_decimals)
+        return get_tokens_decimals([token])[token]
+
+    def get_token_staker_data(self, token, staker):
+        key = token + ":" + staker
+        if key not in self.tokens_stakers_data:
+            self.tokens_stakers_data[key] = new_token_staker_data()
+        self.changed.add(("token_staker", key))
+        return self.tokens_stakers_data[key]
+
+    def apply_event(self, event):
+        """Folds one decoded farm event into the model."""
+        data = {
+            field["name"]: to_checksum_addresses(field["value"])
+            for field in event["data"]
+        }
+        if event["name"] == "UpdateToken":
+            self.tokens_data[data["token"]] = token_data_to_dict(
+                data["token"], data["tokenData"], self.get_token_decimals(data["token"])
+            )
+            self.changed.add(("token", data["token"]))
+        elif event["name"] == "UpdateTokenBalances":
+            token_data = self.tokens_data[data["token"]]
+            decimals = self.get_token_decimals(data["token"])
+            token_data["rewardBalance"] = to_amount(data["rewardBalance"], decimals)
+            token_data["stakingBalance"] = to_amount(data["stakingBalance"], decimals)
+            token_data["timestampLastUpdated"] = data["timestampLastUpdated"]
+            self.changed.add(("token", data["token"]))
+        elif event["name"] == "UpdateStaker":
+            self.stakers_data[data["staker"]] = staker_data_to_dict(
+                data["staker"], data["stakerData"]
+            )
+            self.changed.add(("staker", data["staker"]))
+        elif event["name"] == "UpdateTokenStaker":
+            token_staker_data = self.get_token_staker_data(
+                data["token"], data["staker"]
+            )
+            decimals = self.get_token_decimals(data["token"])
+            token_staker_data["rewardBalance"] = to_amount(
+                data["rewardBalance"], decimals
+            )
+            token_staker_data["stakingBalance"] = to_amount(
+                data["stakingBalance"], decimals
+            )
+            for field in [
+                "stakingRewardToken",
+                "timestampLastRewarded",
+                "timestampAdded",
+                "timestampLastUpdated",
+            ]:
+                token_staker_data[field] = data[field]
+        elif event["name"] == "IssueStakingReward":
+            self.get_token_staker_data(data["token"], data["staker"])[
+                "stakingRewards"
+            ].append(
+                staking_reward_to_dict(
+                    data["rewardData"],
+                    self.get_token_decimals(data["rewardData"][2]),
+                    self.get_token_decimals(data["token"]),
+                )
+            )
+        elif event["name"] == "IssueCompactStakingReward":
+            staking_reward = compact_staking_reward_to_record(
+                data["staker"], data["token"], data["id"], data["rewardData"]
+            )
+            staking_reward.rewardTokenDecimals = self.get_token_decimals(
+                staking_reward.rewardToken
+            )
+            staking_reward.stakedTokenDecimals = self.get_token_decimals(data["token"])
+            self.get_token_staker_data(data["token"], data["staker"])[
+                "stakingRewards"
+            ].append(staking_reward.to_dict())
+
+    def get_events(self, from_block, to_block):
+        logs = call_with_retry(
+            partial(
+                web3.eth.get_logs,
+                {
+                    "address": self.contract.address,
+                    "fromBlock": from_block,
+                    "toBlock": to_block,
+                    "topics": [self.topics],
+                },
+            )
+        )
+        # get_logs returns the logs in chain order
+        return eth_event.decode_logs(
+            [dict(log) for log in logs], self.topic_map, allow_undecoded=True
+        )
+
+    def sync(self, to_block=None):
+        """Indexes the farm logs from the checkpoint up to `to_block`.
+        Returns:
+            [int]: The last indexed block.
+        """
+        if to_block is None:
+            to_block = web3.eth.block_number - self.confirmations
+        events_count = 0
+        while self.block < to_block:
+            from_block = self.block + 1
+            range_to_block = min(from_block + self.block_range - 1, to_block)
+            events = self.get_events(from_block, range_to_block)
+            for event in events:
+                self.apply_event(event)
+            events_count += len(events)
+            self.block = range_to_block
+            self.save()
+        print(
+            "Indexed "
+            + str(events_count)
+            + " events up to block "
+            + str(self.block)
+            + ".",
+            "\n\n",
+        )
+        return self.block
+
+    def get_tokens(self):
+        return list(self.tokens_data)
+
+    def get_stakers(self):
+        return list(self.stakers_data)
+
+    def get_tokens_data(self):
+        return list(self.tokens_data.values())
+
+    def get_stakers_data(self):
+        return list(self.stakers_data.values())
+
+    def get_tokens_stakers_data(self):
+        """Same shape as savvy_finance_farm.get_tokens_stakers_data: every
+        token x staker pair, the ones without events as the farm returns them
+        (zero balances and timestamps).
+        """
+        return [
+            {
+                token: {
+                    staker: self.tokens_stakers_data.get(token + ":" + staker)
+                    or new_token_staker_data()
+                    for staker in self.stakers_data
+                }
+            }
+            for token in self.tokens_data
+        ]
@@ -0,0 +1,174 @@
+from brownie import web3
+from scripts.common import get_account, is_transient_rpc_error
+from scripts.instrumentation import instrumented
+from scripts.savvy_finance_farm import get_contracts, get_tokens_data, get_stakers_data
+from scripts.savvy_finance_farm_rewards import project_staking_rewards
+import time
+
+KEEPER_INTERVAL_IN_SECONDS = 60 * 60
+KEEPER_GAS_BUDGET = 3000000
+# pairs staked or rewarded less than this long ago are left for a later round,
+# so every keeper reward is worth its gas. The keeper's rewards are credited up
+# to block.timestamp only, so this doesn't change how much they pay
+KEEPER_MIN_STAKING_DURATION_IN_SECONDS = 60 * 60 * 24
+# gas limit over the estimate, for the state changes between the estimate and
+# the transaction
+KEEPER_GAS_LIMIT_MARGIN = 1.2
+
+
+def grant_keeper_role(contract, keeper, account=None):
+    account = account or get_account()
+    contract.grantRole(contract.KEEPER_ROLE(), keeper, {"from": account}).wait(1)
+    print("Granted the keeper role to " + keeper + ".", "\n\n")
+
+
+def select_staking_rewards(
+    contract,
+    min_staking_duration=KEEPER_MIN_STAKING_DURATION_IN_SECONDS,
+    min_staking_reward_amount=1,
+    block_identifier=None,
+):
+    """Chooses the (token, staker) pairs to issue the staking rewards of from
+    the farm state at a block: active pairs staked or rewarded at least
+    `min_staking_duration` ago with a pending reward of at least
+    `min_staking_reward_amount` wei, largest rewards first.
+    """
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+    active_tokens = {
+        token_data["address"]
+        for token_data in get_tokens_data(contract, block_identifier=block_identifier)
+        if token_data["isActive"]
+    }
+    active_stakers = {
+        staker_data["address"]
+        for staker_data in get_stakers_data(contract, block_identifier=block_identifier)
+        if staker_data["isActive"]
+    }
+    staking_rewards = [
+        staking_reward
+        for staking_reward in project_staking_rewards(
+            contract, block_identifier=block_identifier, extra_seconds=0
+        )
+        if staking_reward["token"] in active_tokens
+        and staking_reward["staker"] in active_stakers
+        and staking_reward["stakingRewardAmount"] >= min_staking_reward_amount
+        and staking_reward["stakingDurationInSeconds"] // 10**18
+        >= min_staking_duration
+    ]
+    staking_rewards.sort(
+        key=lambda staking_reward: staking_reward["stakingRewardAmount"],
+        reverse=True,
+    )
+    return [
+        (staking_reward["token"], staking_reward["staker"])
+        for staking_reward in staking_rewards
+    ]
+
+
+def estimate_issue_staking_rewards_gas(contract, tokens_stakers, account):
+    return contract.issueStakingRewards.estimate_gas(
+        [token for token, _ in tokens_stakers],
+        [staker for _, staker in tokens_stakers],
+        {"from": account},
+    )
+
+
+def size_staking_rewards_batch(
+    contract, tokens_stakers, gas_budget=KEEPER_GAS_BUDGET, account=None
+):
+    """Takes the longest prefix of `tokens_stakers` whose issueStakingRewards
+    gas estimate fits in `gas_budget`. The estimate also proves the batch
+    doesn't revert.
+    Returns:
+        [tuple]: (batch, estimated gas), ([], 0) if not even one pair fits.
+    """
+    account = account or get_account()
+    if not tokens_stakers:
+        return [], 0
+    pair_gas = estimate_issue_staking_rewards_gas(contract, tokens_stakers[:1], account)
+    batch_size = min(len(tokens_stakers), max(gas_budget // pair_gas, 1))
+    while batch_size > 0:
+        batch = tokens_stakers[:batch_size]
+        gas = estimate_issue_staking_rewards_gas(contract, batch, account)
+        if gas <= gas_budget:
+            return batch, gas
+        # the first pair has the largest reward, not necessarily the largest
+        # gas cost, so shrink in proportion to the overshoot
+        batch_size = min(batch_size - 1, batch_size * gas_budget // gas)
+    return [], 0
+
+
+@instrumented
+def issue_staking_rewards(
+    contract,
+    gas_budget=KEEPER_GAS_BUDGET,
+    min_staking_duration=KEEPER_MIN_STAKING_DURATION_IN_SECONDS,
+    account=None,
+):
+    """Issues the staking rewards selected by select_staking_rewards, in as
+    many gas budget sized transactions as needed.
+    Returns:
+        [list]: The transaction receipts.
+    """
+    account = account or get_account()
+    tokens_stakers = select_staking_rewards(contract, min_staking_duration)
+    receipts = []
+    while tokens_stakers:
+        batch, gas = size_staking_rewards_batch(
+            contract, tokens_stakers, gas_budget, account
+        )
+        if not batch:
+            print("A single staking reward exceeds the gas budget.", "\n\n")
+            break
+        receipt = contract.issueStakingRewards(
+            [token for token, _ in batch],
+            [staker for _, staker in batch],
+            {
+                "from": account,
+                "gas_limit": min(gas_budget, int(gas * KEEPER_GAS_LIMIT_MARGIN)),
+            },
+        )
+        receipt.wait(1)
+        receipts.append(receipt)
+        print(
+            "Issued up to "
+            + str(len(batch))
+            + " staking rewards for "
+            + str(receipt.gas_used)
+            + " gas.",
+            "\n\n",
+        )
+        tokens_stakers = tokens_stakers[len(batch) :]
+    return receipts
+
+
+def run_keeper(
+    contract=None,
+    interval=KEEPER_INTERVAL_IN_SECONDS,
+    gas_budget=KEEPER_GAS_BUDGET,
+    iterations=None,
+    account=None,
+):
+    """Calls issue_staking_rewards every `interval` seconds, `iterations` times
+    or forever. Transient RPC errors are retried on the next iteration.
+    """
+    account = account or get_account()
+    if contract is None:
+        (_, _, contract, _) = get_contracts()
+    iteration = 0
+    while iterations is None or iteration < iterations:
+        started = time.time()
+        try:
+            issue_staking_rewards(contract, gas_budget, account=account)
+        except Exception as error:
+            if not is_transient_rpc_error(error):
+                raise
+            print("Keeper iteration failed: " + str(error), "\n\n")
+        iteration += 1
+        if iterations is None or iteration < iterations:
+            time.sleep(max(interval - (time.time() - started), 0))
+
+
+def main():
+    run_keeper()
@@ -0,0 +1,456 @@
+from brownie import interface, web3
+from scripts.common import (
+    MULTICALL_CHUNK_SIZE,
+    to_wei,
+    batch_call,
+    batch_calls,
+)
+from scripts.savvy_finance_farm import iter_tokens
+from collections import OrderedDict
+import time
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+PRICE_CACHE_SIZE = 4096
+# PancakeSwap V2 takes a 0.25% swap fee
+PANCAKESWAP_FEE_NUMERATOR = 9975
+PANCAKESWAP_FEE_DENOMINATOR = 10000
+
+
+def get_block_number(block_identifier=None):
+    """Resolves a block identifier (number, hash or tag like "latest") to the
+    number of the block, so prices are cached by block and all the reads of a
+    batch are made at the same block.
+    Raises:
+        ValueError: For "pending", whose state changes without its number
+        changing, so its prices can't be cached by block.
+    """
+    if block_identifier is None or block_identifier == "latest":
+        return web3.eth.block_number
+    if isinstance(block_identifier, int):
+        return block_identifier
+    if block_identifier == "pending":
+        raise ValueError("Prices of the pending block can't be cached.")
+    return web3.eth.get_block(block_identifier)["number"]
+
+
+def read_lp_tokens_data(contract, lp_tokens, lp_tokens_pairs, read_options):
+    """Reads what SavvyFinanceFarmLibrary.getTokenPrice needs to price LP tokens.
+    Like the library, only the tokens whose symbol is the farm's LP category
+    name are read as pairs, so a category 1 token that is not a pair doesn't
+    revert the whole batch.
+    Args:
+        lp_tokens_pairs (dict): lp token => (token0, token1) cache, filled in
+        for the LP tokens it does not know yet.
+    Returns:
+        [dict]: lp token => data, or None when its symbol is not the farm's LP
+        category name (the library then falls back to a price of 1).
+    """
+    if not lp_tokens:
+        return {}
+    pairs = [interface.IUniswapV2Pair(lp_token) for lp_token in lp_tokens]
+    unique_pairs = list(dict.fromkeys(pairs))
+    results = batch_calls(
+        [(contract.getTokenCategoryName, (1,))]
+        + [(pair.symbol, ()) for pair in unique_pairs],
+        **read_options,
+    )
+    lp_category_name = results[0]
+    lp_pairs = [
+        pair
+        for pair, symbol in zip(unique_pairs, results[1:])
+        if symbol == lp_category_name
+    ]
+    unknown_pairs = [pair for pair in lp_pairs if pair.address not in lp_tokens_pairs]
+    calls = []
+    for pair in lp_pairs:
+        calls += [(pair.totalSupply, ()), (pair.getReserves, ())]
+    for pair in unknown_pairs:
+        calls += [(pair.token0, ()), (pair.token1, ())]
+    results = batch_calls(calls, **read_options) if calls else []
+
+    for pair_index, pair in enumerate(unknown_pairs):
+        tokens_index = 2 * len(lp_pairs) + 2 * pair_index
+        lp_tokens_pairs[pair.address] = tuple(results[tokens_index : tokens_index + 2])
+    lp_pairs_data = {}
+    for pair_index, pair in enumerate(lp_pairs):
+        total_supply, reserves = results[2 * pair_index : 2 * pair_index + 2]
+        token0, token1 = lp_tokens_pairs[pair.address]
+        lp_pairs_data[pair.address] = {
+            "totalSupply": total_supply,
+            "token0": token0,
+            "token1": token1,
+            "token0Reserve": reserves[0],
+            "token1Reserve": reserves[1],
+        }
+    return {
+        lp_token: lp_pairs_data.get(pair.address)
+        for lp_token, pair in zip(lp_tokens, pairs)
+    }
+
+
+def calculate_lp_token_price(lp_token_data, token0_price, token1_price):
+    return (
+        lp_token_data["token0Reserve"] * token0_price
+        + lp_token_data["token1Reserve"] * token1_price
+    ) // lp_token_data["totalSupply"]
+
+
+def get_amount_out(
+    amount_in,
+    reserve_in,
+    reserve_out,
+    fee_numerator=PANCAKESWAP_FEE_NUMERATOR,
+    fee_denominator=PANCAKESWAP_FEE_DENOMINATOR,
+):
+    """Constant product output amount, as computed by the router's getAmountsOut."""
+    if amount_in <= 0:
+        raise ValueError("Insufficient input amount.")
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise ValueError("Insufficient liquidity.")
+    amount_in_with_fee = amount_in * fee_numerator
+    return (amount_in_with_fee * reserve_out) // (
+        reserve_in * fee_denominator + amount_in_with_fee
+    )
+
+
+class TokenPriceCache:
+    """Caches SavvyFinanceFarmLibrary.getTokenPrice results by (token, category, block).
+    Block tags are resolved to the block number first, see get_block_number.
+    Category 1 (LP) prices are computed from the pair reserves and the cached
+    prices of token0 and token1, with the same integer math as the library, so
+    the component tokens are only priced once per block however many LP tokens
+    share them. Entries are evicted least recently used first, and after `ttl`
+    seconds when set.
+    """
+
+    def __init__(
+        self,
+        library,
+        contract,
+        max_size=PRICE_CACHE_SIZE,
+        ttl=None,
+        multicall_contract=None,
+        chunk_size=MULTICALL_CHUNK_SIZE,
+        max_workers=None,
+        price_engine=None,
+    ):
+        self.library = library
+        self.contract = contract
+        self.max_size = max_size
+        self.ttl = ttl
+        self.read_options = {
+            "multicall_contract": multicall_contract,
+            "chunk_size": chunk_size,
+            "max_workers": max_workers,
+        }
+        # prices misses off-chain instead of through the library when set
+        self.price_engine = price_engine
+        self.prices = OrderedDict()
+        # lp token => (token0, token1), which never change for a pair
+        self.lp_tokens_pairs = {}
+
+    def get(self, token, category, block_number):
+        key = (token, category, block_number)
+        if key not in self.prices:
+            return None
+        price, time_cached = self.prices[key]
+        if self.ttl is not None and time.monotonic() - time_cached > self.ttl:
+            del self.prices[key]
+            return None
+        self.prices.move_to_end(key)
+        return price
+
+    def set(self, token, category, block_number, price):
+        key = (token, category, block_number)
+        self.prices[key] = (price, time.monotonic())
+        self.prices.move_to_end(key)
+        while len(self.prices) > self.max_size:
+            self.prices.popitem(last=False)
+
+    def clear(self):
+        self.prices.clear()
+
+    def get_token_price(self, token, category, block_identifier=None):
+        return self.get_tokens_prices([(token, category)], block_identifier)[0]
+
+    def get_tokens_prices(self, tokens_categories, block_identifier=None):
+        """Prices many (token, category) pairs at one block, in wei.
+        Returns:
+            [list]: The prices, in the order of `tokens_categories`.
+        """
+        block_number = get_block_number(block_identifier)
+        read_options = dict(self.read_options, block_identifier=block_number)
+        prices = {}
+        for token, category in tokens_categories:
+            price = self.get(token, category, block_number)
+            if price is not None:
+                prices[(token, category)] = price
+        missing_tokens_categories = [
+            token_category
+            for token_category in dict.fromkeys(tokens_categories)
+            if token_category not in prices
+        ]
+
+        if self.price_engine:
+            for token_category, price in zip(
+                missing_tokens_categories,
+                self.price_engine.get_tokens_prices(
+                    missing_tokens_categories, block_number
+                ),
+            ):
+                prices[token_category] = price
+                self.set(*token_category, block_number, price)
+            return [prices[token_category] for token_category in tokens_categories]
+
+        lp_tokens = [
+            token for token, category in missing_tokens_categories if category == 1
+        ]
+        lp_tokens_data = read_lp_tokens_data(
+            self.contract, lp_tokens, self.lp_tokens_pairs, read_options
+        )
+        tokens = [
+            token for token, category in missing_tokens_categories if category == 0
+        ]
+        for lp_token_data in lp_tokens_data.values():
+            if lp_token_data:
+                tokens += [lp_token_data["token0"], lp_token_data["token1"]]
+        for token in tokens:
+            price = self.get(token, 0, block_number)
+            if price is not None:
+                prices[(token, 0)] = price
+        tokens = [token for token in dict.fromkeys(tokens) if (token, 0) not in prices]
+        for token, price in zip(
+            tokens,
+            batch_call(
+                self.library.getTokenPrice,
+                [(self.contract.address, token, 0) for token in tokens],
+                **read_options,
+            ),
+        ):
+            prices[(token, 0)] = price
+            self.set(token, 0, block_number, price)
+
+        for token, category in missing_tokens_categories:
+            if category == 0:
+                continue
+            # same fallback as the library for tokens it cannot price
+            price = to_wei(1)
+            lp_token_data = lp_tokens_data.get(token)
+            if category == 1 and lp_token_data:
+                price = calculate_lp_token_price(
+                    lp_token_data,
+                    prices[(lp_token_data["token0"], 0)],
+                    prices[(lp_token_data["token1"], 0)],
+                )
+            prices[(token, category)] = price
+            self.set(token, category, block_number, price)
+
+        return [prices[token_category] for token_category in tokens_categories]
+
+    def get_farm_tokens_prices(self, block_identifier=None):
+        """Prices every farm token at a block.
+        Returns:
+            [dict]: token => price in wei.
+        """
+        block_number = get_block_number(block_identifier)
+        tokens = list(iter_tokens(self.contract, block_identifier=block_number))
+        tokens_data = batch_call(
+            self.contract.getTokenData,
+            [(token,) for token in tokens],
+            **dict(self.read_options, block_identifier=block_number),
+        )
+        return dict(
+            zip(
+                tokens,
+                self.get_tokens_prices(
+                    [
+                        (token, token_data[4])
+                        for token, token_data in zip(tokens, tokens_data)
+                    ],
+                    block_number,
+                ),
+            )
+        )
+
+
+class UniswapV2PriceEngine:
+    """Computes SavvyFinanceFarmLibrary.getTokenPrice off-chain.
+    Pair reserves for every token are read in a few batched rounds at one block,
+    then the library's path selection (token -> USD, else token -> WETH -> USD,
+    else a price of 1) and the router's getAmountsOut constant product math with
+    PancakeSwap's fee are replayed locally, so prices are identical to the
+    library and consistent within the block. Pair addresses and their token0
+    never change once created, so they are cached across blocks.
+    """
+
+    def __init__(
+        self,
+        contract,
+        dex=0,
+        fee_numerator=PANCAKESWAP_FEE_NUMERATOR,
+        fee_denominator=PANCAKESWAP_FEE_DENOMINATOR,
+        multicall_contract=None,
+        chunk_size=MULTICALL_CHUNK_SIZE,
+        max_workers=None,
+    ):
+        self.contract = contract
+        self.dex = dex
+        self.fee_numerator = fee_numerator
+        self.fee_denominator = fee_denominator
+        self.read_options = {
+            "multicall_contract": multicall_contract,
+            "chunk_size": chunk_size,
+            "max_workers": max_workers,
+        }
+        self.dex_data = None
+        # sorted (tokenA, tokenB) => pair, only for pairs that exist
+        self.pairs = {}
+        self.pairs_tokens0 = {}
+        self.lp_tokens_pairs = {}
+
+    def get_dex_data(self, read_options):
+        if not self.dex_data:
+            (dex_data,) = batch_calls(
+                [(self.contract.getDex, (self.dex,))], **read_options
+            )
+            router = interface.IUniswapV2Router02(dex_data[1])
+            factory, weth_token = batch_calls(
+                [(router.factory, ()), (router.WETH, ())], **read_options
+            )
+            self.dex_data = {
+                "factory": interface.IUniswapV2Factory(factory),
+                "usdToken": dex_data[2],
+                "wethToken": weth_token,
+            }
+        return self.dex_data
+
+    def get_pairs(self, tokens_pairs, read_options):
+        tokens_pairs = [tuple(sorted(tokens_pair)) for tokens_pair in tokens_pairs]
+        unknown_tokens_pairs = [
+            tokens_pair
+            for tokens_pair in dict.fromkeys(tokens_pairs)
+            if tokens_pair not in self.pairs
+        ]
+        factory = self.get_dex_data(read_options)["factory"]
+        pairs = dict(
+            zip(
+                unknown_tokens_pairs,
+                batch_call(factory.getPair, unknown_tokens_pairs, **read_options),
+            )
+        )
+        for tokens_pair, pair in pairs.items():
+            # a missing pair can still be created later, so only cache existing ones
+            if pair != ZERO_ADDRESS:
+                self.pairs[tokens_pair] = pair
+        pairs.update(self.pairs)
+        return pairs
+
+    def get_pairs_reserves(self, pairs, read_options):
+        """Returns pair => (token0, reserve0, reserve1)."""
+        pairs = list(dict.fromkeys(pairs))
+        unknown_pairs = [pair for pair in pairs if pair not in self.pairs_tokens0]
+        results = batch_calls(
+            [(interface.IUniswapV2Pair(pair).getReserves, ()) for pair in pairs]
+            + [(interface.IUniswapV2Pair(pair).token0, ()) for pair in unknown_pairs],
+            **read_options,
+        )
+        for pair, token0 in zip(unknown_pairs, results[len(pairs) :]):
+            self.pairs_tokens0[pair] = token0
+        return {
+            pair: (self.pairs_tokens0[pair], reserves[0], reserves[1])
+            for pair, reserves in zip(pairs, results[: len(pairs)])
+        }
+
+    def get_amount_out(self, amount_in, token_in, pair, pairs_reserves):
+        token0, reserve0, reserve1 = pairs_reserves[pair]
+        reserve_in, reserve_out = (
+            (reserve0, reserve1) if token_in == token0 else (reserve1, reserve0)
+        )
+        return get_amount_out(
+            amount_in,
+            reserve_in,
+            reserve_out,
+            self.fee_numerator,
+            self.fee_denominator,
+        )
+
+    def get_tokens_prices(self, tokens_categories, block_identifier=None):
+        """Prices many (token, category) pairs at one block, in wei.
+        Returns:
+            [list]: The prices, in the order of `tokens_categories`.
+        """
+        block_number = get_block_number(block_identifier)
+        read_options = dict(self.read_options, block_identifier=block_number)
+        dex_data = self.get_dex_data(read_options)
+        usd_token = dex_data["usdToken"]
+        weth_token = dex_data["wethToken"]
+
+        lp_tokens_data = read_lp_tokens_data(
+            self.contract,
+            [token for token, category in tokens_categories if category == 1],
+            self.lp_tokens_pairs,
+            read_options,
+        )
+        tokens = [token for token, category in tokens_categories if category == 0]
+        for lp_token_data in lp_tokens_data.values():
+            if lp_token_data:
+                tokens += [lp_token_data["token0"], lp_token_data["token1"]]
+        tokens = list(dict.fromkeys(tokens))
+
+        pairs = self.get_pairs(
+            [(weth_token, usd_token)]
+            + [(token, usd_token) for token in tokens]
+            + [(token, weth_token) for token in tokens],
+            read_options,
+        )
+
+        def get_pair(token_a, token_b):
+            return pairs[tuple(sorted((token_a, token_b)))]
+
+        # the router derives the WETH -> USD pair itself, so it is needed whenever
+        # a token is priced through WETH, even if the factory does not know it
+        tokens_paths = {}
+        for token in tokens:
+            if get_pair(token, usd_token) != ZERO_ADDRESS:
+                tokens_paths[token] = [get_pair(token, usd_token)]
+            elif get_pair(token, weth_token) != ZERO_ADDRESS:
+                tokens_paths[token] = [
+                    get_pair(token, weth_token),
+                    get_pair(weth_token, usd_token),
+                ]
+        for path in tokens_paths.values():
+            if ZERO_ADDRESS in path:
+                raise ValueError("WETH to USD pair does not exist.")
+        pairs_reserves = self.get_pairs_reserves(
+            [pair for path in tokens_paths.values() for pair in path], read_options
+        )
+
+        one = to_wei(1)
+        tokens_prices = {}
+        for token in tokens:
+            price = one
+            path = tokens_paths.get(token)
+            if path and len(path) == 1:
+                price = self.get_amount_out(one, token, path[0], pairs_reserves)
+            elif path:
+                price_in_weth = self.get_amount_out(one, token, path[0], pairs_reserves)
+                weth_price_in_usd = self.get_amount_out(
+                    one, weth_token, path[1], pairs_reserves
+                )
+                price = (price_in_weth * weth_price_in_usd) // one
+            tokens_prices[token] = price
+
+        prices = []
+        for token, category in tokens_categories:
+            price = one
+            if category == 0:
+                price = tokens_prices[token]
+            elif category == 1 and lp_tokens_data[token]:
+                lp_token_data = lp_tokens_data[token]
+                price = calculate_lp_token_price(
+                    lp_token_data,
+                    tokens_prices[lp_token_data["token0"]],
+                    tokens_prices[lp_token_data["token1"]],
+                )
+            prices.append(price)
+        return prices
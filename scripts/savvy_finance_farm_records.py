@@ -0,0 +1,274 @@
+from brownie import network, interface
+from scripts.common import NON_FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS, batch_calls
+
+# the farm prices, APRs, fees and durations are fixed point numbers with 18
+# decimals whatever the decimals of the tokens they refer to
+WEI_DECIMALS = 18
+
+# (network, token) => decimals, see get_tokens_decimals
+tokens_decimals_cache = {}
+
+
+def get_tokens_decimals(tokens, **read_options):
+    """Reads the decimals of every token, once per token and network.
+    Args:
+        read_options: multicall_contract, chunk_size, max_workers and
+        block_identifier, as in batch_calls.
+    Returns:
+        [dict]: token => decimals.
+    """
+    network_name = network.show_active()
+    uncached_tokens = [
+        token
+        for token in dict.fromkeys(tokens)
+        if (network_name, token) not in tokens_decimals_cache
+    ]
+    tokens_decimals = {
+        token: tokens_decimals_cache[(network_name, token)]
+        for token in tokens
+        if (network_name, token) in tokens_decimals_cache
+    }
+    if uncached_tokens:
+        for token, decimals in zip(
+            uncached_tokens,
+            batch_calls(
+                [(interface.IERC20(token).decimals, ()) for token in uncached_tokens],
+                **read_options,
+            ),
+        ):
+            tokens_decimals[token] = decimals
+            # mocks can be redeployed at the same addresses on non forked
+            # local networks
+            if network_name not in NON_FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+                tokens_decimals_cache[(network_name, token)] = decimals
+    return tokens_decimals
+
+
+def to_amount(value, decimals=WEI_DECIMALS):
+    # int / int is correctly rounded, unlike float(Decimal) for large values
+    return value / 10**decimals
+
+
+class TokenRecord:
+    """getTokenData return value, with raw integer amounts."""
+
+    __slots__ = (
+        "address",
+        "isActive",
+        "isVerified",
+        "hasMultiTokenRewards",
+        "name",
+        "category",
+        "dex",
+        "rewardBalance",
+        "stakingBalance",
+        "stakingApr",
+        "rewardToken",
+        "admin",
+        "fees",
+        "timestampAdded",
+        "timestampLastUpdated",
+        "decimals",
+    )
+
+    def __init__(self, address, token_data, decimals=WEI_DECIMALS):
+        self.address = address
+        (
+            self.isActive,
+            self.isVerified,
+            self.hasMultiTokenRewards,
+            self.name,
+            self.category,
+            self.dex,
+            self.rewardBalance,
+            self.stakingBalance,
+            self.stakingApr,
+            self.rewardToken,
+            self.admin,
+            self.fees,
+            self.timestampAdded,
+            self.timestampLastUpdated,
+        ) = token_data
+        self.decimals = decimals
+
+    def to_dict(self):
+        return {
+            "address": self.address,
+            "isActive": self.isActive,
+            "isVerified": self.isVerified,
+            "hasMultiTokenRewards": self.hasMultiTokenRewards,
+            "name": self.name,
+            "category": self.category,
+            "dex": self.dex,
+            "rewardBalance": to_amount(self.rewardBalance, self.decimals),
+            "stakingBalance": to_amount(self.stakingBalance, self.decimals),
+            "stakingApr": to_amount(self.stakingApr),
+            "rewardToken": self.rewardToken,
+            "admin": self.admin,
+            "devDepositFee": to_amount(self.fees[0]),
+            "devWithdrawFee": to_amount(self.fees[1]),
+            "devStakeFee": to_amount(self.fees[2]),
+            "devUnstakeFee": to_amount(self.fees[3]),
+            "adminStakeFee": to_amount(self.fees[4]),
+            "adminUnstakeFee": to_amount(self.fees[5]),
+            "timestampAdded": self.timestampAdded,
+            "timestampLastUpdated": self.timestampLastUpdated,
+        }
+
+
+class StakerRecord:
+    """getStakerData return value."""
+
+    __slots__ = (
+        "address",
+        "isActive",
+        "uniqueTokensStaked",
+        "timestampAdded",
+        "timestampLastUpdated",
+    )
+
+    def __init__(self, address, staker_data):
+        self.address = address
+        (
+            self.isActive,
+            self.uniqueTokensStaked,
+            self.timestampAdded,
+            self.timestampLastUpdated,
+        ) = staker_data
+
+    def to_dict(self):
+        return {
+            "address": self.address,
+            "isActive": self.isActive,
+            "uniqueTokensStaked": self.uniqueTokensStaked,
+            "timestampAdded": self.timestampAdded,
+            "timestampLastUpdated": self.timestampLastUpdated,
+        }
+
+
+class StakingRewardRecord:
+    """TokenStakerRewardDetails, with raw integer amounts. The reward token
+    amount is in the reward token decimals and the staked token amount in the
+    staked token decimals.
+    """
+
+    __slots__ = (
+        "id",
+        "staker",
+        "rewardToken",
+        "rewardTokenPrice",
+        "rewardTokenAmount",
+        "stakedToken",
+        "stakedTokenPrice",
+        "stakedTokenAmount",
+        "stakingApr",
+        "stakingDurationInSeconds",
+        "triggeredBy",
+        "timestampAdded",
+        "timestampLastUpdated",
+        "rewardTokenDecimals",
+        "stakedTokenDecimals",
+    )
+
+    def __init__(
+        self,
+        staking_reward,
+        reward_token_decimals=WEI_DECIMALS,
+        staked_token_decimals=WEI_DECIMALS,
+    ):
+        (
+            self.id,
+            self.staker,
+            self.rewardToken,
+            self.rewardTokenPrice,
+            self.rewardTokenAmount,
+            self.stakedToken,
+            self.stakedTokenPrice,
+            self.stakedTokenAmount,
+            self.stakingApr,
+            self.stakingDurationInSeconds,
+            self.triggeredBy,
+            self.timestampAdded,
+            self.timestampLastUpdated,
+        ) = staking_reward
+        self.rewardTokenDecimals = reward_token_decimals
+        self.stakedTokenDecimals = staked_token_decimals
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "staker": self.staker,
+            "rewardToken": self.rewardToken,
+            "rewardTokenPrice": to_amount(self.rewardTokenPrice),
+            "rewardTokenAmount": to_amount(
+                self.rewardTokenAmount, self.rewardTokenDecimals
+            ),
+            "stakedToken": self.stakedToken,
+            "stakedTokenPrice": to_amount(self.stakedTokenPrice),
+            "stakedTokenAmount": to_amount(
+                self.stakedTokenAmount, self.stakedTokenDecimals
+            ),
+            "stakingApr": to_amount(self.stakingApr),
+            "stakingDurationInSeconds": to_amount(self.stakingDurationInSeconds),
+            "triggeredBy": list(self.triggeredBy),
+            "timestampAdded": self.timestampAdded,
+            "timestampLastUpdated": self.timestampLastUpdated,
+        }
+
+
+class TokenStakerRecord:
+    """getTokenStakerData or getTokenStakerSummary return value, with raw
+    integer balances in the token decimals. stakingRewards is a list of
+    StakingRewardRecord, or None when they were not read, and
+    stakingRewardsCount is None when the pair was not read as a summary or
+    when its stakingRewards were read.
+    """
+
+    __slots__ = (
+        "rewardBalance",
+        "stakingBalance",
+        "stakingRewardToken",
+        "stakingRewards",
+        "stakingRewardsCount",
+        "timestampLastRewarded",
+        "timestampAdded",
+        "timestampLastUpdated",
+        "decimals",
+    )
+
+    def __init__(
+        self,
+        token_staker_data,
+        staking_rewards=None,
+        staking_rewards_count=None,
+        decimals=WEI_DECIMALS,
+    ):
+        (
+            self.rewardBalance,
+            self.stakingBalance,
+            self.stakingRewardToken,
+            _,
+            self.timestampLastRewarded,
+            self.timestampAdded,
+            self.timestampLastUpdated,
+        ) = token_staker_data
+        self.stakingRewards = staking_rewards
+        self.stakingRewardsCount = staking_rewards_count
+        self.decimals = decimals
+
+    def to_dict(self):
+        token_staker_dict = {
+            "rewardBalance": to_amount(self.rewardBalance, self.decimals),
+            "stakingBalance": to_amount(self.stakingBalance, self.decimals),
+            "stakingRewardToken": self.stakingRewardToken,
+        }
+        if self.stakingRewardsCount is not None:
+            token_staker_dict["stakingRewardsCount"] = self.stakingRewardsCount
+        if self.stakingRewards is not None:
+            token_staker_dict["stakingRewards"] = [
+                staking_reward.to_dict() for staking_reward in self.stakingRewards
+            ]
+        token_staker_dict["timestampLastRewarded"] = self.timestampLastRewarded
+        token_staker_dict["timestampAdded"] = self.timestampAdded
+        token_staker_dict["timestampLastUpdated"] = self.timestampLastUpdated
+        return token_staker_dict
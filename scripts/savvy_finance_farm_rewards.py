@@ -0,0 +1,151 @@
+from brownie import web3
+from scripts.common import (
+    MULTICALL_CHUNK_SIZE,
+    batch_call,
+)
+from scripts.savvy_finance_farm import iter_tokens, iter_stakers
+
+# SavvyFinanceFarmLibrary.secondsToYears multiplies by 0.0000000317098 * (10**18)
+SECONDS_TO_YEARS_FACTOR = 31709800000
+# calculateStakingReward ends every staking period one day after block.timestamp,
+# the keeper's issueStakingRewards at block.timestamp
+STAKING_REWARD_EXTRA_SECONDS = 60 * 60 * 24
+
+
+def calculate_staking_rewards(
+    staking_amounts,
+    staking_aprs,
+    timestamps_last_rewarded,
+    timestamps_added,
+    timestamp,
+    extra_seconds=STAKING_REWARD_EXTRA_SECONDS,
+):
+    """Offline port of SavvyFinanceFarmLibrary.calculateStakingReward.
+    Computes the reward of many (token, staker) pairs at once with exact integer
+    math, so the results match the library to the wei. Pairs must exist on the
+    farm (i.e. come from getTokens() x getStakers()).
+    Args:
+        staking_amounts (list): Token staker stakingBalance, in wei.
+        staking_aprs (list): Token stakingApr, in wei.
+        timestamps_last_rewarded (list): Token staker timestampLastRewarded.
+        timestamps_added (list): Token staker timestampAdded.
+        timestamp (int): The block.timestamp to calculate the rewards at.
+        extra_seconds (int, optional): Seconds credited past `timestamp`, 0
+        for the rewards issued by the keeper (calculateStakingRewardUntil).
+    Returns:
+        [list]: (stakingRewardAmount, stakingDurationInSeconds, stakingApr,
+        stakingAmount) per pair, as returned by the library.
+    """
+    timestamp_ended = timestamp + extra_seconds
+    staking_rewards = []
+    for staking_amount, staking_apr, timestamp_last_rewarded, timestamp_added in zip(
+        staking_amounts, staking_aprs, timestamps_last_rewarded, timestamps_added
+    ):
+        if staking_amount <= 0:
+            staking_rewards.append((0, 0, 0, 0))
+            continue
+        timestamp_started = (
+            timestamp_last_rewarded if timestamp_last_rewarded != 0 else timestamp_added
+        )
+        if timestamp_started > timestamp_ended:
+            raise ValueError("Staking started after the reward timestamp.")
+        staking_duration_in_seconds = (timestamp_ended - timestamp_started) * 10**18
+        staking_duration_in_years = (
+            staking_duration_in_seconds * SECONDS_TO_YEARS_FACTOR
+        ) // 10**18
+        staking_reward_amount = (
+            staking_amount * (staking_apr // 100) * staking_duration_in_years
+        ) // 10**36
+        staking_rewards.append(
+            (
+                staking_reward_amount,
+                staking_duration_in_seconds,
+                staking_apr,
+                staking_amount,
+            )
+        )
+    return staking_rewards
+
+
+def calculate_staking_reward(
+    staking_amount, staking_apr, timestamp_last_rewarded, timestamp_added, timestamp
+):
+    return calculate_staking_rewards(
+        [staking_amount],
+        [staking_apr],
+        [timestamp_last_rewarded],
+        [timestamp_added],
+        timestamp,
+    )[0]
+
+
+def project_staking_rewards(
+    contract,
+    tokens=None,
+    stakers=None,
+    timestamp=None,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    block_identifier=None,
+    extra_seconds=STAKING_REWARD_EXTRA_SECONDS,
+):
+    """Reads the staking balances, APRs and timestamps of every (token, staker)
+    pair at a block and projects their pending staking reward offline.
+    Args:
+        timestamp (int, optional): Timestamp to project the rewards at.
+        Defaults to the timestamp of the block the state is read at.
+        extra_seconds (int, optional): See calculate_staking_rewards.
+    Returns:
+        [list]: One dict per pair with a non-zero staking balance.
+    """
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+    if timestamp is None:
+        timestamp = web3.eth.get_block(block_identifier).timestamp
+    if not tokens:
+        tokens = list(iter_tokens(contract, block_identifier=block_identifier))
+    else:
+        tokens = list(tokens.values())
+    if not stakers:
+        stakers = list(iter_stakers(contract, block_identifier=block_identifier))
+    read_options = {
+        "multicall_contract": multicall_contract,
+        "chunk_size": chunk_size,
+        "max_workers": max_workers,
+        "block_identifier": block_identifier,
+    }
+
+    tokens_staking_aprs = {
+        token: token_data[8]
+        for token, token_data in zip(
+            tokens,
+            batch_call(
+                contract.getTokenData, [(token,) for token in tokens], **read_options
+            ),
+        )
+    }
+    tokens_stakers = [(token, staker) for token in tokens for staker in stakers]
+    tokens_stakers_summaries = batch_call(
+        contract.tokensStakersData, tokens_stakers, **read_options
+    )
+    staking_rewards = calculate_staking_rewards(
+        [summary[1] for summary in tokens_stakers_summaries],
+        [tokens_staking_aprs[token] for token, _ in tokens_stakers],
+        [summary[3] for summary in tokens_stakers_summaries],
+        [summary[4] for summary in tokens_stakers_summaries],
+        timestamp,
+        extra_seconds,
+    )
+    return [
+        {
+            "token": token,
+            "staker": staker,
+            "stakingRewardAmount": staking_reward[0],
+            "stakingDurationInSeconds": staking_reward[1],
+            "stakingApr": staking_reward[2],
+            "stakingAmount": staking_reward[3],
+        }
+        for (token, staker), staking_reward in zip(tokens_stakers, staking_rewards)
+        if staking_reward[3] > 0
+    ]
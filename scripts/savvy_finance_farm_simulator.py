@@ -0,0 +1,308 @@
+from brownie import web3
+from scripts.common import MULTICALL_CHUNK_SIZE, batch_call
+from scripts.savvy_finance_farm import (
+    get_contracts,
+    get_tokens_data,
+    iter_stakers,
+)
+from scripts.savvy_finance_farm_records import to_amount
+from scripts.savvy_finance_farm_rewards import (
+    SECONDS_TO_YEARS_FACTOR,
+    STAKING_REWARD_EXTRA_SECONDS,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SIMULATION_DURATION_IN_SECONDS = 60 * 60 * 24 * 365
+SIMULATION_STEP_IN_SECONDS = 60 * 60
+# every staking reward a staker triggers (stake, unstake, claim) pays
+# STAKING_REWARD_EXTRA_SECONDS more than the time staked, so how often they
+# are issued changes the burn rate. The keeper's rewards don't, see
+# simulate_reward_depletion.
+SIMULATION_ISSUE_INTERVAL_IN_SECONDS = STAKING_REWARD_EXTRA_SECONDS
+
+
+def read_simulation_state(
+    contract,
+    library,
+    tokens=None,
+    stakers=None,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    block_identifier=None,
+):
+    """Reads what simulate_reward_depletion needs from the farm at a block.
+    Amounts, APRs and prices are in wei, as numpy float arrays indexed like
+    "tokens", and the token staker balances and timestamps are one entry per
+    (token, staker) pair, token major.
+    Returns:
+        [dict]: The simulation state.
+    """
+    if numpy is None:
+        raise ImportError("Install numpy to simulate the reward depletion.")
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+    read_options = {
+        "multicall_contract": multicall_contract,
+        "chunk_size": chunk_size,
+        "max_workers": max_workers,
+        "block_identifier": block_identifier,
+    }
+    tokens_records = get_tokens_data(contract, tokens, as_records=True, **read_options)
+    tokens = [token_record.address for token_record in tokens_records]
+    if not stakers:
+        stakers = list(iter_stakers(contract, block_identifier=block_identifier))
+    tokens_indexes = {token: index for index, token in enumerate(tokens)}
+    tokens_prices = batch_call(
+        library.getTokenPrice,
+        [
+            (contract.address, token_record.address, token_record.category)
+            for token_record in tokens_records
+        ],
+        **read_options,
+    )
+    tokens_stakers_summaries = batch_call(
+        contract.tokensStakersData,
+        [(token, staker) for token in tokens for staker in stakers],
+        **read_options,
+    )
+    return {
+        "timestamp": web3.eth.get_block(block_identifier).timestamp,
+        "tokens": tokens,
+        "decimals": [token_record.decimals for token_record in tokens_records],
+        "isActive": numpy.array(
+            [token_record.isActive for token_record in tokens_records], dtype=bool
+        ),
+        # -1 when the reward token is not a farm token, its rewards can't be
+        # issued
+        "rewardTokens": numpy.array(
+            [
+                tokens_indexes.get(token_record.rewardToken, -1)
+                for token_record in tokens_records
+            ],
+            dtype=numpy.intp,
+        ),
+        "rewardBalances": numpy.array(
+            [token_record.rewardBalance for token_record in tokens_records],
+            dtype=float,
+        ),
+        "stakingAprs": numpy.array(
+            [token_record.stakingApr for token_record in tokens_records], dtype=float
+        ),
+        "prices": numpy.array(tokens_prices, dtype=float),
+        "tokensStakersTokens": numpy.repeat(
+            numpy.arange(len(tokens), dtype=numpy.intp), len(stakers)
+        ),
+        "tokensStakersBalances": numpy.array(
+            [summary[1] for summary in tokens_stakers_summaries], dtype=float
+        ),
+        "tokensStakersTimestampsStarted": numpy.array(
+            [
+                summary[3] if summary[3] != 0 else summary[4]
+                for summary in tokens_stakers_summaries
+            ],
+            dtype=float,
+        ),
+    }
+
+
+def apply_simulation_scenarios(state, scenarios, steps_count, step):
+    """Builds the per step APRs, prices and reward deposits of every token.
+    Every scenario applies from `afterSeconds` on to the state token
+    `token`, with one of:
+        stakingApr (int): The new token staking APR, in wei.
+        priceFactor (float): Multiplies the token price, e.g. 0.5 for a 50%
+        price drop.
+        deposit (int): Added to the token reward balance, in wei, as credited
+        after the deposit fee.
+    Returns:
+        [tuple]: (staking aprs, prices, deposits), tokens x steps arrays.
+    """
+    staking_aprs = numpy.repeat(state["stakingAprs"][:, None], steps_count, axis=1)
+    prices = numpy.repeat(state["prices"][:, None], steps_count, axis=1)
+    deposits = numpy.zeros((len(state["tokens"]), steps_count))
+    for scenario in sorted(scenarios, key=lambda scenario: scenario["afterSeconds"]):
+        token_index = state["tokens"].index(scenario["token"])
+        first_step = int(scenario["afterSeconds"] // step)
+        if first_step >= steps_count:
+            continue
+        if "stakingApr" in scenario:
+            staking_aprs[token_index, first_step:] = scenario["stakingApr"]
+        if "priceFactor" in scenario:
+            prices[token_index, first_step:] *= scenario["priceFactor"]
+        if "deposit" in scenario:
+            deposits[token_index, first_step] += scenario["deposit"]
+    return staking_aprs, prices, deposits
+
+
+def simulate_reward_depletion(
+    state,
+    scenarios=(),
+    duration=SIMULATION_DURATION_IN_SECONDS,
+    step=SIMULATION_STEP_IN_SECONDS,
+    issue_interval=SIMULATION_ISSUE_INTERVAL_IN_SECONDS,
+):
+    """Projects the reward balance of every token forward in `step` second
+    steps, with the staking reward formula of SavvyFinanceFarmLibrary applied
+    to all the tokens and pairs at once. A token reward balance pays the
+    staking rewards of every active token it is the reward token of, converted
+    at the step prices, and starts with the rewards already pending.
+    Staking balances are held constant.
+    Args:
+        state (dict): As read by read_simulation_state.
+        scenarios (list): What-if scenarios, see apply_simulation_scenarios.
+        issue_interval (int): Seconds between two staking rewards of a pair,
+        None when the keeper issues them all, with no extra day.
+    Returns:
+        [list]: One dict per token, with the projection of its reward token
+        balance in the reward token decimals. The depletion is None when the
+        balance lasts the whole `duration`, and the fields are None for tokens
+        whose rewards can't be issued.
+    """
+    if numpy is None:
+        raise ImportError("Install numpy to simulate the reward depletion.")
+    if duration < step:
+        raise ValueError("The duration must be at least one step.")
+    tokens_count = len(state["tokens"])
+    steps_count = int(duration // step)
+    (staking_aprs, prices, deposits) = apply_simulation_scenarios(
+        state, scenarios, steps_count, step
+    )
+    reward_tokens = state["rewardTokens"]
+    rewarded = (
+        state["isActive"]
+        & (reward_tokens >= 0)
+        & state["isActive"][numpy.maximum(reward_tokens, 0)]
+    )
+
+    # SavvyFinanceFarmLibrary.calculateStakingReward, in floating point
+    tokens_stakers_tokens = state["tokensStakersTokens"]
+    tokens_stakers_durations = numpy.where(
+        state["tokensStakersBalances"] > 0,
+        state["timestamp"]
+        + STAKING_REWARD_EXTRA_SECONDS
+        - state["tokensStakersTimestampsStarted"],
+        0,
+    )
+    pending_rewards = numpy.bincount(
+        tokens_stakers_tokens,
+        weights=state["tokensStakersBalances"]
+        * numpy.floor(state["stakingAprs"] / 100)[tokens_stakers_tokens]
+        * tokens_stakers_durations
+        * SECONDS_TO_YEARS_FACTOR
+        / 10**36,
+        minlength=tokens_count,
+    )
+    staking_balances = numpy.bincount(
+        tokens_stakers_tokens,
+        weights=state["tokensStakersBalances"],
+        minlength=tokens_count,
+    )
+    step_rewards = (
+        staking_balances[:, None]
+        * numpy.floor(staking_aprs / 100)
+        * (step * SECONDS_TO_YEARS_FACTOR / 10**36)
+        * (1 + (STAKING_REWARD_EXTRA_SECONDS / issue_interval if issue_interval else 0))
+    )
+
+    # Lib.convertFrom, staked token => reward token
+    rewarded_tokens = numpy.flatnonzero(rewarded)
+    rewarded_reward_tokens = reward_tokens[rewarded_tokens]
+    # rewarded tokens x steps
+    conversion_rates = prices[rewarded_tokens] / prices[rewarded_reward_tokens]
+    burns = numpy.zeros((tokens_count, steps_count))
+    numpy.add.at(
+        burns,
+        rewarded_reward_tokens,
+        step_rewards[rewarded_tokens] * conversion_rates,
+    )
+    initial_balances = state["rewardBalances"].copy()
+    numpy.subtract.at(
+        initial_balances,
+        rewarded_reward_tokens,
+        pending_rewards[rewarded_tokens] * conversion_rates[:, 0],
+    )
+    balances = (
+        initial_balances[:, None]
+        + numpy.cumsum(deposits, axis=1)
+        - numpy.cumsum(burns, axis=1)
+    )
+
+    depleted = balances < 0
+    depletions_in_seconds = numpy.where(
+        initial_balances < 0,
+        0,
+        numpy.where(depleted.any(axis=1), (depleted.argmax(axis=1) + 1) * step, -1),
+    )
+    simulation = []
+    for token_index, token in enumerate(state["tokens"]):
+        if not rewarded[token_index]:
+            simulation.append(
+                {
+                    "token": token,
+                    "rewardToken": None,
+                    "rewardTokenBalance": None,
+                    "projectedRewardTokenBalance": None,
+                    "dailyRewardTokenBurn": None,
+                    "depletionInSeconds": None,
+                    "depletionTimestamp": None,
+                }
+            )
+            continue
+        reward_token_index = reward_tokens[token_index]
+        reward_token_decimals = state["decimals"][reward_token_index]
+        depletion_in_seconds = int(depletions_in_seconds[reward_token_index])
+        simulation.append(
+            {
+                "token": token,
+                "rewardToken": state["tokens"][reward_token_index],
+                "rewardTokenBalance": to_amount(
+                    state["rewardBalances"][reward_token_index].item(),
+                    reward_token_decimals,
+                ),
+                "projectedRewardTokenBalance": to_amount(
+                    balances[reward_token_index, -1].item(), reward_token_decimals
+                ),
+                "dailyRewardTokenBurn": to_amount(
+                    burns[reward_token_index, 0].item() * (60 * 60 * 24 / step),
+                    reward_token_decimals,
+                ),
+                "depletionInSeconds": (
+                    depletion_in_seconds if depletion_in_seconds >= 0 else None
+                ),
+                "depletionTimestamp": (
+                    state["timestamp"] + depletion_in_seconds
+                    if depletion_in_seconds >= 0
+                    else None
+                ),
+            }
+        )
+    return simulation
+
+
+def print_reward_depletion(simulation):
+    for token_simulation in simulation:
+        if token_simulation["depletionInSeconds"] is None:
+            continue
+        print(
+            token_simulation["token"]
+            + " rewards run out in "
+            + str(round(token_simulation["depletionInSeconds"] / 60 / 60 / 24, 1))
+            + " days, when the "
+            + token_simulation["rewardToken"]
+            + " reward balance is depleted.",
+            "\n\n",
+        )
+
+
+def main():
+    (_, _, proxy_savvy_finance_farm, savvy_finance_farm_library) = get_contracts()
+    print_reward_depletion(
+        simulate_reward_depletion(
+            read_simulation_state(proxy_savvy_finance_farm, savvy_finance_farm_library)
+        )
+    )
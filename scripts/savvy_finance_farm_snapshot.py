@@ -0,0 +1,465 @@
+from brownie import network, web3
+from brownie.convert import to_address
+from scripts.common import (
+    MULTICALL_CHUNK_SIZE,
+    batch_call,
+    call_with_retry,
+    has_function,
+)
+from scripts.savvy_finance_farm import (
+    LOGS_BLOCK_RANGE,
+    PAGE_SIZE,
+    get_tokens_data,
+    get_stakers_data,
+    get_tokens_stakers_data,
+    get_compact_staking_rewards,
+    iter_pages,
+    token_staker_data_to_dict,
+)
+from scripts.savvy_finance_farm_records import (
+    StakingRewardRecord,
+    TokenStakerRecord,
+    get_tokens_decimals,
+)
+from functools import partial
+import os, json, sqlite3, eth_event
+
+SNAPSHOTS_FOLDER = "./snapshots"
+
+
+def open_snapshot_store(database=None):
+    """Opens (and creates if needed) the SQLite snapshot store of the farm state.
+    Every row is an entry (token, staker or token staker) as read at `block`.
+    A new row is only written when the entry changed since the last refresh.
+    Args:
+        database (string, optional): Path of the SQLite file.
+        Defaults to ./snapshots/<active network>.sqlite.
+    Returns:
+        [sqlite3.Connection]: The snapshot store connection.
+    """
+    if not database:
+        os.makedirs(SNAPSHOTS_FOLDER, exist_ok=True)
+        database = os.path.join(SNAPSHOTS_FOLDER, network.show_active() + ".sqlite")
+    connection = sqlite3.connect(database)
+    connection.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            block INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            version TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (kind, key, block)
+        );
+        CREATE TABLE IF NOT EXISTS refreshes (
+            block INTEGER PRIMARY KEY
+        );
+        """
+    )
+    return connection
+
+
+def get_snapshot_versions(connection, kind):
+    return dict(
+        connection.execute(
+            """
+            SELECT key, version FROM snapshots AS snapshot
+            WHERE kind = ? AND block = (
+                SELECT MAX(block) FROM snapshots
+                WHERE kind = snapshot.kind AND key = snapshot.key
+            )
+            """,
+            (kind,),
+        ).fetchall()
+    )
+
+
+def save_snapshot_entries(connection, kind, block, entries):
+    """Writes the (key, position, version, data) entries whose version changed."""
+    versions = get_snapshot_versions(connection, kind)
+    changed_entries = [
+        (kind, key, block, position, version, json.dumps(data))
+        for key, position, version, data in entries
+        if versions.get(key) != version
+    ]
+    connection.executemany(
+        "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+        changed_entries,
+    )
+    return len(changed_entries)
+
+
+def get_last_refresh_block(connection):
+    (block,) = connection.execute("SELECT MAX(block) FROM refreshes").fetchone()
+    return block
+
+
+def get_updated_tokens_stakers(
+    contract, from_block, to_block, block_range=LOGS_BLOCK_RANGE
+):
+    """Returns the (token, staker) pairs with an UpdateTokenStaker log between
+    the blocks, every change of a pair (stake, unstake, reward, ...) emits one.
+    """
+    topic_map = {
+        topic: event
+        for topic, event in eth_event.get_topic_map(contract.abi).items()
+        if event["name"] == "UpdateTokenStaker"
+    }
+    tokens_stakers = set()
+    for range_from_block in range(from_block, to_block + 1, block_range):
+        logs = call_with_retry(
+            partial(
+                web3.eth.get_logs,
+                {
+                    "address": contract.address,
+                    "fromBlock": range_from_block,
+                    "toBlock": min(range_from_block + block_range - 1, to_block),
+                    "topics": [list(topic_map)],
+                },
+            )
+        )
+        for event in eth_event.decode_logs([dict(log) for log in logs], topic_map):
+            data = {field["name"]: field["value"] for field in event["data"]}
+            tokens_stakers.add((to_address(data["token"]), to_address(data["staker"])))
+    return tokens_stakers
+
+
+def is_token_staker_summary_version(version):
+    # the stores written before the summaries versioned the pairs with the 6
+    # fields of the tokensStakersData getter
+    return len(json.loads(version)) == 7
+
+
+def refresh_snapshot(
+    connection,
+    contract,
+    block_identifier=None,
+    multicall_contract=None,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_workers=None,
+    page_size=PAGE_SIZE,
+):
+    """Brings the snapshot store up to date with the farm state at a block.
+    Token and staker entries are small and their timestamps are not bumped by
+    every change (e.g. activateToken, depositToken), so they are re-read in
+    full and only stored when their content changed. Token staker entries carry
+    the whole reward history, so after the first refresh only the pairs with an
+    UpdateTokenStaker log since the last refreshed block (and the pairs of new
+    tokens and stakers) are read, as summaries, and only the staking rewards
+    issued since are fetched: the new stored ones through
+    getTokenStakerRewardsPage, the compact ones from the logs. The summary is
+    the version of the pair, its stakingRewardsCount the offset of the next
+    slice. Farms without the summaries are rescanned, see
+    refresh_tokens_stakers_entries.
+    Returns:
+        [int]: The block the snapshot was taken at.
+    """
+    block = block_identifier if block_identifier is not None else web3.eth.block_number
+    read_options = {
+        "multicall_contract": multicall_contract,
+        "chunk_size": chunk_size,
+        "max_workers": max_workers,
+        "block_identifier": block,
+    }
+
+    tokens_data = get_tokens_data(contract, **read_options)
+    stakers_data = get_stakers_data(contract, **read_options)
+    tokens = [token_data["address"] for token_data in tokens_data]
+    stakers = [staker_data["address"] for staker_data in stakers_data]
+    changed_tokens = save_snapshot_entries(
+        connection,
+        "token",
+        block,
+        [
+            (token_data["address"], position, json.dumps(token_data), token_data)
+            for position, token_data in enumerate(tokens_data)
+        ],
+    )
+    changed_stakers = save_snapshot_entries(
+        connection,
+        "staker",
+        block,
+        [
+            (staker_data["address"], position, json.dumps(staker_data), staker_data)
+            for position, staker_data in enumerate(stakers_data)
+        ],
+    )
+
+    if has_function(contract, "getTokenStakerSummary", block):
+        changed_tokens_stakers = refresh_updated_tokens_stakers_entries(
+            connection, contract, tokens, stakers, block, page_size, read_options
+        )
+    else:
+        changed_tokens_stakers = refresh_tokens_stakers_entries(
+            connection, contract, tokens, stakers, block, read_options
+        )
+
+    connection.execute("INSERT OR IGNORE INTO refreshes VALUES (?)", (block,))
+    connection.commit()
+    print(
+        "Snapshot refreshed at block "
+        + str(block)
+        + ": "
+        + str(changed_tokens)
+        + " tokens, "
+        + str(changed_stakers)
+        + " stakers and "
+        + str(changed_tokens_stakers)
+        + " token stakers changed.",
+        "\n\n",
+    )
+    return block
+
+
+def refresh_updated_tokens_stakers_entries(
+    connection, contract, tokens, stakers, block, page_size, read_options
+):
+    """Stores the token staker entries that changed since the last refresh,
+    see refresh_snapshot.
+    Returns:
+        [int]: The number of token staker entries stored.
+    """
+    previous_block = get_last_refresh_block(connection)
+    stored_versions = get_snapshot_versions(connection, "token_staker")
+    tokens_stakers = [(token, staker) for token in tokens for staker in stakers]
+    if (
+        previous_block is None
+        or previous_block > block
+        or not all(map(is_token_staker_summary_version, stored_versions.values()))
+    ):
+        # first refresh, every pair is read in full
+        tokens_stakers_summaries = batch_call(
+            contract.getTokenStakerSummary, tokens_stakers, **read_options
+        )
+        tokens_stakers_data = {
+            (token, staker): token_staker_data
+            for token_stakers_data in get_tokens_stakers_data(
+                contract,
+                {token: token for token in tokens},
+                stakers,
+                page_size=page_size,
+                **read_options,
+            )
+            for token, stakers_data in token_stakers_data.items()
+            for staker, token_staker_data in stakers_data.items()
+        }
+        return save_snapshot_entries(
+            connection,
+            "token_staker",
+            block,
+            [
+                (
+                    token + ":" + staker,
+                    position,
+                    json.dumps(list(token_staker_summary)),
+                    tokens_stakers_data[(token, staker)],
+                )
+                for position, ((token, staker), token_staker_summary) in enumerate(
+                    zip(tokens_stakers, tokens_stakers_summaries)
+                )
+            ],
+        )
+
+    updated_tokens_stakers = get_updated_tokens_stakers(
+        contract, previous_block + 1, block
+    )
+    # position => pair, the updated pairs and the pairs never stored
+    read_tokens_stakers = {
+        position: (token, staker)
+        for position, (token, staker) in enumerate(tokens_stakers)
+        if (token, staker) in updated_tokens_stakers
+        or token + ":" + staker not in stored_versions
+    }
+    tokens_stakers_summaries = batch_call(
+        contract.getTokenStakerSummary,
+        list(read_tokens_stakers.values()),
+        **read_options,
+    )
+    stored_data = dict(get_snapshot_entries(connection, "token_staker", previous_block))
+    new_staking_rewards = {}
+    for (token, staker), token_staker_summary in zip(
+        read_tokens_stakers.values(), tokens_stakers_summaries
+    ):
+        key = token + ":" + staker
+        offset = json.loads(stored_versions[key])[3] if key in stored_versions else 0
+        if token_staker_summary[3] > offset:
+            new_staking_rewards[(token, staker)] = [
+                StakingRewardRecord(staking_reward)
+                for staking_reward in iter_pages(
+                    contract.getTokenStakerRewardsPage,
+                    (token, staker),
+                    page_size,
+                    block,
+                    offset,
+                )
+            ]
+    new_compact_staking_rewards = (
+        get_compact_staking_rewards(
+            contract, previous_block + 1, block, as_records=True
+        )
+        if has_function(contract, "compactStakingRewardsCount", block)
+        else {}
+    )
+    tokens_decimals = get_tokens_decimals(
+        set(tokens)
+        | {
+            staking_reward.rewardToken
+            for staking_rewards in list(new_staking_rewards.values())
+            + list(new_compact_staking_rewards.values())
+            for staking_reward in staking_rewards
+        },
+        **read_options,
+    )
+
+    entries = []
+    for (position, (token, staker)), token_staker_summary in zip(
+        read_tokens_stakers.items(), tokens_stakers_summaries
+    ):
+        key = token + ":" + staker
+        staking_rewards = new_staking_rewards.get((token, staker), []) + (
+            new_compact_staking_rewards.get((token, staker), [])
+        )
+        for staking_reward in staking_rewards:
+            staking_reward.rewardTokenDecimals = tokens_decimals[
+                staking_reward.rewardToken
+            ]
+            staking_reward.stakedTokenDecimals = tokens_decimals[token]
+        token_staker_data = TokenStakerRecord(
+            token_staker_summary, staking_rewards, decimals=tokens_decimals[token]
+        ).to_dict()
+        if key in stored_data:
+            # the stored rewards come before the compact ones, as read by
+            # get_tokens_stakers_data
+            offset = json.loads(stored_versions[key])[3]
+            previous_staking_rewards = json.loads(stored_data[key])["stakingRewards"]
+            new_stored_count = len(new_staking_rewards.get((token, staker), []))
+            token_staker_data["stakingRewards"] = (
+                previous_staking_rewards[:offset]
+                + token_staker_data["stakingRewards"][:new_stored_count]
+                + previous_staking_rewards[offset:]
+                + token_staker_data["stakingRewards"][new_stored_count:]
+            )
+        entries.append(
+            (key, position, json.dumps(list(token_staker_summary)), token_staker_data)
+        )
+    return save_snapshot_entries(connection, "token_staker", block, entries)
+
+
+def refresh_tokens_stakers_entries(
+    connection, contract, tokens, stakers, block, read_options
+):
+    """Stores the token staker entries that changed since the last refresh, on
+    farms without getTokenStakerSummary: the scalar fields of every pair are
+    re-read through the tokensStakersData getter, and the full entry is
+    re-fetched only for new pairs and pairs whose balances or timestamps moved.
+    Returns:
+        [int]: The number of token staker entries stored.
+    """
+    tokens_stakers = [(token, staker) for token in tokens for staker in stakers]
+    tokens_stakers_versions = [
+        json.dumps(list(token_staker_summary))
+        for token_staker_summary in batch_call(
+            contract.tokensStakersData, tokens_stakers, **read_options
+        )
+    ]
+    stored_versions = get_snapshot_versions(connection, "token_staker")
+    changed_tokens_stakers = [
+        (token, staker, position, version)
+        for position, ((token, staker), version) in enumerate(
+            zip(tokens_stakers, tokens_stakers_versions)
+        )
+        if stored_versions.get(token + ":" + staker) != version
+    ]
+    changed_tokens_stakers_data = batch_call(
+        contract.getTokenStakerData,
+        [(token, staker) for token, staker, _, _ in changed_tokens_stakers],
+        **read_options,
+    )
+    tokens_decimals = get_tokens_decimals(
+        tokens
+        + [
+            staking_reward[2]
+            for token_staker_data in changed_tokens_stakers_data
+            for staking_reward in token_staker_data[3]
+        ],
+        **read_options,
+    )
+    return save_snapshot_entries(
+        connection,
+        "token_staker",
+        block,
+        [
+            (
+                token + ":" + staker,
+                position,
+                version,
+                token_staker_data_to_dict(
+                    token_staker_data, tokens_decimals[token], tokens_decimals
+                ),
+            )
+            for (token, staker, position, version), token_staker_data in zip(
+                changed_tokens_stakers, changed_tokens_stakers_data
+            )
+        ],
+    )
+
+
+def get_snapshot_block(connection, block=None):
+    """Returns the latest refreshed block at or before `block`."""
+    if block is None:
+        (snapshot_block,) = connection.execute(
+            "SELECT MAX(block) FROM refreshes"
+        ).fetchone()
+    else:
+        (snapshot_block,) = connection.execute(
+            "SELECT MAX(block) FROM refreshes WHERE block <= ?", (block,)
+        ).fetchone()
+    if snapshot_block is None:
+        raise ValueError("No snapshot found at or before block " + str(block) + ".")
+    return snapshot_block
+
+
+def get_snapshot_entries(connection, kind, block):
+    return connection.execute(
+        """
+        SELECT key, data FROM snapshots AS snapshot
+        WHERE kind = ? AND block = (
+            SELECT MAX(block) FROM snapshots
+            WHERE kind = snapshot.kind AND key = snapshot.key AND block <= ?
+        )
+        ORDER BY position
+        """,
+        (kind, block),
+    ).fetchall()
+
+
+def get_snapshot_tokens_data(connection, block=None):
+    block = get_snapshot_block(connection, block)
+    return [
+        json.loads(data) for _, data in get_snapshot_entries(connection, "token", block)
+    ]
+
+
+def get_snapshot_stakers_data(connection, block=None):
+    block = get_snapshot_block(connection, block)
+    return [
+        json.loads(data)
+        for _, data in get_snapshot_entries(connection, "staker", block)
+    ]
+
+
+def get_snapshot_tokens_stakers_data(connection, block=None):
+    block = get_snapshot_block(connection, block)
+    tokens = [key for key, _ in get_snapshot_entries(connection, "token", block)]
+    stakers = [key for key, _ in get_snapshot_entries(connection, "staker", block)]
+    tokens_stakers_data = dict(get_snapshot_entries(connection, "token_staker", block))
+    return [
+        {
+            token: {
+                staker: json.loads(tokens_stakers_data[token + ":" + staker])
+                for staker in stakers
+            }
+        }
+        for token in tokens
+    ]
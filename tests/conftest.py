@@ -0,0 +1,82 @@
+from brownie import network, MockUniswapV2Router
+from scripts.common import (
+    LOCAL_BLOCKCHAIN_ENVIRONMENTS,
+    NON_FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS,
+    get_account,
+)
+from scripts.savvy_finance_farm import (
+    get_contracts,
+    erc20_token_transfer,
+    add_tokens,
+    activate_tokens,
+    deposit_token,
+)
+import pytest
+
+# The stack is deployed once per session (once per worker with `brownie test
+# -n`, every worker runs its own local chain) and every test runs between a
+# chain snapshot and a revert, so tests share the deployment but not its state.
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+@pytest.fixture(scope="session")
+def account():
+    return get_account()
+
+
+@pytest.fixture(scope="session")
+def staker():
+    return get_account(1)
+
+
+@pytest.fixture(scope="session")
+def contracts(account, staker):
+    """(proxy_admin, proxy_savvy_finance, proxy_savvy_finance_farm,
+    savvy_finance_farm_library), with the svf token added, activated and
+    funded with rewards, and 10000 svf sent to the staker.
+    """
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip()
+    (
+        proxy_admin,
+        proxy_savvy_finance,
+        proxy_savvy_finance_farm,
+        savvy_finance_farm_library,
+    ) = get_contracts("all")
+    if network.show_active() in NON_FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        router = MockUniswapV2Router.deploy(
+            proxy_savvy_finance.address, {"from": account}
+        )
+        proxy_savvy_finance_farm.configDex(
+            0, ("Mock", router.address, proxy_savvy_finance.address), {"from": account}
+        )
+    tokens = {"svf": proxy_savvy_finance.address}
+    add_tokens(proxy_savvy_finance_farm, tokens, account)
+    activate_tokens(proxy_savvy_finance_farm, tokens, account)
+    deposit_token(proxy_savvy_finance_farm, proxy_savvy_finance, 100000, account)
+    erc20_token_transfer(proxy_savvy_finance, staker.address, 10000, account)
+    return (
+        proxy_admin,
+        proxy_savvy_finance,
+        proxy_savvy_finance_farm,
+        savvy_finance_farm_library,
+    )
+
+
+@pytest.fixture(scope="session")
+def svf(contracts):
+    return contracts[1]
+
+
+@pytest.fixture(scope="session")
+def farm(contracts):
+    return contracts[2]
+
+
+@pytest.fixture(scope="session")
+def library(contracts):
+    return contracts[3]
@@ -0,0 +1,111 @@
+from scripts import instrumentation
+from scripts.instrumentation import (
+    NO_HELPER,
+    instrumented,
+    instrumentation_middleware,
+)
+from scripts.common import map_concurrently
+import threading, pytest
+
+RECEIPT = {"transactionHash": "0xab", "gasUsed": "0x5208", "status": "0x0"}
+
+
+def make_request(method, params):
+    if method == "eth_getTransactionReceipt":
+        return {"jsonrpc": "2.0", "id": 1, "result": RECEIPT}
+    return {"jsonrpc": "2.0", "id": 1, "result": "0x1"}
+
+
+rpc = instrumentation_middleware(make_request, None)
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    # helpers decorated while enabled are instrumented, with empty stats
+    monkeypatch.setattr(instrumentation, "instrumentation_enabled", True)
+    monkeypatch.setattr(instrumentation, "helpers_stats", {})
+    monkeypatch.setattr(instrumentation, "rpc_stats", {})
+    monkeypatch.setattr(instrumentation, "counted_transactions", set())
+    return instrumentation
+
+
+def test_instrumentation_counts_calls(stats):
+    @instrumented
+    def inner():
+        rpc("eth_call", [])
+        rpc("eth_blockNumber", [])
+
+    @instrumented
+    def outer():
+        rpc("eth_call", [])
+        inner()
+
+    outer()
+    outer()
+    rpc("eth_chainId", [])
+    assert stats.helpers_stats["outer"]["calls"] == 2
+    # nested helpers are charged to their callers too
+    assert stats.helpers_stats["outer"]["rpcCalls"] == 6
+    assert stats.helpers_stats["inner"]["calls"] == 2
+    assert stats.helpers_stats["inner"]["rpcCalls"] == 4
+    assert stats.helpers_stats[NO_HELPER]["rpcCalls"] == 1
+    assert stats.rpc_stats["eth_call"]["calls"] == 4
+    assert stats.rpc_stats["eth_blockNumber"]["calls"] == 2
+
+
+def test_instrumentation_counts_errors_and_gas(stats):
+    class Revert(Exception):
+        revert_msg = "Insufficient reward balance."
+
+    @instrumented
+    def reverting():
+        raise Revert()
+
+    @instrumented
+    def waiting():
+        # the receipt of a transaction is only counted once
+        rpc("eth_getTransactionReceipt", ["0xab"])
+        rpc("eth_getTransactionReceipt", ["0xab"])
+
+    with pytest.raises(Revert):
+        reverting()
+    waiting()
+    assert stats.helpers_stats["reverting"]["errors"] == 1
+    assert stats.helpers_stats["reverting"]["reverts"] == {
+        "Insufficient reward balance.": 1
+    }
+    assert stats.helpers_stats["waiting"]["transactions"] == 1
+    assert stats.helpers_stats["waiting"]["gasUsed"] == 21000
+    assert stats.helpers_stats["waiting"]["reverts"] == {"(reverted transaction)": 1}
+
+
+def test_instrumentation_charges_the_helpers_of_each_thread(stats):
+    @instrumented
+    def fan_out():
+        map_concurrently(
+            lambda index: rpc("eth_call", []), [(index,) for index in range(8)], 4
+        )
+
+    # two helpers running at the same time in two threads
+    barrier = threading.Barrier(2)
+
+    def call_between_barriers():
+        barrier.wait()
+        rpc("eth_call", [])
+        barrier.wait()
+
+    first = instrumented(call_between_barriers, "first")
+    second = instrumented(call_between_barriers, "second")
+
+    fan_out()
+    threads = [threading.Thread(target=helper) for helper in [first, second]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # the workers' calls go to the helper that started them
+    assert stats.helpers_stats["fan_out"]["rpcCalls"] == 8
+    assert NO_HELPER not in stats.helpers_stats
+    # and the helpers of other threads are not charged
+    assert stats.helpers_stats["first"]["rpcCalls"] == 1
+    assert stats.helpers_stats["second"]["rpcCalls"] == 1
@@ -0,0 +1,57 @@
+from scripts.common import map_concurrently, batch_calls
+import time, threading, pytest, requests
+
+
+class FlakyCall:
+    """Fails the first call of every args with a transient error, then returns
+    the args after a delay that shrinks with them, so the calls complete out of
+    order."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def __call__(self, *args, block_identifier=None):
+        with self.lock:
+            self.calls[args] = self.calls.get(args, 0) + 1
+            calls = self.calls[args]
+        if calls == 1:
+            raise requests.exceptions.ConnectionError("Connection reset.")
+        time.sleep(0.01 * (10 - args[0]))
+        return args, block_identifier
+
+
+@pytest.mark.parametrize("max_workers", [None, 1, 4])
+def test_map_concurrently_keeps_order_and_retries(max_workers):
+    flaky_call = FlakyCall()
+    args_list = [(index,) for index in range(10)]
+    assert map_concurrently(flaky_call, args_list, max_workers, backoff=0) == [
+        (args, None) for args in args_list
+    ]
+    assert flaky_call.calls == {args: 2 for args in args_list}
+
+
+def test_map_concurrently_raises_other_errors():
+    def call(index):
+        if index == 3:
+            raise KeyError(index)
+        return index
+
+    calls = []
+    with pytest.raises(KeyError):
+        map_concurrently(
+            lambda index: calls.append(index) or call(index),
+            [(index,) for index in range(5)],
+            4,
+            backoff=0,
+        )
+    # not retried
+    assert calls.count(3) == 1
+
+
+def test_batch_calls_keeps_order_without_multicall():
+    flaky_call = FlakyCall()
+    calls = [(flaky_call, (index,)) for index in range(10)]
+    assert batch_calls(calls, max_workers=4, block_identifier=5) == [
+        (args, 5) for _, args in calls
+    ]
@@ -0,0 +1,39 @@
+from brownie import chain, MockToken
+from scripts.common import multicall
+from scripts.savvy_finance_farm import (
+    add_tokens,
+    stake_token,
+    claim_staking_reward,
+    get_tokens_data,
+    get_stakers_data,
+    get_tokens_stakers_data,
+    deploy_savvy_finance_farm_multicall,
+)
+
+
+def test_multicall_matches_plain_calls(account, farm, svf, staker):
+    multicall_contract = deploy_savvy_finance_farm_multicall(account)
+    tokens = {
+        "mt" + str(index): MockToken.deploy({"from": account}).address
+        for index in range(2)
+    }
+    add_tokens(farm, tokens, account)
+    calls = [
+        (farm.getTokenData, (token,)) for token in [svf.address, *tokens.values()]
+    ] + [(farm.tokenExists, (svf.address,)), (svf.balanceOf, (staker.address,))]
+    # chunks of 2 calls, so the calls span several eth_calls
+    assert multicall(multicall_contract, calls, 2) == [
+        contract_call(*args) for contract_call, args in calls
+    ]
+
+
+def test_multicall_readers_match_plain_readers(account, farm, svf, staker):
+    multicall_contract = deploy_savvy_finance_farm_multicall(account)
+    stake_token(farm, svf, 1000, staker)
+    stake_token(farm, svf, 1000, account)
+    chain.sleep(60)
+    claim_staking_reward(farm, svf, staker)
+    for reader in [get_tokens_data, get_stakers_data, get_tokens_stakers_data]:
+        assert reader(
+            farm, multicall_contract=multicall_contract, chunk_size=1
+        ) == reader(farm)
@@ -0,0 +1,85 @@
+from brownie import web3
+from scripts.rpc_cache import (
+    start_rpc_cache_proxy,
+    RPC_PARSE_ERROR,
+    RPC_INTERNAL_ERROR,
+)
+from web3 import Web3, HTTPProvider
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json, threading, requests
+
+
+class MismatchedBatchHandler(BaseHTTPRequestHandler):
+    # an upstream node answering every batch with a response without an id
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        content = json.dumps([{"jsonrpc": "2.0", "result": "0x1"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_rpc_cache_proxy(svf, staker, tmp_path):
+    # the local node stands in for the upstream node
+    database = str(tmp_path / "rpc_cache.sqlite")
+    proxy = start_rpc_cache_proxy(web3.provider.endpoint_uri, database, port=0)
+    proxy_web3 = Web3(HTTPProvider(proxy.url))
+    block_number = web3.eth.block_number
+    balance_of = svf.balanceOf.encode_input(staker.address)
+    call = {"to": svf.address, "data": balance_of}
+    result = proxy_web3.eth.call(call, block_number)
+    hits = proxy.hits
+    assert proxy_web3.eth.call(call, block_number) == result
+    assert proxy.hits == hits + 1
+    assert proxy_web3.eth.get_code(svf.address, block_number) == web3.eth.get_code(
+        svf.address, block_number
+    )
+    # latest is always forwarded
+    proxy_web3.eth.call(call)
+    assert proxy.connection.execute(
+        "SELECT method FROM results WHERE method != 'eth_chainId'"
+    ).fetchall() == [("eth_call",), ("eth_getCode",)]
+    proxy.shutdown()
+    proxy.server_close()
+
+    # pinned calls are served from the cache without the upstream node
+    offline_proxy = start_rpc_cache_proxy("http://127.0.0.1:9", database, port=0)
+    assert Web3(HTTPProvider(offline_proxy.url)).eth.call(call, block_number) == result
+    offline_proxy.shutdown()
+    offline_proxy.server_close()
+
+
+def test_rpc_cache_proxy_answers_malformed_requests(tmp_path):
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), MismatchedBatchHandler)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    proxy = start_rpc_cache_proxy(
+        "http://127.0.0.1:" + str(upstream.server_address[1]),
+        str(tmp_path / "rpc_cache.sqlite"),
+        port=0,
+    )
+    batch = [
+        {"jsonrpc": "2.0", "id": id, "method": "eth_blockNumber", "params": []}
+        for id in [1, 2]
+    ]
+    # the upstream response misses the ids of the batch
+    rpc_responses = requests.post(proxy.url, json=batch, timeout=10).json()
+    assert [rpc_response["id"] for rpc_response in rpc_responses] == [1, 2]
+    for rpc_response in rpc_responses:
+        assert rpc_response["error"]["code"] == RPC_INTERNAL_ERROR
+        assert rpc_response["error"]["message"].startswith("KeyError")
+    # a request that isn't JSON
+    rpc_response = requests.post(proxy.url, data="{", timeout=10).json()
+    assert rpc_response["id"] is None
+    assert rpc_response["error"]["code"] == RPC_PARSE_ERROR
+    # a batch entry that isn't a request
+    rpc_responses = requests.post(proxy.url, json=[1], timeout=10).json()
+    assert rpc_responses[0]["error"]["code"] == RPC_INTERNAL_ERROR
+    proxy.shutdown()
+    proxy.server_close()
+    upstream.shutdown()
+    upstream.server_close()
@@ -1,181 +1,143 @@
-from brownie import network, exceptions, web3
-from scripts.common import (
-    LOCAL_BLOCKCHAIN_ENVIRONMENTS,
-    get_account,
-    get_contract_address,
-)
+from brownie import exceptions, chain, Contract
+from scripts.common import to_wei, has_function
 from scripts.savvy_finance_farm import (
-    deploy_savvy_finance,
-    deploy_savvy_finance_staking,
-    get_tokens,
     add_tokens,
-    remove_allowed_tokens,
+    activate_tokens,
+    deactivate_tokens,
+    deposit_token,
+    withdraw_token,
+    stake_token,
+    claim_staking_reward,
+    get_tokens_stakers_data,
 )
 import pytest
 
 
-def test_add_tokens():
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip()
-    account = get_account()
-    savvy_finance = deploy_savvy_finance(account)
-    savvy_finance_staking = deploy_savvy_finance_staking(savvy_finance.address, account)
-    tokens = get_tokens()
-    add_tokens(savvy_finance_staking, tokens)
-    assert savvy_finance_staking.tokens(0) == tokens[0]
-    assert savvy_finance_staking.tokens(1) == tokens[1]
-    assert savvy_finance_staking.tokens(2) == tokens[2]
-
-
-def test_remove_allowed_tokens():
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip()
-    account = get_account()
-    savvy_finance = deploy_savvy_finance(account)
-    savvy_finance_staking = deploy_savvy_finance_staking(savvy_finance.address, account)
-    tokens = get_tokens()
-    add_tokens(savvy_finance_staking, tokens)
-    remove_allowed_tokens(savvy_finance_staking, [tokens[0]])
-    assert savvy_finance_staking.tokens(0) == tokens[2]
-    assert savvy_finance_staking.tokens(1) == tokens[1]
-    with pytest.raises(exceptions.VirtualMachineError):
-        savvy_finance_staking.tokens(2)
-
-
-def test_token_is_allowed():
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip()
-    account = get_account()
-    savvy_finance = deploy_savvy_finance(account)
-    savvy_finance_staking = deploy_savvy_finance_staking(savvy_finance.address, account)
-    tokens = get_tokens()
-    add_tokens(savvy_finance_staking, tokens)
-    remove_allowed_tokens(savvy_finance_staking, [tokens[0]])
-    assert savvy_finance_staking.tokenIsActive(tokens[0]) == False
-    assert savvy_finance_staking.tokenIsActive(tokens[1]) == True
-    assert savvy_finance_staking.tokenIsActive(tokens[2]) == True
-
-
-def test_stake_token():
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip()
-    account = get_account()
-    savvy_finance = deploy_savvy_finance(account)
-    savvy_finance_staking = deploy_savvy_finance_staking(savvy_finance.address, account)
-    add_tokens(savvy_finance_staking, [savvy_finance.address])
-    stake_amount_1 = web3.toWei(10000, "ether")
-    savvy_finance.approve(savvy_finance_staking.address, stake_amount_1).wait(1)
-    savvy_finance_staking.stakeToken(
-        savvy_finance.address, stake_amount_1, get_contract_address("null0")
-    ).wait(1)
-    assert savvy_finance.balanceOf(savvy_finance_staking.address) == stake_amount_1
-    assert (
-        savvy_finance_staking.tokensStakersBalances(
-            savvy_finance.address, account.address
-        )
-        == stake_amount_1
-    )
-    assert savvy_finance_staking.stakers(0) == account.address
-    assert savvy_finance_staking.stakersUniqueTokensStaked(account.address) == 1
-    return account, savvy_finance, savvy_finance_staking, stake_amount_1
-
-
-def test_stake_token_again():
-    account, savvy_finance, savvy_finance_staking, stake_amount_1 = test_stake_token()
-    stake_amount_2 = web3.toWei(10000, "ether")
-    savvy_finance.approve(savvy_finance_staking.address, stake_amount_2).wait(1)
-    savvy_finance_staking.stakeToken(
-        savvy_finance.address, stake_amount_2, get_contract_address("null0")
-    ).wait(1)
-    total_stake_amount = stake_amount_1 + stake_amount_2
-    assert savvy_finance.balanceOf(savvy_finance_staking.address) == total_stake_amount
-    assert (
-        savvy_finance_staking.tokensStakersBalances(
-            savvy_finance.address, account.address
-        )
-        == total_stake_amount
+def get_stake_amount(farm, token, amount, staker):
+    (dev_fee_amount, admin_fee_amount) = farm.getTokenFeeAmounts(
+        token, amount, "stake", {"from": staker}
     )
-    assert savvy_finance_staking.stakers(0) == account.address
-    assert savvy_finance_staking.stakersUniqueTokensStaked(account.address) == 1
-
-
-def test_stake_token_another():
-    account, savvy_finance, savvy_finance_staking, stake_amount_1 = test_stake_token()
-    savvy_finance_2 = deploy_savvy_finance(account)
-    add_tokens(savvy_finance_staking, [savvy_finance_2.address])
-    stake_amount = web3.toWei(10000, "ether")
-    savvy_finance_2.approve(savvy_finance_staking.address, stake_amount).wait(1)
-    savvy_finance_staking.stakeToken(
-        savvy_finance_2.address, stake_amount, get_contract_address("null0")
-    ).wait(1)
-    assert savvy_finance_2.balanceOf(savvy_finance_staking.address) == stake_amount
-    assert (
-        savvy_finance_staking.tokensStakersBalances(
-            savvy_finance_2.address, account.address
+    return amount - (dev_fee_amount + admin_fee_amount)
+
+
+def test_add_tokens(account, farm, svf):
+    tokens = {
+        "mt" + str(index): MockToken.deploy({"from": account}).address
+        for index in range(2)
+    }
+    add_tokens(farm, tokens, account)
+    assert farm.getTokensCount() == 3
+    assert farm.getTokensPage(0, 3) == [svf.address] + list(tokens.values())
+    for token in tokens.values():
+        assert farm.tokenExists(token)
+        assert farm.tokensData(token)["isActive"] == False
+    with pytest.raises(exceptions.VirtualMachineError):
+        farm.addToken(
+            svf.address, "SVF", 0, 0, to_wei(100), 0, 0, svf.address, {"from": account}
         )
-        == stake_amount
+
+
+def test_activate_tokens(account, farm, svf):
+    tokens = {"svf": svf.address}
+    deactivate_tokens(farm, tokens, account)
+    assert farm.tokensData(svf.address)["isActive"] == False
+    activate_tokens(farm, tokens, account)
+    assert farm.tokensData(svf.address)["isActive"] == True
+
+
+def test_deposit_and_withdraw_token(account, farm, svf):
+    reward_balance = farm.tokensData(svf.address)["rewardBalance"]
+    (dev_fee_amount, _) = farm.getTokenFeeAmounts(
+        svf.address, to_wei(1000), "deposit", {"from": account}
     )
-    assert savvy_finance_staking.stakers(0) == account.address
-    assert savvy_finance_staking.stakersUniqueTokensStaked(account.address) == 2
-    return account, savvy_finance_2, savvy_finance_staking, stake_amount
-
-
-def test_unstake_token():
-    account, savvy_finance, savvy_finance_staking, stake_amount_1 = test_stake_token()
-    unstake_amount_1 = stake_amount_1 / 2
-    savvy_finance_staking.unstakeToken(
-        savvy_finance.address, unstake_amount_1, get_contract_address("null0")
-    ).wait(1)
-    assert savvy_finance.balanceOf(savvy_finance_staking.address) == unstake_amount_1
+    deposit_token(farm, svf, 1000, account)
     assert (
-        savvy_finance_staking.tokensStakersBalances(
-            savvy_finance.address, account.address
-        )
-        == unstake_amount_1
+        farm.tokensData(svf.address)["rewardBalance"]
+        == reward_balance + to_wei(1000) - dev_fee_amount
     )
-    assert savvy_finance_staking.stakers(0) == account.address
-    assert savvy_finance_staking.stakersUniqueTokensStaked(account.address) == 1
-    return account, savvy_finance, savvy_finance_staking, unstake_amount_1
-
-
-def test_unstake_token_again():
-    (
-        account,
-        savvy_finance,
-        savvy_finance_staking,
-        unstake_amount_1,
-    ) = test_unstake_token()
-    savvy_finance_staking.unstakeToken(
-        savvy_finance.address, unstake_amount_1, get_contract_address("null0")
-    ).wait(1)
-    assert savvy_finance.balanceOf(savvy_finance_staking.address) == 0
+    withdraw_token(farm, svf, 500, account)
     assert (
-        savvy_finance_staking.tokensStakersBalances(
-            savvy_finance.address, account.address
-        )
-        == 0
+        farm.tokensData(svf.address)["rewardBalance"]
+        == reward_balance + to_wei(500) - dev_fee_amount
     )
+
+
+def test_stake_token(farm, svf, staker):
+    stake_amount = get_stake_amount(farm, svf.address, to_wei(1000), staker)
+    stake_token(farm, svf, 1000, staker)
+    assert farm.stakerExists(staker.address)
+    assert farm.getStakersPage(0, 10) == [staker.address]
+    assert farm.stakersData(staker.address)["uniqueTokensStaked"] == 1
+    assert farm.tokensData(svf.address)["stakingBalance"] == stake_amount
+    token_staker_summary = farm.getTokenStakerSummary(svf.address, staker.address)
+    assert token_staker_summary["stakingBalance"] == stake_amount
+    assert token_staker_summary["stakingRewardToken"] == svf.address
+    assert token_staker_summary["stakingRewardsCount"] == 0
+
+
+def test_stake_token_again(farm, svf, staker):
+    stake_amount = get_stake_amount(farm, svf.address, to_wei(1000), staker)
+    stake_token(farm, svf, 1000, staker)
+    chain.sleep(60 * 60)
+    stake_token(farm, svf, 1000, staker)
+    assert farm.stakersData(staker.address)["uniqueTokensStaked"] == 1
+    token_staker_summary = farm.getTokenStakerSummary(svf.address, staker.address)
+    assert token_staker_summary["stakingBalance"] == 2 * stake_amount
+    # staking again issues the reward of the first stake
+    assert token_staker_summary["stakingRewardsCount"] == 1
+    assert token_staker_summary["rewardBalance"] > 0
+
+
+def test_unstake_token(farm, svf, staker):
+    stake_amount = get_stake_amount(farm, svf.address, to_wei(1000), staker)
+    stake_token(farm, svf, 1000, staker)
+    chain.sleep(60 * 60)
+    farm.unstakeToken(svf.address, stake_amount, {"from": staker})
+    assert farm.stakersData(staker.address)["uniqueTokensStaked"] == 0
+    assert farm.stakersData(staker.address)["isActive"] == False
+    assert farm.tokensData(svf.address)["stakingBalance"] == 0
+    token_staker_summary = farm.getTokenStakerSummary(svf.address, staker.address)
+    assert token_staker_summary["stakingBalance"] == 0
+    assert token_staker_summary["stakingRewardsCount"] == 1
     with pytest.raises(exceptions.VirtualMachineError):
-        savvy_finance_staking.stakers(0)
-    assert savvy_finance_staking.stakersUniqueTokensStaked(account.address) == 0
-
-
-def test_unstake_token_another():
-    (
-        account,
-        savvy_finance_2,
-        savvy_finance_staking,
-        stake_amount,
-    ) = test_stake_token_another()
-    savvy_finance_staking.unstakeToken(
-        savvy_finance_2.address, stake_amount, get_contract_address("null0")
-    ).wait(1)
-    assert savvy_finance_2.balanceOf(savvy_finance_staking.address) == 0
-    assert (
-        savvy_finance_staking.tokensStakersBalances(
-            savvy_finance_2.address, account.address
-        )
-        == 0
-    )
-    assert savvy_finance_staking.stakers(0) == account.address
-    assert savvy_finance_staking.stakersUniqueTokensStaked(account.address) == 1
+        farm.unstakeToken(svf.address, 1, {"from": staker})
+
+
+def test_claim_staking_reward_and_withdraw_reward_token(farm, svf, staker):
+    stake_token(farm, svf, 1000, staker)
+    chain.sleep(60 * 60 * 24)
+    claim_staking_reward(farm, svf, staker)
+    reward_balance = farm.getTokenStakerSummary(svf.address, staker.address)[
+        "rewardBalance"
+    ]
+    assert reward_balance > 0
+    balance = svf.balanceOf(staker.address)
+    farm.withdrawRewardToken(svf.address, reward_balance, {"from": staker})
+    assert svf.balanceOf(staker.address) == balance + reward_balance
+    assert farm.getTokenStakerSummary(svf.address, staker.address)["rewardBalance"] == 0
+
+
+def test_get_tokens_stakers_data(farm, svf, staker):
+    stake_token(farm, svf, 1000, staker)
+    chain.sleep(60 * 60)
+    claim_staking_reward(farm, svf, staker)
+    token_staker_data = get_tokens_stakers_data(farm)[0][svf.address][staker.address]
+    staking_rewards = token_staker_data["stakingRewards"]
+    assert len(staking_rewards) == 1
+    assert staking_rewards[0]["staker"] == staker.address
+    assert staking_rewards[0]["triggeredBy"] == ["claim staking reward", ""]
+    assert token_staker_data["rewardBalance"] == staking_rewards[0]["rewardTokenAmount"]
+    assert "stakingRewardsCount" not in token_staker_data
+    token_staker_data = get_tokens_stakers_data(farm, with_staking_rewards=False)[0][
+        svf.address
+    ][staker.address]
+    assert token_staker_data["stakingRewardsCount"] == 1
+    assert "stakingRewards" not in token_staker_data
+
+
+def test_has_function(farm, svf):
+    assert has_function(farm, "getTokensPage")
+    # the farm ABI at an address without the farm code, like an old farm
+    not_farm = Contract.from_abi("SavvyFinanceFarm", svf.address, farm.abi)
+    assert not has_function(not_farm, "getTokensPage")
+    assert has_function(not_farm, "balanceOf") == False
@@ -0,0 +1,81 @@
+from brownie import chain
+from scripts.savvy_finance_farm import (
+    stake_token,
+    claim_staking_reward,
+    get_tokens_stakers_data,
+)
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from scripts.savvy_finance_farm_archive import (
+    open_staking_rewards_archive,
+    export_staking_rewards,
+    query_staking_rewards,
+    sum_staking_rewards,
+)
+
+
+def test_export_staking_rewards(farm, svf, staker, tmp_path):
+    archive = open_staking_rewards_archive(str(tmp_path))
+    stake_token(farm, svf, 1000, staker)
+    chain.sleep(60 * 60)
+    claim_staking_reward(farm, svf, staker)
+    assert export_staking_rewards(farm, archive) == 1
+    chain.sleep(60 * 60)
+    claim_staking_reward(farm, svf, staker)
+    # only the staking reward issued since the last export is appended
+    assert export_staking_rewards(farm, archive) == 1
+    assert export_staking_rewards(farm, archive) == 0
+
+    archive = open_staking_rewards_archive(str(tmp_path))
+    assert archive["rows"] == 2
+    staking_rewards = get_tokens_stakers_data(farm)[0][svf.address][staker.address][
+        "stakingRewards"
+    ]
+    rows = query_staking_rewards(archive, ["id", "staker", "rewardTokenAmount"])
+    assert list(rows["id"]) == [0, 1]
+    assert list(rows["staker"]) == [staker.address, staker.address]
+    assert list(rows["rewardTokenAmount"]) == [
+        staking_reward["rewardTokenAmount"] for staking_reward in staking_rewards
+    ]
+    # the raw amounts are stored exactly, only scaled into floats when read
+    staking_reward_records = get_tokens_stakers_data(farm, as_records=True)[0][
+        svf.address
+    ][staker.address].stakingRewards
+    raw_rows = query_staking_rewards(
+        archive, ["rewardTokenAmount", "stakedTokenAmount"], raw=True
+    )
+    for field in ["rewardTokenAmount", "stakedTokenAmount"]:
+        assert list(raw_rows[field]) == [
+            getattr(staking_reward, field) for staking_reward in staking_reward_records
+        ]
+    assert (
+        len(
+            query_staking_rewards(
+                archive,
+                ["id"],
+                from_timestamp=staking_rewards[1]["timestampAdded"],
+            )["id"]
+        )
+        == 1
+    )
+    assert len(query_staking_rewards(archive, ["id"], stakers=[svf.address])["id"]) == 0
+
+    sums = sum_staking_rewards(archive, "staker", ["rewardTokenAmount"])
+    assert sums[staker.address]["count"] == 2
+    assert sums[staker.address]["rewardTokenAmount"] == pytest.approx(
+        sum(staking_reward["rewardTokenAmount"] for staking_reward in staking_rewards)
+    )
+
+
+def test_export_staking_rewards_trigger_amount(farm, svf, staker, tmp_path):
+    archive = open_staking_rewards_archive(str(tmp_path))
+    stake_token(farm, svf, 1000, staker)
+    chain.sleep(60 * 60)
+    stake_token(farm, svf, 500, staker)
+    assert export_staking_rewards(farm, archive) == 1
+    rows = query_staking_rewards(archive, ["trigger", "triggerAmount"])
+    assert list(rows["trigger"]) == ["stake"]
+    # triggeredBy holds whole tokens, stored as is
+    assert list(rows["triggerAmount"]) == [500]
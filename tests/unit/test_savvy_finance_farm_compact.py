@@ -0,0 +1,86 @@
+from brownie import chain, MockToken
+from scripts.savvy_finance_farm import (
+    stake_token,
+    get_tokens_stakers_data,
+    get_compact_staking_rewards,
+    compact_staking_reward_to_record,
+    add_tokens,
+    activate_tokens,
+    deposit_token,
+)
+
+
+def test_compact_staking_rewards(account, svf, farm, staker):
+    token = svf.address
+    stake_token(farm, svf, 1000, staker)
+
+    chain.sleep(60)
+    stored_gas_used = farm.claimStakingReward(token, {"from": staker}).gas_used
+    farm.configCompactStakingRewards(True, {"from": account})
+    chain.sleep(60)
+    compact_tx = farm.claimStakingReward(token, {"from": staker})
+    compact_gas_used = compact_tx.gas_used
+    assert compact_gas_used < stored_gas_used
+    assert "UpdateTokenStaker" in compact_tx.events
+    assert farm.compactStakingRewardsFromBlock() > 0
+    assert farm.compactStakingRewardsFromBlock() < compact_tx.block_number
+
+    # the compact reward is read back after the stored ones, in the same shape
+    staking_rewards = get_tokens_stakers_data(farm, {"svf": token}, [staker.address])[
+        0
+    ][token][staker.address]["stakingRewards"]
+    assert [staking_reward["id"] for staking_reward in staking_rewards] == [0, 1]
+    stored_staking_reward, compact_staking_reward = staking_rewards
+    assert compact_staking_reward.keys() == stored_staking_reward.keys()
+    for field in ["staker", "rewardToken", "stakedToken", "triggeredBy"]:
+        assert compact_staking_reward[field] == stored_staking_reward[field]
+    assert compact_staking_reward["rewardTokenAmount"] > 0
+    assert (
+        compact_staking_reward["timestampAdded"]
+        > stored_staking_reward["timestampAdded"]
+    )
+
+
+def test_compact_staking_rewards_out_of_range_are_emitted_whole(account, farm, staker):
+    token = MockToken.deploy({"from": account})
+    add_tokens(farm, {"mt": token.address}, account)
+    activate_tokens(farm, {"mt": token.address}, account)
+    deposit_token(farm, token, 100000, account)
+    farm.configCompactStakingRewards(True, {"from": account})
+
+    # the trigger amount is packed in 64 bits, in whole tokens: the staker's
+    # fits at the top of the range, the account's is one past it
+    txs = {}
+    for sender, amount in [(staker, 2**64 - 1), (account, 2**64)]:
+        token.mint(sender, (amount + 1) * 10**18, {"from": account})
+        token.approve(farm, (amount + 1) * 10**18, {"from": sender})
+        farm.stakeToken(token, 10**18, {"from": sender})
+        chain.sleep(60)
+        txs[sender] = farm.stakeToken(token, amount * 10**18, {"from": sender})
+
+    assert "IssueCompactStakingReward" in txs[staker].events
+    assert "IssueStakingReward" not in txs[staker].events
+    assert "IssueCompactStakingReward" not in txs[account].events
+    assert txs[account].events["IssueStakingReward"]["rewardData"][0] == 0
+    assert farm.compactStakingRewardsCount(token, account) == 1
+    assert farm.getTokenStakerSummary(token, account)[3] == 0
+
+    # both are read back as compact rewards
+    compact_staking_rewards = get_compact_staking_rewards(farm)
+    for sender, amount in [(staker, 2**64 - 1), (account, 2**64)]:
+        staking_rewards = compact_staking_rewards[(token.address, sender.address)]
+        assert [staking_reward["id"] for staking_reward in staking_rewards] == [0]
+        assert staking_rewards[0]["triggeredBy"] == ["stake", str(amount)]
+        assert staking_rewards[0]["rewardTokenAmount"] > 0
+
+
+def test_compact_staking_reward_to_record_keeps_leading_zeros():
+    reward_token = "0x00000000000000000000000000000000000000ab"
+    staking_reward = compact_staking_reward_to_record(
+        "0x0000000000000000000000000000000000000001",
+        "0x0000000000000000000000000000000000000002",
+        0,
+        [int(reward_token, 16) | (2 << 160) | (1000 << 168), 0, 0, 0],
+    )
+    assert staking_reward.rewardToken.lower() == reward_token
+    assert staking_reward.timestampAdded == 1000
@@ -0,0 +1,14 @@
+from brownie import network
+from scripts.savvy_finance_farm import get_contracts
+import os
+
+
+def test_get_contracts_deploys_only_when_asked(account, monkeypatch, tmp_path):
+    # a manifest of its own, not deployments/<network>.json
+    monkeypatch.setattr("scripts.common.DEPLOYMENTS_FOLDER", str(tmp_path))
+    (_, _, updated_farm, _) = get_contracts("update")
+    assert os.listdir(tmp_path) == [network.show_active() + ".json"]
+    nonce = account.nonce
+    (_, _, farm, _) = get_contracts()
+    assert farm.address == updated_farm.address
+    assert account.nonce == nonce
@@ -0,0 +1,29 @@
+from scripts.savvy_finance_farm import generate_front_end_tokens_data
+import os, json
+
+
+def test_generate_front_end_tokens_data(farm, svf, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    assert generate_front_end_tokens_data(farm) == 1
+    with open("tokens.json", "r") as front_end_tokens_data:
+        tokens_data = json.load(front_end_tokens_data)
+    assert [token_data["address"] for token_data in tokens_data] == [svf.address]
+    # written through a temporary file
+    assert os.listdir(tmp_path) == ["tokens.json"]
+
+
+def test_generate_split_front_end_tokens_data(farm, svf, tmp_path):
+    folder = str(tmp_path)
+    file = os.path.join(folder, svf.address + ".json")
+    assert generate_front_end_tokens_data(farm, True, folder, ("gzip",)) == 1
+    assert sorted(os.listdir(folder)) == sorted(
+        [svf.address + ".json", svf.address + ".json.gz", "index.json", "index.json.gz"]
+    )
+    # unchanged files are skipped, unless a variant of them is missing
+    assert generate_front_end_tokens_data(farm, True, folder, ("gzip",)) == 0
+    os.remove(file + ".gz")
+    assert generate_front_end_tokens_data(farm, True, folder, ("gzip",)) == 1
+    assert os.path.exists(file + ".gz")
+    os.remove(file)
+    assert generate_front_end_tokens_data(farm, True, folder, ("gzip",)) == 1
+    assert os.path.exists(file)
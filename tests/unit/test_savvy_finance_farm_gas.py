@@ -0,0 +1,17 @@
+from brownie import chain
+from scripts.savvy_finance_farm import stake_token
+
+
+def test_claim_staking_reward_gas_is_flat(svf, farm, staker):
+    stake_token(farm, svf, 1000, staker)
+
+    claims_gas_used = {}
+    for prior_rewards in range(41):
+        chain.sleep(1)
+        tx = farm.claimStakingReward(svf.address, {"from": staker})
+        if prior_rewards in [1, 10, 40]:
+            claims_gas_used[prior_rewards] = tx.gas_used
+
+    assert farm.getTokenStakerSummary(svf.address, staker.address)[3] == 41
+    # the reward id and amounts are the only things that change between claims
+    assert max(claims_gas_used.values()) - min(claims_gas_used.values()) < 1000
@@ -0,0 +1,44 @@
+from brownie import chain
+from scripts.savvy_finance_farm import (
+    stake_token,
+    unstake_token,
+    claim_staking_reward,
+    get_tokens_data,
+    get_stakers_data,
+    get_tokens_stakers_data,
+)
+from scripts.savvy_finance_farm_indexer import SavvyFinanceFarmIndexer
+
+
+def test_indexer_matches_the_farm(account, farm, svf, staker, tmp_path):
+    database = str(tmp_path / "index.sqlite")
+    indexer = SavvyFinanceFarmIndexer(farm, database, confirmations=0)
+    indexer.seed()
+
+    stake_token(farm, svf, 1000, staker)
+    chain.sleep(60)
+    claim_staking_reward(farm, svf, staker)
+    farm.configCompactStakingRewards(True, {"from": account})
+    chain.sleep(60)
+    stake_token(farm, svf, 1000, staker)
+    chain.sleep(60)
+    unstake_token(farm, svf, 500, staker)
+    # a staker the seed didn't know
+    stake_token(farm, svf, 1000, account)
+    indexer.sync()
+
+    tokens_stakers_data = get_tokens_stakers_data(farm)
+    staking_rewards = tokens_stakers_data[0][svf.address][staker.address][
+        "stakingRewards"
+    ]
+    assert len(staking_rewards) == 3
+    assert indexer.get_tokens_data() == get_tokens_data(farm)
+    assert indexer.get_stakers_data() == get_stakers_data(farm)
+    assert indexer.get_tokens_stakers_data() == tokens_stakers_data
+
+    # a restarted indexer resumes from its checkpoint
+    chain.sleep(60)
+    claim_staking_reward(farm, svf, account)
+    indexer = SavvyFinanceFarmIndexer(farm, database, confirmations=0)
+    indexer.sync()
+    assert indexer.get_tokens_stakers_data() == get_tokens_stakers_data(farm)
@@ -0,0 +1,50 @@
+from brownie import chain, exceptions
+from scripts.savvy_finance_farm import stake_token
+from scripts.savvy_finance_farm_keeper import (
+    grant_keeper_role,
+    select_staking_rewards,
+    issue_staking_rewards,
+)
+import pytest
+
+
+def test_issue_staking_rewards_skips_ineligible_pairs(account, farm, svf, staker):
+    stake_token(farm, svf, 1000, staker)
+    with pytest.raises(exceptions.VirtualMachineError):
+        farm.issueStakingRewards([svf.address], [staker.address], {"from": account})
+    grant_keeper_role(farm, account.address, account)
+    # the account never staked, it is skipped instead of reverting
+    farm.issueStakingRewards(
+        [svf.address, svf.address],
+        [account.address, staker.address],
+        {"from": account},
+    )
+    token_staker_summary = farm.getTokenStakerSummary(svf.address, staker.address)
+    assert token_staker_summary["stakingRewardsCount"] == 1
+    assert (
+        farm.getTokenStakerSummary(svf.address, account.address)["stakingRewardsCount"]
+        == 0
+    )
+
+
+def test_issue_staking_rewards(account, farm, svf, staker):
+    grant_keeper_role(farm, account.address, account)
+    stake_token(farm, svf, 1000, staker)
+    assert select_staking_rewards(farm) == []
+    chain.sleep(60 * 60 * 24)
+    chain.mine()
+    assert select_staking_rewards(farm) == [(svf.address, staker.address)]
+    receipts = issue_staking_rewards(farm, account=account)
+    assert len(receipts) == 1
+    assert receipts[0].status == 1
+    assert (
+        farm.getTokenStakerSummary(svf.address, staker.address)["stakingRewardsCount"]
+        == 1
+    )
+    # credited up to the block timestamp, without the extra day of the claims
+    staking_reward = farm.getTokenStakerRewardsPage(svf.address, staker.address, 0, 1)[
+        0
+    ]
+    assert staking_reward["stakingDurationInSeconds"] // 10**18 < 60 * 60 * 24 * 2
+    # rewarded pairs are left alone until the minimum staking duration passed
+    assert select_staking_rewards(farm) == []
@@ -0,0 +1,8 @@
+from scripts.savvy_finance_farm import chunk_by_staking_rewards_count
+
+
+def test_chunk_by_staking_rewards_count():
+    assert chunk_by_staking_rewards_count(
+        ["a", "b", "c", "d", "e"], [2, 3, 600, 1, 4], 5
+    ) == [["a", "b"], ["c"], ["d", "e"]]
+    assert chunk_by_staking_rewards_count([], [], 5) == []
@@ -0,0 +1,43 @@
+from brownie import network, web3
+from scripts.common import FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS
+from scripts.savvy_finance_farm import get_tokens
+from scripts.savvy_finance_farm_prices import TokenPriceCache, UniswapV2PriceEngine
+import pytest
+
+
+def test_uniswap_v2_price_engine_matches_the_library(farm, library):
+    # the mock router of the other local networks has no pairs
+    if network.show_active() not in FORKED_LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip("needs the forked DEX")
+    tokens = get_tokens()
+    tokens_categories = [
+        # the USD token itself, priced through WETH
+        (tokens["busd"], 0),
+        (tokens["wbnb"], 0),
+        (tokens["wbnb_busd"], 1),
+        # not a pair, the library falls back to 1
+        (tokens["busd"], 1),
+    ]
+    block_number = web3.eth.block_number
+    library_prices = [
+        library.getTokenPrice(
+            farm.address, token, category, block_identifier=block_number
+        )
+        for token, category in tokens_categories
+    ]
+    price_engine = UniswapV2PriceEngine(farm)
+    assert (
+        price_engine.get_tokens_prices(tokens_categories, block_number)
+        == library_prices
+    )
+    # again with the pairs and their token0 cached
+    assert (
+        price_engine.get_tokens_prices(tokens_categories, block_number)
+        == library_prices
+    )
+    assert (
+        TokenPriceCache(library, farm, price_engine=price_engine).get_tokens_prices(
+            tokens_categories, block_number
+        )
+        == library_prices
+    )
@@ -0,0 +1,104 @@
+from brownie import web3
+from scripts.common import to_wei
+from scripts.savvy_finance_farm_prices import read_lp_tokens_data, TokenPriceCache
+from types import SimpleNamespace
+import pytest
+
+TOKENS_PRICES = {"a": to_wei(2), "b": to_wei(3)}
+LP_TOKENS_DATA = {
+    "ab": {
+        "totalSupply": 10,
+        "token0": "a",
+        "token1": "b",
+        "token0Reserve": 20,
+        "token1Reserve": 30,
+    },
+    "ba": {
+        "totalSupply": 5,
+        "token0": "b",
+        "token1": "a",
+        "token0Reserve": 1,
+        "token1Reserve": 2,
+    },
+}
+
+
+class CountingLibrary:
+    def __init__(self):
+        self.priced_tokens = []
+
+    def getTokenPrice(self, farm, token, category, block_identifier=None):
+        self.priced_tokens.append(token)
+        return TOKENS_PRICES[token]
+
+
+@pytest.fixture
+def price_cache(monkeypatch):
+    # the pairs of LP_TOKENS_DATA, any other category 1 token is not a pair
+    monkeypatch.setattr(
+        "scripts.savvy_finance_farm_prices.read_lp_tokens_data",
+        lambda contract, lp_tokens, lp_tokens_pairs, read_options: {
+            lp_token: LP_TOKENS_DATA.get(lp_token) for lp_token in lp_tokens
+        },
+    )
+    return TokenPriceCache(CountingLibrary(), SimpleNamespace(address="farm"))
+
+
+def test_read_lp_tokens_data_skips_non_pairs(farm, svf):
+    # svf has no token0, the library prices it at 1 instead of reverting
+    lp_tokens_pairs = {}
+    assert read_lp_tokens_data(farm, [svf.address], lp_tokens_pairs, {}) == {
+        svf.address: None
+    }
+    assert lp_tokens_pairs == {}
+
+
+def test_token_price_cache_evicts_least_recently_used():
+    price_cache = TokenPriceCache(None, None, max_size=2)
+    price_cache.set("a", 0, 1, 10)
+    price_cache.set("b", 0, 1, 20)
+    assert price_cache.get("a", 0, 1) == 10
+    price_cache.set("c", 0, 1, 30)
+    assert price_cache.get("b", 0, 1) is None
+    assert price_cache.get("a", 0, 1) == 10
+    assert price_cache.get("c", 0, 1) == 30
+
+
+def test_token_price_cache_expires_entries(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(
+        "scripts.savvy_finance_farm_prices.time",
+        SimpleNamespace(monotonic=lambda: clock[0]),
+    )
+    price_cache = TokenPriceCache(None, None, ttl=10)
+    price_cache.set("a", 0, 1, 10)
+    clock[0] += 10
+    assert price_cache.get("a", 0, 1) == 10
+    clock[0] += 1
+    assert price_cache.get("a", 0, 1) is None
+    assert len(price_cache.prices) == 0
+
+
+def test_token_price_cache_prices_lp_components_once(price_cache):
+    tokens_categories = [("ab", 1), ("ba", 1), ("a", 0), ("c", 1)]
+    prices = [
+        (20 * to_wei(2) + 30 * to_wei(3)) // 10,
+        (1 * to_wei(3) + 2 * to_wei(2)) // 5,
+        to_wei(2),
+        # not a pair, same fallback as the library
+        to_wei(1),
+    ]
+    assert price_cache.get_tokens_prices(tokens_categories, 1) == prices
+    assert sorted(price_cache.library.priced_tokens) == ["a", "b"]
+    assert price_cache.get_tokens_prices(tokens_categories, 1) == prices
+    assert len(price_cache.library.priced_tokens) == 2
+    # another block is priced again
+    price_cache.get_tokens_prices([("ab", 1)], 2)
+    assert len(price_cache.library.priced_tokens) == 4
+
+
+def test_token_price_cache_resolves_block_tags(price_cache):
+    price_cache.get_tokens_prices([("a", 0)], "latest")
+    assert list(price_cache.prices) == [("a", 0, web3.eth.block_number)]
+    with pytest.raises(ValueError):
+        price_cache.get_tokens_prices([("a", 0)], "pending")
@@ -0,0 +1,79 @@
+from scripts.savvy_finance_farm import token_staker_data_to_dict
+from scripts.savvy_finance_farm_records import (
+    TokenRecord,
+    StakingRewardRecord,
+    TokenStakerRecord,
+)
+
+TOKEN_DATA = (
+    True,
+    False,
+    False,
+    "USDC",
+    0,
+    0,
+    2500 * 10**6,
+    10**6 + 1,
+    100 * 10**18,
+    "0x0000000000000000000000000000000000000001",
+    "0x0000000000000000000000000000000000000002",
+    (1, 1, 1, 1, 10**18, 10**18),
+    1000,
+    2000,
+)
+
+
+def test_token_record_amounts_use_the_token_decimals():
+    token_dict = TokenRecord(
+        "0x0000000000000000000000000000000000000003", TOKEN_DATA, 6
+    ).to_dict()
+    assert token_dict["rewardBalance"] == 2500
+    assert token_dict["stakingBalance"] == 1.000001
+    # APRs and fees are 18 decimals fixed point numbers for every token
+    assert token_dict["stakingApr"] == 100
+    assert token_dict["adminStakeFee"] == 1
+
+
+def test_token_staker_record_keeps_raw_amounts():
+    staking_reward = (
+        0,
+        "0x0000000000000000000000000000000000000004",
+        "0x0000000000000000000000000000000000000001",
+        10**18,
+        3 * 10**18,
+        "0x0000000000000000000000000000000000000003",
+        10**18,
+        10**6,
+        100 * 10**18,
+        3600 * 10**18,
+        ("claim staking reward", ""),
+        1500,
+        0,
+    )
+    token_staker_record = TokenStakerRecord(
+        (2**200 + 1, 10**6, staking_reward[2], 1, 1500, 1000, 1500),
+        [StakingRewardRecord(staking_reward, 18, 6)],
+        1,
+        6,
+    )
+    assert token_staker_record.rewardBalance == 2**200 + 1
+    token_staker_dict = token_staker_record.to_dict()
+    assert token_staker_dict["stakingBalance"] == 1
+    assert token_staker_dict["stakingRewardsCount"] == 1
+    assert token_staker_dict["stakingRewards"][0]["rewardTokenAmount"] == 3
+    assert token_staker_dict["stakingRewards"][0]["stakedTokenAmount"] == 1
+
+
+def test_token_staker_data_to_dict_uses_the_tokens_decimals():
+    staked_token = "0x0000000000000000000000000000000000000001"
+    reward_token = "0x0000000000000000000000000000000000000002"
+    staking_reward = (0, staked_token, reward_token, 0, 5 * 10**6, staked_token)
+    staking_reward += (0, 2 * 10**8, 0, 0, ["claim staking reward", ""], 0, 0)
+    token_staker_dict = token_staker_data_to_dict(
+        (0, 3 * 10**8, reward_token, [staking_reward], 0, 0, 0),
+        8,
+        {reward_token: 6},
+    )
+    assert token_staker_dict["stakingBalance"] == 3
+    assert token_staker_dict["stakingRewards"][0]["rewardTokenAmount"] == 5
+    assert token_staker_dict["stakingRewards"][0]["stakedTokenAmount"] == 2
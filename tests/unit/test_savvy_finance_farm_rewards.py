@@ -0,0 +1,63 @@
+from brownie import chain, web3
+from scripts.common import to_wei
+from scripts.savvy_finance_farm import stake_token
+from scripts.savvy_finance_farm_rewards import (
+    calculate_staking_reward,
+    project_staking_rewards,
+)
+
+
+def test_calculate_staking_reward_truncation():
+    # 150.5% APR: stakingApr / 100 truncates before the rate is applied
+    staking_amount = to_wei(1000)
+    staking_apr = to_wei(150.5)
+    timestamp_added = 1000
+    timestamp = timestamp_added + 60 * 60 * 24 * 30
+    (
+        staking_reward_amount,
+        staking_duration_in_seconds,
+        returned_staking_apr,
+        returned_staking_amount,
+    ) = calculate_staking_reward(
+        staking_amount, staking_apr, 0, timestamp_added, timestamp
+    )
+    expected_staking_duration_in_seconds = (
+        timestamp + 60 * 60 * 24 - timestamp_added
+    ) * 10**18
+    expected_staking_duration_in_years = (
+        expected_staking_duration_in_seconds * 31709800000
+    ) // 10**18
+    assert staking_duration_in_seconds == expected_staking_duration_in_seconds
+    assert (
+        staking_reward_amount
+        == (staking_amount * (staking_apr // 100) * expected_staking_duration_in_years)
+        // 10**36
+    )
+    assert returned_staking_apr == staking_apr
+    assert returned_staking_amount == staking_amount
+
+
+def test_calculate_staking_reward_without_stake():
+    assert calculate_staking_reward(0, to_wei(100), 0, 1000, 2000) == (0, 0, 0, 0)
+
+
+def test_calculate_staking_reward_matches_library(svf, farm, library, staker):
+    stake_token(farm, svf, 1000, staker)
+
+    for seconds in [0, 1, 60 * 60, 60 * 60 * 24 * 365]:
+        chain.sleep(seconds)
+        chain.mine()
+        block_number = web3.eth.block_number
+        staking_rewards = project_staking_rewards(farm, block_identifier=block_number)
+        assert len(staking_rewards) == 1
+        assert library.calculateStakingReward(
+            farm.address,
+            svf.address,
+            staker.address,
+            block_identifier=block_number,
+        ) == (
+            staking_rewards[0]["stakingRewardAmount"],
+            staking_rewards[0]["stakingDurationInSeconds"],
+            staking_rewards[0]["stakingApr"],
+            staking_rewards[0]["stakingAmount"],
+        )
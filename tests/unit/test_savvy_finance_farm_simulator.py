@@ -0,0 +1,42 @@
+from scripts.common import to_wei
+from scripts.savvy_finance_farm import stake_token
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from scripts.savvy_finance_farm_simulator import (
+    read_simulation_state,
+    simulate_reward_depletion,
+)
+
+
+def test_simulate_reward_depletion(farm, library, svf, staker):
+    stake_token(farm, svf, 1000, staker)
+    state = read_simulation_state(farm, library)
+
+    # 1000 svf at 100% APR against a reward balance of about 100000 svf
+    (token_simulation,) = simulate_reward_depletion(state)
+    assert token_simulation["rewardToken"] == svf.address
+    assert token_simulation["dailyRewardTokenBurn"] > 0
+    assert token_simulation["depletionInSeconds"] is None
+
+    apr_scenario = {
+        "afterSeconds": 0,
+        "token": svf.address,
+        "stakingApr": to_wei(100000),
+    }
+    (token_simulation,) = simulate_reward_depletion(state, [apr_scenario])
+    depletion_in_days = token_simulation["depletionInSeconds"] / 60 / 60 / 24
+    assert 10 < depletion_in_days < 30
+    (token_simulation,) = simulate_reward_depletion(
+        state,
+        [
+            apr_scenario,
+            {
+                "afterSeconds": 60 * 60 * 24,
+                "token": svf.address,
+                "deposit": to_wei(50000),
+            },
+        ],
+    )
+    assert token_simulation["depletionInSeconds"] / 60 / 60 / 24 > depletion_in_days
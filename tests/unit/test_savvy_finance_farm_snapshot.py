@@ -0,0 +1,47 @@
+from brownie import chain
+from scripts.savvy_finance_farm import stake_token, get_tokens_stakers_data
+from scripts.savvy_finance_farm_snapshot import (
+    open_snapshot_store,
+    refresh_snapshot,
+    get_snapshot_tokens_stakers_data,
+)
+
+
+def count_token_staker_entries(connection, block):
+    (count,) = connection.execute(
+        "SELECT COUNT(*) FROM snapshots WHERE kind = 'token_staker' AND block = ?",
+        (block,),
+    ).fetchone()
+    return count
+
+
+def test_refresh_snapshot(account, farm, svf, staker, tmp_path):
+    connection = open_snapshot_store(str(tmp_path / "snapshots.sqlite"))
+    stake_token(farm, svf, 1000, staker)
+    stake_token(farm, svf, 1000, account)
+    first_block = refresh_snapshot(connection, farm)
+    assert count_token_staker_entries(connection, first_block) == 2
+
+    # only the staker's pair changes, with a stored and a compact reward
+    chain.sleep(60)
+    farm.claimStakingReward(svf.address, {"from": staker})
+    farm.configCompactStakingRewards(True, {"from": account})
+    chain.sleep(60)
+    farm.claimStakingReward(svf.address, {"from": staker})
+    second_block = refresh_snapshot(connection, farm)
+    assert count_token_staker_entries(connection, second_block) == 1
+    staking_rewards = get_snapshot_tokens_stakers_data(connection)[0][svf.address][
+        staker.address
+    ]["stakingRewards"]
+    assert [staking_reward["id"] for staking_reward in staking_rewards] == [0, 1]
+
+    # every snapshot matches the farm read in full at its block
+    for block in [first_block, second_block]:
+        assert get_snapshot_tokens_stakers_data(
+            connection, block
+        ) == get_tokens_stakers_data(farm, block_identifier=block)
+
+    chain.mine()
+    assert (
+        count_token_staker_entries(connection, refresh_snapshot(connection, farm)) == 0
+    )
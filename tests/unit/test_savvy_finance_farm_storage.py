@@ -0,0 +1,177 @@
+from brownie import exceptions, history, Contract, SavvyFinanceFarmV1Mock
+from scripts.common import (
+    to_wei,
+    get_account,
+    deploy_proxy_admin,
+    deploy_transparent_upgradeable_proxy,
+    upgrade_transparent_upgradeable_proxy,
+)
+from scripts.savvy_finance_farm import (
+    check_storage_migration,
+    migrate_storage,
+    deploy_savvy_finance_farm,
+    STORAGE_VERSION,
+)
+import pytest
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def test_migrate_storage(account, farm, svf, staker):
+    # initialize sets the storage version of new deployments
+    assert farm.getStorageVersion() == STORAGE_VERSION
+    assert migrate_storage(farm, account=account) == 0
+    assert farm.migrateStorage.call(1, {"from": account}) == True
+    with pytest.raises(exceptions.VirtualMachineError):
+        farm.migrateStorage(1, {"from": staker})
+
+
+def test_upgrade_and_migrate_storage(account, farm):
+    (token, other_token, staker, other_staker) = [
+        get_account(index).address for index in range(2, 6)
+    ]
+    proxy_admin = deploy_proxy_admin(account)
+    proxy = deploy_transparent_upgradeable_proxy(
+        proxy_admin, SavvyFinanceFarmV1Mock.deploy({"from": account}), account=account
+    )
+    old_farm = Contract.from_abi(
+        "SavvyFinanceFarmV1Mock", proxy.address, SavvyFinanceFarmV1Mock.abi
+    )
+    # adminUnstakeFee, uniqueTokensStaked and the last timestampLastUpdated
+    # don't fit their packed fields and are clamped
+    token_data = (True, True, False, "TKN", 1, 0, to_wei(1000), to_wei(500))
+    token_data += (to_wei(100), other_token, account.address, (1, 2, 3, 4, 5, 2**64))
+    token_data += (100, 200)
+    other_token_data = (False, False, True, "OTKN", 0, 1, 0, to_wei(20), 0, token)
+    other_token_data += (staker, (0, 0, 0, 0, 0, 0), 110, 110)
+    staker_data = (True, 1, 120, 300)
+    other_staker_data = (False, 2**32, 130, 130)
+    token_staker_data = (to_wei(5), to_wei(500), other_token, 300, 120, 300)
+    other_token_staker_data = (0, to_wei(20), other_token, 0, 130, 2**64)
+    staking_reward = (0, staker, other_token, to_wei(2), to_wei(5), token, to_wei(1))
+    staking_reward += (to_wei(500), to_wei(100), 180, ["claim staking reward", ""])
+    staking_reward += (300, 300)
+    old_farm.setToken(token, token_data, {"from": account})
+    old_farm.setToken(other_token, other_token_data, {"from": account})
+    old_farm.setStaker(staker, staker_data, {"from": account})
+    old_farm.setStaker(other_staker, other_staker_data, {"from": account})
+    old_farm.setTokenStaker(token, staker, *token_staker_data, {"from": account})
+    old_farm.setTokenStaker(
+        other_token, other_staker, *other_token_staker_data, {"from": account}
+    )
+    old_farm.pushStakingReward(token, staker, staking_reward, {"from": account})
+
+    old_farm.setTokenStaker(
+        other_token,
+        other_staker,
+        0,
+        2**128,
+        other_token,
+        0,
+        130,
+        0,
+        {"from": account},
+    )
+    with pytest.raises(ValueError):
+        check_storage_migration(old_farm, allow_clamped=True)
+    old_farm.setTokenStaker(
+        other_token, other_staker, *other_token_staker_data, {"from": account}
+    )
+    with pytest.raises(ValueError):
+        check_storage_migration(old_farm)
+    assert check_storage_migration(old_farm, allow_clamped=True) == [
+        (token, None, "adminUnstakeFee", 2**64),
+        (None, other_staker, "uniqueTokensStaked", 2**32),
+        (other_token, other_staker, "timestampLastUpdated", 2**64),
+    ]
+
+    upgrade_transparent_upgradeable_proxy(
+        proxy_admin, proxy, deploy_savvy_finance_farm(account), account=account
+    )
+    new_farm = Contract.from_abi("SavvyFinanceFarm", proxy.address, farm.abi)
+    assert new_farm.getStorageVersion() == 0
+    assert new_farm.isLegacyTokenStaker(token, staker)
+    assert not new_farm.isLegacyTokenStaker(token, other_staker)
+    # 2 migrateTokensStakers and 4 migrateStorage transactions
+    assert migrate_storage(new_farm, batch_size=1, account=account) == 6
+    assert new_farm.getStorageVersion() == STORAGE_VERSION
+    assert [
+        (event["token"], event["staker"], event["field"], event["value"])
+        for tx in history[-6:]
+        if "ClampMigratedValue" in tx.events
+        for event in tx.events["ClampMigratedValue"]
+    ] == [
+        (other_token, other_staker, "timestampLastUpdated", 2**64),
+        (ZERO_ADDRESS, other_staker, "uniqueTokensStaked", 2**32),
+        (token, ZERO_ADDRESS, "adminUnstakeFee", 2**64),
+    ]
+
+    assert new_farm.getTokens() == [token, other_token]
+    assert new_farm.getStakers() == [staker, other_staker]
+    assert (
+        new_farm.getTokenData(token)
+        == token_data[:11] + ((1, 2, 3, 4, 5, 2**64 - 1),) + token_data[12:]
+    )
+    assert new_farm.getTokenData(other_token) == other_token_data
+    assert new_farm.stakersData(staker) == staker_data
+    assert new_farm.stakersData(other_staker) == (False, 2**32 - 1, 130, 130)
+    assert new_farm.tokensStakersData(token, staker) == token_staker_data
+    assert new_farm.tokensStakersData(
+        other_token, other_staker
+    ) == other_token_staker_data[:5] + (2**64 - 1,)
+    assert (
+        new_farm.tokensStakersData(token, other_staker)
+        == (0,) * 2 + (ZERO_ADDRESS,) + (0,) * 3
+    )
+    assert new_farm.getTokenStakerRewardsPage(token, staker, 0, 10) == [staking_reward]
+    assert new_farm.getTokenStakerRewardsPage(other_token, other_staker, 0, 10) == []
+    for token_staker in [(token, staker), (other_token, other_staker)]:
+        assert not new_farm.isLegacyTokenStaker(*token_staker)
+    with pytest.raises(exceptions.VirtualMachineError):
+        new_farm.migrateTokensStakers([], [], True, {"from": account})
+
+
+def test_storage_migration_pauses_the_farm(account, farm, svf, staker):
+    (old_staker, added_staker, other_token) = [
+        get_account(index).address for index in range(2, 5)
+    ]
+    proxy_admin = deploy_proxy_admin(account)
+    proxy = deploy_transparent_upgradeable_proxy(
+        proxy_admin, SavvyFinanceFarmV1Mock.deploy({"from": account}), account=account
+    )
+    old_farm = Contract.from_abi(
+        "SavvyFinanceFarmV1Mock", proxy.address, SavvyFinanceFarmV1Mock.abi
+    )
+    for token in [svf.address, other_token]:
+        token_data = (True, True, False, "SVF", 0, 0, 0, 0, to_wei(100), token)
+        token_data += (account.address, (0, 0, 0, 0, 0, 0), 100, 100)
+        old_farm.setToken(token, token_data, {"from": account})
+    old_farm.setStaker(old_staker, (True, 1, 120, 300), {"from": account})
+    # listed twice, the second copy must not overwrite the migrated entry
+    old_farm.setStaker(added_staker, (True, 1, 0, 130), {"from": account})
+    old_farm.setStaker(added_staker, (True, 1, 0, 130), {"from": account})
+    upgrade_transparent_upgradeable_proxy(
+        proxy_admin, proxy, deploy_savvy_finance_farm(account), account=account
+    )
+    new_farm = Contract.from_abi("SavvyFinanceFarm", proxy.address, farm.abi)
+    new_farm.migrateTokensStakers([], [], True, {"from": account})
+    # the 3 staker entries and svf, other_token is left
+    new_farm.migrateStorage(4, {"from": account})
+    assert new_farm.tokenExists(svf.address)
+    assert new_farm.getStorageVersion() == 0
+
+    svf.approve(new_farm.address, to_wei(100), {"from": staker})
+    with pytest.raises(exceptions.VirtualMachineError):
+        new_farm.stakeToken(svf.address, to_wei(100), {"from": staker})
+    with pytest.raises(exceptions.VirtualMachineError):
+        new_farm.configDefaultDex(1, {"from": account})
+    assert new_farm.migrateStorage.call(1, {"from": account}) == True
+    new_farm.migrateStorage(1, {"from": account})
+
+    new_farm.stakeToken(svf.address, to_wei(100), {"from": staker})
+    assert new_farm.getStakers() == [old_staker, added_staker, added_staker, staker]
+    assert new_farm.stakersData(old_staker) == (True, 1, 120, 300)
+    assert new_farm.stakersData(added_staker) == (True, 1, 0, 130)
+    assert new_farm.stakersData(staker)[:2] == (True, 1)
+    assert new_farm.tokensStakersData(svf.address, staker)[1] == to_wei(100)
+    assert new_farm.getTokenData(svf.address)[7] == to_wei(100)
@@ -0,0 +1,110 @@
+from brownie import chain, history, web3
+from scripts.common import send_transactions, NONCE_USED_FAILURE
+import pytest
+
+
+def set_mining(mining):
+    web3.provider.make_request("miner_start" if mining else "miner_stop", [])
+
+
+@pytest.fixture
+def stopped_mining():
+    set_mining(False)
+    yield
+    set_mining(True)
+
+
+def transfers(svf, to, amounts):
+    return [
+        (svf.transfer, (to, amount), "Transferred " + str(amount) + ".")
+        for amount in amounts
+    ]
+
+
+def test_send_transactions_assigns_consecutive_nonces(account, svf, staker):
+    balance = svf.balanceOf(staker.address)
+    nonce = web3.eth.get_transaction_count(account.address)
+    receipts = send_transactions(transfers(svf, staker.address, [1, 2, 3]), account)
+    assert [receipt.nonce for receipt in receipts] == [nonce, nonce + 1, nonce + 2]
+    assert [receipt.status for receipt in receipts] == [1, 1, 1]
+    assert svf.balanceOf(staker.address) == balance + 6
+
+
+def test_send_transactions_does_not_resend_reverts(account, svf, staker):
+    balance = svf.balanceOf(staker.address)
+    nonce = web3.eth.get_transaction_count(account.address)
+    too_much = svf.balanceOf(account.address) + 1
+    receipts = send_transactions(
+        transfers(svf, staker.address, [1, too_much, 2]), account, retries=2
+    )
+    assert receipts[0].status == 1 and receipts[2].status == 1
+    assert receipts[1] is None
+    # the revert is sent once at most, when the gas isn't estimated
+    assert web3.eth.get_transaction_count(account.address) - nonce in [2, 3]
+    assert svf.balanceOf(staker.address) == balance + 3
+
+
+def test_send_transactions_replaces_pending_transactions(
+    account, svf, staker, stopped_mining
+):
+    balance = svf.balanceOf(staker.address)
+    nonce = web3.eth.get_transaction_count(account.address)
+    receipts = send_transactions(
+        transfers(svf, staker.address, [1]), account, retries=1, timeout=1
+    )
+    assert receipts == [None]
+    # sent, then replaced with the same nonce and a higher gas price
+    assert [tx.nonce for tx in history[-2:]] == [nonce, nonce]
+    assert history[-1].gas_price > history[-2].gas_price
+    set_mining(True)
+    chain.mine()
+    assert web3.eth.get_transaction_count(account.address) == nonce + 1
+    assert svf.balanceOf(staker.address) == balance + 1
+
+
+def test_send_transactions_awaits_unconfirmed_transactions(account, svf, staker):
+    balance = svf.balanceOf(staker.address)
+    nonce = web3.eth.get_transaction_count(account.address)
+    # mined at once, but the chain only mines a block per transaction, so it
+    # never gets 2 confirmations. It is awaited again instead of resent.
+    receipts = send_transactions(
+        transfers(svf, staker.address, [1]),
+        account,
+        required_confs=2,
+        retries=2,
+        timeout=0,
+    )
+    assert receipts == [None]
+    assert web3.eth.get_transaction_count(account.address) == nonce + 1
+    assert svf.balanceOf(staker.address) == balance + 1
+
+
+def test_send_transactions_reports_nonces_used_elsewhere(
+    account, svf, staker, stopped_mining, capsys
+):
+    balance = svf.balanceOf(staker.address)
+    nonce = web3.eth.get_transaction_count(account.address)
+
+    def transfer_replaced_elsewhere(to, amount, parameters):
+        tx = svf.transfer(to, amount, parameters)
+        # another process of the account replaces the pending transfer
+        account.transfer(
+            account,
+            0,
+            nonce=tx.nonce,
+            gas_price=tx.gas_price + 10**9,
+            required_confs=0,
+        )
+        set_mining(True)
+        return tx
+
+    receipts = send_transactions(
+        [(transfer_replaced_elsewhere, (staker.address, 1), "Transferred 1.")],
+        account,
+        retries=2,
+        timeout=1,
+    )
+    assert receipts == [None]
+    assert NONCE_USED_FAILURE in capsys.readouterr().out
+    assert web3.eth.get_transaction_count(account.address) == nonce + 1
+    assert svf.balanceOf(staker.address) == balance